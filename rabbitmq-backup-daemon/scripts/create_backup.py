@@ -16,12 +16,13 @@
 
 import logging
 import multiprocessing
-import json
 import ast
 import argparse
 import requests
 import os
 
+import json_codec
+
 
 def get_secret_value(key):
     secrets_dir = os.getenv("BACKUP_DAEMON_SECRETS_DIR", "/etc/secrets/rabbitmq-backup-daemon-pod-secrets")
@@ -60,14 +61,14 @@ def make_rabbitmq_backup(folder, vhosts):
             logging.error(f"Can not get backup json from: {rabbit_url} with error {str(e)}")
             exit(1)
 
-        backup = response.json()
+        backup = json_codec.loads(response.content)
         if backup.get("error"):
             logging.error(f"Can not get backup json from: {rabbit_url} with error: {backup['reason']}")
             exit(1)
         if vhost == "":
             vhost = "allrabbitmqvhosts"
-        with open(folder + "/" + vhost, "w+") as output:
-            json.dump(backup, output, ensure_ascii=False, indent=4)
+        with open(folder + "/" + vhost, "wb") as output:
+            output.write(json_codec.dumps(backup))
     logging.info("backup_result: 0")
     exit(0)
 
@@ -16,12 +16,13 @@
 
 import logging
 import multiprocessing
-import json
 import ast
 import argparse
 import requests
 import os
 
+import json_codec
+
 
 def get_secret_value(key):
     secrets_dir = os.getenv("BACKUP_DAEMON_SECRETS_DIR", "/etc/secrets/rabbitmq-backup-daemon-pod-secrets")
@@ -39,6 +40,7 @@ RABBITMQ_URL = os.environ['RABBITMQ_URL']
 RABBITMQ_PASSWORD = get_secret_value('RABBITMQ_PASSWORD')
 RABBITMQ_USER = get_secret_value('RABBITMQ_USER')
 CA_CERT_PATH = '/tls/ca.crt'
+JSON_HEADERS = {'Content-Type': 'application/json'}
 
 loggingLevel = logging.DEBUG if os.getenv(
     'RABBITMQ_BACKUP_DAEMON_DEBUG') else logging.INFO
@@ -56,13 +58,16 @@ def make_rabbitmq_restore(folder, vhosts):
         if vhost == "":
             vhost = "allrabbitmqvhosts"
         try:
-            with open(folder + "/" + vhost) as f:
-                backup = json.load(f)
+            with open(folder + "/" + vhost, "rb") as f:
+                backup = json_codec.loads(f.read())
+            # encoded once for both requests, instead of by requests' json=
+            body = json_codec.dumps(backup)
         except Exception as e:
             logging.error(f"Can not get backup json from: {vhost} with error: {str(e)}")
         if vhost != "allrabbitmqvhosts":
             try:
-                response = requests.put(rabbit_url_create_vhost, auth=(RABBITMQ_USER, RABBITMQ_PASSWORD), json=backup, verify=rabbit_cafile)
+                response = requests.put(rabbit_url_create_vhost, auth=(RABBITMQ_USER, RABBITMQ_PASSWORD), data=body,
+                                        headers=JSON_HEADERS, verify=rabbit_cafile)
             except Exception as e:
                 logging.error(f"Can not create vhost with: {rabbit_url} with error: {str(e)}")
                 return 1
@@ -70,7 +75,8 @@ def make_rabbitmq_restore(folder, vhosts):
                 logging.error(f"Can not create vhost with: {rabbit_url} with error code: {str(response.status_code)}")
                 return 1
         try:
-            response = requests.post(rabbit_url, auth=(RABBITMQ_USER, RABBITMQ_PASSWORD), json=backup, verify=rabbit_cafile)
+            response = requests.post(rabbit_url, auth=(RABBITMQ_USER, RABBITMQ_PASSWORD), data=body,
+                                     headers=JSON_HEADERS, verify=rabbit_cafile)
         except Exception as e:
             logging.error(f"Can not get backup json from: {rabbit_url} with error: {str(e)}")
             return 1
@@ -0,0 +1,298 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks the telegraf exec-scripts parsers on synthetic payloads.
+
+Every benchmark is timed (best of --repeat runs) and memory-profiled with
+tracemalloc, and the results are written as JSON so two commits can be
+compared with --compare.
+"""
+
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'exec-scripts'))
+
+logging.basicConfig(level=logging.WARNING)
+
+import channel_parser  # noqa: E402
+import client_parser  # noqa: E402
+import connection_parser  # noqa: E402
+import exporter_parser  # noqa: E402
+import influx_sink  # noqa: E402
+import json_codec  # noqa: E402
+import json_stream  # noqa: E402
+import line_protocol  # noqa: E402
+import node_parser  # noqa: E402
+import prometheus  # noqa: E402
+import queue_parser  # noqa: E402
+
+import payloads  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+# ignored by git, like the other results files written next to this script
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark-results.json')
+NODE_COUNT = 3
+PAGE_SIZE = 500
+
+
+def _parse_queues(size):
+    queues, nodes = list(payloads.queues(size)), payloads.nodes(NODE_COUNT)
+    return lambda: queue_parser.parse_queues(queues, nodes, payloads.CLUSTER_NAME)
+
+
+def _parse_channels(size):
+    channels, nodes = list(payloads.channels(size)), payloads.nodes(NODE_COUNT)
+    return lambda: channel_parser.parse_channels(channels, nodes, payloads.CLUSTER_NAME)
+
+
+def _parse_connections(size):
+    connections, nodes = list(payloads.connections(size)), payloads.nodes(NODE_COUNT)
+    return lambda: connection_parser.parse_connections(connections, nodes, payloads.CLUSTER_NAME)
+
+
+def _parse_clients(size):
+    connections, channels = list(payloads.connections(size // 4)), list(payloads.channels(size))
+    return lambda: client_parser.parse_clients(connections, channels, payloads.CLUSTER_NAME)
+
+
+def _parse_nodes(size):
+    nodes = payloads.nodes(size)
+    return lambda: node_parser.parse_nodes(nodes, payloads.CLUSTER_NAME)
+
+
+def _influx_lines(lines_type, payload):
+    def run():
+        with open(os.devnull, 'w') as devnull, line_protocol.LineWriter(devnull) as writer:
+            # one page at a time, as influx_sink merges the listing pages
+            for start in range(0, len(payload), PAGE_SIZE):
+                page = lines_type()
+                page.add(payload[start:start + PAGE_SIZE])
+                lines_type(writer).merge(page)
+        return writer.lines
+
+    return run
+
+
+def _influx_queues(size):
+    return _influx_lines(influx_sink.QueueLines, list(payloads.queues(size)))
+
+
+def _influx_exchanges(size):
+    return _influx_lines(influx_sink.ExchangeLines, list(payloads.exchanges(size)))
+
+
+def _prometheus_render(size):
+    nodes = payloads.nodes(NODE_COUNT)
+    queues = queue_parser.QueueTotals()
+    queues.add(payloads.queues(size))
+    channels = channel_parser.ChannelTotals()
+    channels.add(payloads.channels(size))
+    connections = connection_parser.ConnectionTotals()
+    connections.add(payloads.connections(size))
+
+    def render():
+        return prometheus.get_prometheus_metrics([
+            node_parser.parse_nodes(nodes, payloads.CLUSTER_NAME),
+            queue_parser.render_queues(queues, nodes, payloads.CLUSTER_NAME),
+            channel_parser.render_channels(channels, nodes, payloads.CLUSTER_NAME),
+            connection_parser.render_connections(connections, nodes, payloads.CLUSTER_NAME),
+        ])
+
+    return render
+
+
+def _listing_pages(size):
+    """/api/queues and /api/channels bodies as paginated responses."""
+    pages = []
+    for items in (list(payloads.queues(size)), list(payloads.channels(size))):
+        for start in range(0, len(items), PAGE_SIZE):
+            pages.append(json.dumps({'items': items[start:start + PAGE_SIZE],
+                                     'page': start // PAGE_SIZE + 1}).encode('utf-8'))
+    return pages
+
+
+def _json_decode(backend):
+    _, loads, _ = json_codec.load_backend(backend)
+
+    def setup(size):
+        pages = _listing_pages(size)
+
+        def run():
+            for page in pages:
+                loads(page)
+
+        return run
+
+    return setup
+
+
+def _json_split(size):
+    pages = _listing_pages(size)
+    chunk = json_stream.CHUNK_SIZE
+
+    def run():
+        for page in pages:
+            splitter = json_stream.JSONItemSplitter(key='items')
+            for start in range(0, len(page), chunk):
+                splitter.feed(page[start:start + chunk].decode('utf-8'))
+            splitter.feed('', final=True)
+
+    return run
+
+
+def _scrape(size):
+    server = StubServer(size, node_count=NODE_COUNT)
+    host = server.start()
+    helper = prometheus.RabbitMQHelper(host=host, user='guest', password='guest')
+
+    async def scrape():
+        metrics = await helper.scrape()
+        await prometheus.http_pool.close_session()
+        return prometheus.get_prometheus_metrics(metrics)
+
+    def run():
+        return asyncio.run(scrape())
+
+    run.cleanup = server.stop
+    return run
+
+
+BENCHMARKS = {
+    'parse_queues': _parse_queues,
+    'parse_channels': _parse_channels,
+    'parse_connections': _parse_connections,
+    'parse_clients': _parse_clients,
+    'parse_nodes': _parse_nodes,
+    'influx_queues': _influx_queues,
+    'influx_exchanges': _influx_exchanges,
+    'prometheus_render': _prometheus_render,
+    'json_split': _json_split,
+}
+# one decode benchmark per installed json_codec backend
+for _backend in json_codec.BACKENDS:
+    if json_codec.load_backend(_backend)[0] == _backend:
+        BENCHMARKS[f'json_{_backend}'] = _json_decode(_backend)
+
+SCRAPE_BENCHMARKS = {
+    'prometheus_scrape': _scrape,
+}
+
+
+def _reset_gauges():
+    # parsers keep label sets in module-level gauges, drop the ones left
+    # by the previous benchmark so they do not inflate the next one
+    for module in (channel_parser, client_parser, connection_parser, exporter_parser, node_parser,
+                   queue_parser):
+        for gauge in module._GRAPH.values():
+            gauge.clear()
+
+
+def measure(setup, size: int, repeat: int) -> dict:
+    _reset_gauges()
+    run = setup(size)
+    try:
+        timings = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        cleanup = getattr(run, 'cleanup', None)
+        if cleanup:
+            cleanup()
+    return {'seconds': min(timings), 'peak_bytes': peak}
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: dict, baseline: dict):
+    print(f'{"benchmark":<20} {"size":>8} {"baseline s":>12} {"current s":>12} {"ratio":>7} '
+          f'{"baseline MB":>12} {"current MB":>12}')
+    for name, sizes in current['results'].items():
+        for size, result in sizes.items():
+            base = baseline['results'].get(name, {}).get(size)
+            if not base:
+                continue
+            print(f'{name:<20} {size:>8} {base["seconds"]:>12.4f} {result["seconds"]:>12.4f} '
+                  f'{result["seconds"] / base["seconds"]:>7.2f} '
+                  f'{base["peak_bytes"] / 2 ** 20:>12.1f} {result["peak_bytes"] / 2 ** 20:>12.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated object counts per payload')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help='comma-separated benchmark names')
+    parser.add_argument('--scrape', action='store_true',
+                        help='also time end-to-end scrapes against a local stub server')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help='results file, by default benchmark-results.json next to this script')
+    parser.add_argument('--compare', help='results file of a previous run to compare with')
+    args = parser.parse_args()
+
+    benchmarks = {name: BENCHMARKS[name] for name in args.benchmarks.split(',')}
+    if args.scrape:
+        benchmarks.update(SCRAPE_BENCHMARKS)
+
+    results = {}
+    for name, setup in benchmarks.items():
+        for size in map(int, args.sizes.split(',')):
+            result = measure(setup, size, args.repeat)
+            results.setdefault(name, {})[str(size)] = result
+            print(f'{name:<20} {size:>8} {result["seconds"]:>10.4f}s '
+                  f'{result["peak_bytes"] / 2 ** 20:>10.1f} MB', flush=True)
+
+    report = {
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
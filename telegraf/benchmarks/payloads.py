@@ -0,0 +1,222 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Synthetic RabbitMQ management API payloads.
+
+Objects carry the fields the exec-scripts read plus the usual bulk of a
+real response (rate details, arguments, client properties), so decoding
+and parsing costs are realistic. Generation is deterministic for a seed.
+"""
+
+import random
+
+CLUSTER_NAME = 'rabbit@rmqlocal-0.rmqlocal.rabbitmq.svc.cluster.local'
+RABBITMQ_VERSION = '3.13.7'
+
+
+def node_names(count: int = 3):
+    return [f'rabbit@rmqlocal-{i}.rmqlocal.rabbitmq.svc.cluster.local' for i in range(count)]
+
+
+def _message_stats(rng, keys):
+    stats = {}
+    for key in keys:
+        value = rng.randint(0, 10 ** 7)
+        stats[key] = value
+        stats[f'{key}_details'] = {'rate': round(rng.uniform(0, 500), 1)}
+    return stats
+
+
+def nodes(count: int = 3, seed: int = 0):
+    rng = random.Random(seed)
+    names = node_names(count)
+    result = []
+    for name in names:
+        node = {
+            'name': name,
+            'type': 'disc',
+            'running': True,
+            'disk_free': rng.randint(10 ** 9, 10 ** 11),
+            'disk_free_limit': 50000000,
+            'disk_free_alarm': False,
+            'fd_total': 1048576,
+            'fd_used': rng.randint(50, 5000),
+            'mem_limit': 1717986918,
+            'mem_used': rng.randint(10 ** 8, 10 ** 9),
+            'mem_alarm': False,
+            'proc_total': 1048576,
+            'proc_used': rng.randint(400, 20000),
+            'sockets_total': 943629,
+            'sockets_used': rng.randint(0, 3000),
+            'uptime': rng.randint(10 ** 6, 10 ** 9),
+            'run_queue': 1,
+            'processors': 4,
+            'queue_declared': rng.randint(0, 10 ** 6),
+            'queue_created': rng.randint(0, 10 ** 5),
+            'queue_deleted': rng.randint(0, 10 ** 5),
+            'connection_created': rng.randint(0, 10 ** 5),
+            'connection_closed': rng.randint(0, 10 ** 5),
+            'channel_created': rng.randint(10 ** 5, 10 ** 6),
+            'channel_closed': rng.randint(0, 10 ** 5),
+            # links form a full mesh, keep them out of huge synthetic clusters
+            'cluster_links': [] if count > 32 else [{
+                'name': peer,
+                'peer_addr': f'10.0.0.{j}',
+                'peer_port': 25672,
+                'sock_addr': f'10.0.1.{j}',
+                'sock_port': rng.randint(30000, 60000),
+                'recv_bytes': rng.randint(10 ** 6, 10 ** 10),
+                'recv_bytes_details': {'rate': round(rng.uniform(0, 10 ** 5), 1)},
+                'send_bytes': rng.randint(10 ** 6, 10 ** 10),
+                'send_bytes_details': {'rate': round(rng.uniform(0, 10 ** 5), 1)},
+            } for j, peer in enumerate(names) if peer != name],
+        }
+        for key in ('mnesia_disk_tx_count', 'mnesia_ram_tx_count', 'gc_num',
+                    'gc_bytes_reclaimed', 'io_read_avg_time', 'io_read_bytes',
+                    'io_write_avg_time', 'io_write_bytes'):
+            node[key], node[f'{key}_details'] = rng.randint(0, 10 ** 8), {'rate': round(rng.uniform(0, 100), 1)}
+        result.append(node)
+    return result
+
+
+def queues(count: int, node_count: int = 3, vhost_count: int = 100, seed: int = 0):
+    rng = random.Random(seed)
+    names = node_names(node_count)
+    for i in range(count):
+        ready = rng.choice((0, 0, 0, rng.randint(0, 10 ** 5)))
+        unacked = rng.choice((0, 0, rng.randint(0, 100)))
+        queue = {
+            'name': f'queue-{i}',
+            'vhost': f'tenant-{i % vhost_count}',
+            'node': names[i % node_count],
+            'type': 'quorum' if i % 4 == 0 else 'classic',
+            'state': 'running',
+            'durable': True,
+            'auto_delete': False,
+            'exclusive': False,
+            'arguments': {'x-queue-type': 'quorum' if i % 4 == 0 else 'classic'},
+            'consumers': rng.randint(0, 5),
+            'memory': rng.randint(10 ** 4, 10 ** 7),
+            'messages': ready + unacked,
+            'messages_ready': ready,
+            'messages_unacknowledged': unacked,
+            'messages_details': {'rate': 0.0},
+            'messages_ready_details': {'rate': 0.0},
+            'messages_unacknowledged_details': {'rate': 0.0},
+            'message_bytes': ready * 512,
+            'message_bytes_ready': ready * 512,
+            'message_bytes_unacknowledged': unacked * 512,
+            'message_bytes_ram': ready * 256,
+            'message_bytes_persistent': ready * 512,
+        }
+        if i % 3:
+            queue['message_stats'] = _message_stats(rng, ('publish', 'deliver', 'ack', 'redeliver',
+                                                           'deliver_get'))
+        yield queue
+
+
+def channels(count: int, node_count: int = 3, vhost_count: int = 100, seed: int = 0):
+    rng = random.Random(seed)
+    names = node_names(node_count)
+    for i in range(count):
+        channel = {
+            'name': f'10.0.2.{i % 250}:{40000 + i % 20000} -> 10.0.0.1:5672 ({i % 16 + 1})',
+            'number': i % 16 + 1,
+            'node': names[i % node_count],
+            'user': f'user-{i % 50}',
+            'vhost': f'tenant-{i % vhost_count}',
+            'state': 'running',
+            'confirm': bool(i % 2),
+            'transactional': False,
+            'prefetch_count': 10,
+            'consumer_count': rng.randint(0, 3),
+            'messages_unacknowledged': rng.randint(0, 10),
+            'messages_unconfirmed': rng.randint(0, 10),
+            'messages_uncommitted': 0,
+            'acks_uncommitted': 0,
+            'connection_details': {
+                'name': f'10.0.2.{i % 250}:{40000 + i % 20000} -> 10.0.0.1:5672',
+                'peer_host': f'10.0.2.{i % 250}',
+                'peer_port': 40000 + i % 20000,
+            },
+        }
+        if i % 2:
+            channel['message_stats'] = _message_stats(rng, (
+                'publish', 'confirm', 'deliver', 'deliver_no_ack', 'get', 'get_no_ack',
+                'redeliver', 'ack', 'drop_unroutable', 'return_unroutable', 'get_empty'))
+        yield channel
+
+
+def connections(count: int, node_count: int = 3, vhost_count: int = 100, seed: int = 0):
+    rng = random.Random(seed)
+    names = node_names(node_count)
+    for i in range(count):
+        yield {
+            'name': f'10.0.2.{i % 250}:{40000 + i % 20000} -> 10.0.0.1:5672',
+            'node': names[i % node_count],
+            'user': f'user-{i % 50}',
+            'vhost': f'tenant-{i % vhost_count}',
+            'state': 'running',
+            'protocol': 'AMQP 0-9-1',
+            'channels': rng.randint(1, 16),
+            'channel_max': 2047,
+            'frame_max': 131072,
+            'recv_oct': rng.randint(0, 10 ** 9),
+            'recv_oct_details': {'rate': round(rng.uniform(0, 10 ** 4), 1)},
+            'send_oct': rng.randint(0, 10 ** 9),
+            'send_oct_details': {'rate': round(rng.uniform(0, 10 ** 4), 1)},
+            'client_properties': {
+                'product': rng.choice(('RabbitMQ', 'pika', 'amqp-client')),
+                'connection_name': f'service-{i % 200}',
+                'capabilities': {'publisher_confirms': True, 'consumer_cancel_notify': True},
+            },
+        }
+
+
+def exchanges(count: int, vhost_count: int = 100, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        exchange = {
+            'name': f'exchange-{i}' if i % vhost_count else '',
+            'vhost': f'tenant-{i % vhost_count}',
+            'type': rng.choice(('direct', 'topic', 'fanout', 'headers')),
+            'durable': True,
+            'auto_delete': False,
+            'internal': False,
+            'arguments': {},
+        }
+        if i % 2:
+            exchange['message_stats'] = _message_stats(rng, ('publish_in', 'publish_out'))
+        yield exchange
+
+
+def overview():
+    return {
+        'cluster_name': CLUSTER_NAME,
+        'rabbitmq_version': RABBITMQ_VERSION,
+        'management_version': RABBITMQ_VERSION,
+        'erlang_version': '26.2.5',
+        'queue_totals': {'messages': 1000, 'messages_ready': 900, 'messages_unacknowledged': 100},
+        'message_stats': {'return_unroutable': 0, 'return_unroutable_details': {'rate': 0.0}},
+        'object_totals': {'channels': 100, 'connections': 40, 'consumers': 80,
+                          'exchanges': 50, 'queues': 100},
+    }
+
+
+GENERATORS = {
+    'queues': queues,
+    'channels': channels,
+    'connections': connections,
+    'exchanges': exchanges,
+}
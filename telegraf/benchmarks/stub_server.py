@@ -0,0 +1,150 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stub RabbitMQ management API replaying synthetic payloads.
+
+Supports the parts of the API the exporters use: ``columns=`` projection,
+``page``/``page_size`` pagination and per-vhost listings. Run it directly
+to point an exporter at it, or use ``StubServer`` to start it in a
+background thread.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+
+from aiohttp import web
+
+import payloads
+
+
+def _project(item, columns):
+    result = {}
+    for column in columns:
+        path = column.split('.')
+        source = item
+        for key in path[:-1]:
+            source = source.get(key) if isinstance(source, dict) else None
+        if not isinstance(source, dict) or path[-1] not in source:
+            continue
+        target = result
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = source[path[-1]]
+    return result
+
+
+class StubServer(object):
+
+    def __init__(self, size: int, node_count: int = 3, port: int = 0):
+        self.port = port
+        self.requests = {}
+        self._data = {
+            'overview': payloads.overview(),
+            'nodes': payloads.nodes(node_count),
+        }
+        for endpoint, generator in payloads.GENERATORS.items():
+            if endpoint == 'exchanges':
+                self._data[endpoint] = list(generator(size))
+            else:
+                self._data[endpoint] = list(generator(size, node_count=node_count))
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+    async def handle(self, request):
+        path = request.match_info['path'].split('/')
+        endpoint = path[0]
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if endpoint.startswith('aliveness-test'):
+            return web.json_response({'status': 'ok'})
+        data = self._data.get(endpoint)
+        if data is None:
+            raise web.HTTPNotFound()
+        if not isinstance(data, list):
+            return web.json_response(data)
+        if len(path) > 1 and path[1]:
+            data = [item for item in data if item.get('vhost') == path[1]]
+
+        columns = request.query.get('columns')
+        columns = columns.split(',') if columns else None
+        if 'page' not in request.query:
+            items = [_project(x, columns) for x in data] if columns else data
+            return web.Response(text=json.dumps(items), content_type='application/json')
+
+        page = int(request.query['page'])
+        page_size = int(request.query.get('page_size', 100))
+        page_count = max(1, -(-len(data) // page_size))
+        if page > page_count:
+            # as RabbitMQ answers for the pages of a listing that shrank
+            return web.json_response({'error': 'bad_request', 'reason': 'page_out_of_range'},
+                                     status=400)
+        items = data[(page - 1) * page_size:page * page_size]
+        if columns:
+            items = [_project(x, columns) for x in items]
+        return web.Response(text=json.dumps({
+            'filtered_count': len(data),
+            'item_count': len(items),
+            'items': items,
+            'page': page,
+            'page_count': page_count,
+            'page_size': page_size,
+            'total_count': len(data),
+        }), content_type='application/json')
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/api/{path:.*}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host='127.0.0.1', port=self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def start(self):
+        """Starts the server in a daemon thread with its own event loop."""
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return f'http://127.0.0.1:{self.port}'
+
+    def stop(self):
+        future = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=10000, help='objects per listing')
+    parser.add_argument('--nodes', type=int, default=3, help='cluster node count')
+    parser.add_argument('--port', type=int, default=15672)
+    args = parser.parse_args()
+    server = StubServer(args.size, node_count=args.nodes, port=args.port)
+    print(f'Serving {args.size} objects per listing on {server.start()}/api/')
+    threading.Event().wait()
+
+
+if __name__ == '__main__':
+    main()
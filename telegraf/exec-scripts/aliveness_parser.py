@@ -0,0 +1,63 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import exposition
+from exposition import Counter, Gauge, Histogram
+
+# The node label is empty unless probes are fanned out to every node.
+# Vhosts left out of a rotating batch keep their last values.
+_GRAPH = {}
+
+_GRAPH['rabbitmq_aliveness_up'] = Gauge(
+    'rabbitmq_aliveness_up',
+    'Whether the last aliveness probe of the vhost succeeded',
+    ['rabbitmq_cluster', 'vhost', 'node']
+)
+
+_GRAPH['rabbitmq_aliveness_duration_seconds'] = Histogram(
+    'rabbitmq_aliveness_duration_seconds',
+    'Duration of successful aliveness probes',
+    ['rabbitmq_cluster', 'vhost', 'node']
+)
+
+_GRAPH['rabbitmq_aliveness_latency_seconds'] = Gauge(
+    'rabbitmq_aliveness_latency_seconds',
+    'Quantiles of the duration of the recent successful aliveness probes',
+    ['rabbitmq_cluster', 'vhost', 'node', 'quantile']
+)
+
+_GRAPH['rabbitmq_aliveness_failures_total'] = Counter(
+    'rabbitmq_aliveness_failures_total',
+    'Failed or timed out aliveness probes',
+    ['rabbitmq_cluster', 'vhost', 'node']
+)
+
+
+def parse_aliveness(results, stats, cluster_name, expire=True):
+    """Records the probe ``results``; ``stats(vhost, node)`` returns the
+    cumulative ProbeStats of a vhost on a node, which outlive exec runs.
+    Rotating batches leave vhosts out of a cycle, so ``expire`` is off for
+    them."""
+    for result in results:
+        labels = (cluster_name, result.vhost, result.node)
+        probe_stats = stats(result.vhost, result.node)
+        _GRAPH['rabbitmq_aliveness_up'].labels(*labels).set(1 if result.ok else 0)
+        _GRAPH['rabbitmq_aliveness_duration_seconds'].labels(*labels).\
+            load(probe_stats.counts, probe_stats.sum)
+        _GRAPH['rabbitmq_aliveness_failures_total'].labels(*labels).set(probe_stats.failures)
+        for q, seconds in probe_stats.quantiles().items():
+            _GRAPH['rabbitmq_aliveness_latency_seconds'].\
+                labels(*labels, q).set(seconds)
+
+    return exposition.render(_GRAPH.values(), expire=expire)
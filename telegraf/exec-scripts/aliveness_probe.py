@@ -0,0 +1,196 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Aliveness probes of many vhosts, on every node.
+
+``aliveness-test/<vhost>`` declares a queue on the node serving the request
+and publishes and consumes one message through it, so it is timed per vhost
+and, in fan-out mode, per node. Probes run with bounded parallelism and
+their starts are spread over a part of the collection interval instead of
+hitting the cluster at once; large vhost sets can be probed in rotating
+batches.
+
+The cumulative outcome of the probes of every vhost and node (the latency
+window, the histogram buckets and the failures) is kept by the prober and,
+like the rotation cursor, carried across exec runs in the topology cache,
+so the exported histograms and counters keep growing between runs.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque, namedtuple
+
+import exposition
+import retry_policy
+from retry_policy import parse_duration
+
+logger = logging.getLogger(__name__)
+
+# '/' (the default), 'vhost-a,vhost-b', or '*' for every vhost; setting it
+# also adds the aliveness collector to prometheus.py
+VHOSTS = os.getenv('RABBITMQ_MONITORING_PROBE_VHOSTS', '')
+ENABLED = bool(VHOSTS)
+PARALLELISM = int(os.getenv('RABBITMQ_MONITORING_PROBE_PARALLELISM', 8))
+# vhosts probed per collection, rotating through all of them; 0 for all
+BATCH = int(os.getenv('RABBITMQ_MONITORING_PROBE_BATCH', 0))
+# raw, the default depends on the mode, see AlivenessProber
+SPREAD = os.getenv('RABBITMQ_MONITORING_PROBE_SPREAD')
+TIMEOUT = parse_duration(os.getenv('RABBITMQ_MONITORING_PROBE_TIMEOUT'), 5.0)
+# successful probes per vhost and node the latency percentiles are taken from
+WINDOW = int(os.getenv('RABBITMQ_MONITORING_PROBE_WINDOW', 60))
+QUANTILES = (0.5, 0.9, 0.99)
+
+ProbeResult = namedtuple('ProbeResult', ['vhost', 'node', 'seconds', 'ok'])
+
+
+def quantile(values, q: float) -> float:
+    """Nearest-rank quantile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class ProbeStats(object):
+    """Cumulative outcome of the probes of a vhost on a node; ``counts``
+    are per bucket of ``buckets``, not cumulative."""
+    __slots__ = ('latencies', 'buckets', 'counts', 'sum', 'failures')
+
+    def __init__(self, window: int, buckets=exposition.DEFAULT_BUCKETS):
+        self.latencies = deque(maxlen=window)
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.failures = 0
+
+    def observe(self, seconds: float):
+        self.latencies.append(seconds)
+        self.sum += seconds
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantiles(self) -> dict:
+        """Latency quantiles over the recent successful probes, {} without any."""
+        if not self.latencies:
+            return {}
+        return {q: quantile(self.latencies, q) for q in QUANTILES}
+
+    def dump(self) -> list:
+        return [[round(seconds, 6) for seconds in self.latencies], self.counts, self.sum, self.failures]
+
+    def load(self, state):
+        latencies, counts, total, failures = state
+        if len(counts) != len(self.counts):
+            raise ValueError('Bucket count changed')
+        self.latencies.extend(latencies)
+        self.counts, self.sum, self.failures = list(counts), total, failures
+
+
+class AlivenessProber(object):
+    """Picks the vhosts of every collection and runs their probes.
+
+    ``spread`` is the time over which probe starts are spread, by default
+    ``default_spread`` (0 in exec mode, where the script should finish
+    fast); it never takes more than half of the remaining scrape deadline.
+    """
+
+    def __init__(self, vhosts: str = VHOSTS, parallelism: int = PARALLELISM, batch: int = BATCH,
+                 spread: str = SPREAD, default_spread: float = 0.0, timeout: float = TIMEOUT,
+                 window: int = WINDOW):
+        vhosts = [vhost.strip() for vhost in (vhosts or '/').split(',') if vhost.strip()]
+        # None: every vhost of the cluster, listed on every collection
+        self.vhosts = None if '*' in vhosts else vhosts
+        self._parallelism = max(1, parallelism)
+        self._batch = batch
+        self._spread = parse_duration(spread, default_spread)
+        self._timeout = timeout
+        self._window = window
+        # (vhost, node) -> ProbeStats
+        self._stats = {}
+        self.cursor = 0
+
+    def select(self, vhosts) -> list:
+        """Returns the next batch of ``vhosts``, all of them without batching."""
+        vhosts = sorted(vhosts)
+        if self._batch <= 0 or len(vhosts) <= self._batch:
+            return vhosts
+        start = self.cursor % len(vhosts)
+        self.cursor = start + self._batch
+        return (vhosts[start:] + vhosts[:start])[:self._batch]
+
+    async def run(self, vhosts, nodes, request) -> list:
+        """Probes every vhost on every ``(node name, base URL)`` of ``nodes``.
+
+        ``request(vhost, base)`` returns whether the vhost is alive; a
+        failed, timed out or negative probe is reported as not ok.
+        """
+        probes = [(vhost, node, base) for vhost in vhosts for node, base in nodes]
+        if not probes:
+            return []
+        spread, timeout = self._spread, self._timeout
+        remaining = retry_policy.remaining()
+        if remaining is not None:
+            spread = min(spread, max(0.0, remaining / 2))
+            timeout = min(timeout, max(0.0, remaining))
+        step = spread / len(probes)
+        semaphore = asyncio.Semaphore(self._parallelism)
+
+        async def probe(index, vhost, node, base):
+            await asyncio.sleep(index * step)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    ok = await asyncio.wait_for(request(vhost, base), timeout)
+                except Exception as e:
+                    logger.warning(f'Aliveness probe of vhost {vhost} on {node or base or "cluster"} '
+                                   f'failed: {type(e).__name__}')
+                    ok = False
+                seconds = time.perf_counter() - start
+            stats = self.stats(vhost, node)
+            if ok:
+                stats.observe(seconds)
+            else:
+                stats.failures += 1
+            return ProbeResult(vhost, node, seconds, ok)
+
+        return await asyncio.gather(*[probe(index, *target) for index, target in enumerate(probes)])
+
+    def stats(self, vhost: str, node: str) -> ProbeStats:
+        stats = self._stats.get((vhost, node))
+        if stats is None:
+            stats = self._stats[(vhost, node)] = ProbeStats(self._window)
+        return stats
+
+    def prune(self, vhosts, nodes):
+        """Forgets the vhosts and nodes that are gone."""
+        vhosts, nodes = set(vhosts), set(nodes)
+        for key in [key for key in self._stats if key[0] not in vhosts or key[1] not in nodes]:
+            del self._stats[key]
+
+    def dump(self) -> dict:
+        """State carried across exec runs."""
+        return {'cursor': self.cursor,
+                'stats': [[vhost, node, *stats.dump()] for (vhost, node), stats in self._stats.items()]}
+
+    def load(self, state: dict):
+        self.cursor = state.get('cursor', 0)
+        for vhost, node, *stats in state.get('stats', []):
+            try:
+                self.stats(vhost, node).load(stats)
+            except (TypeError, ValueError):
+                # written by another version
+                self._stats.pop((vhost, node), None)
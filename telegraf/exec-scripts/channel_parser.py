@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import prometheus_client
-from prometheus_client import Gauge
+import exposition
+import rate_engine
+from exposition import Gauge
 
 _GRAPH = {}
 
@@ -96,98 +97,102 @@ _GRAPH['rabbitmq_channel_consumers'] = Gauge(
 )
 
 
+# Metric name -> channel field summed per node.
+_CHANNEL_FIELDS = {
+    'rabbitmq_channel_messages_unconfirmed': 'messages_unconfirmed',
+    'rabbitmq_channel_consumers': 'consumer_count',
+}
+
+# Metric name -> channel message_stats counter summed per node.
+_MESSAGE_STATS = {
+    'rabbitmq_channel_messages_published_total': 'publish',
+    'rabbitmq_channel_messages_redelivered_total': 'redeliver',
+    'rabbitmq_channel_messages_delivered_ack_total': 'deliver',
+    'rabbitmq_channel_messages_delivered_total': 'deliver_no_ack',
+    'rabbitmq_channel_get_ack_total': 'get',
+    'rabbitmq_channel_get_total': 'get_no_ack',
+    'rabbitmq_channel_messages_confirmed_total': 'confirm',
+    'rabbitmq_channel_messages_acked_total': 'ack',
+    'rabbitmq_channel_messages_unroutable_dropped_total': 'drop_unroutable',
+    'rabbitmq_channel_messages_unroutable_returned_total': 'return_unroutable',
+    'rabbitmq_channel_get_empty_total': 'get_empty',
+}
+
+# With local rates the message_stats totals are summed from the growth of
+# every channel's counters, so they do not drop when channels close.
+_RATE_GRAPH = {}
+
+_RATE_GRAPH['rabbitmq_channel_message_stats_rate'] = Gauge(
+    'rabbitmq_channel_message_stats_rate',
+    'Channel message stats / s, computed by the exporter',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'stat']
+)
+
+# Only these fields are requested from /api/channels (columns= projection).
+CHANNEL_COLUMNS = ['node'] + list(_CHANNEL_FIELDS.values()) + \
+    [f'message_stats.{x}' for x in _MESSAGE_STATS.values()]
+if rate_engine.LOCAL_RATES:
+    CHANNEL_COLUMNS.append('name')
+
+
+class ChannelTotals(object):
+    """Per-node channel aggregates, fed incrementally as channels are streamed."""
+
+    def __init__(self):
+        self.nodes = {}
+        self._rates = rate_engine.current() if rate_engine.LOCAL_RATES else None
+
+    def add(self, channels):
+        rates = self._rates
+        for channel in channels:
+            totals = self.nodes.get(channel["node"])
+            if totals is None:
+                totals = self.nodes[channel["node"]] = dict.fromkeys(_GRAPH, 0)
+            for key, field in _CHANNEL_FIELDS.items():
+                totals[key] += int(channel.get(field, 0))
+            message_stats = channel.get("message_stats")
+            if message_stats:
+                for key, field in _MESSAGE_STATS.items():
+                    totals[key] += int(message_stats.get(field, 0))
+            if rates is not None:
+                rates.observe('channels', channel["name"],
+                              [(message_stats or {}).get(field, 0) for field in _MESSAGE_STATS.values()],
+                              group=channel["node"])
+
+    def merge(self, other: 'ChannelTotals'):
+        for node, other_totals in other.nodes.items():
+            totals = self.nodes.get(node)
+            if totals is None:
+                self.nodes[node] = dict(other_totals)
+                continue
+            for key, value in other_totals.items():
+                totals[key] += value
+
+
+def render_channels(totals, nodes, cluster_name, rates=None):
+    """``rates`` is the rate engine the channels were observed into, with
+    their 'channels' namespace committed."""
+    empty = dict.fromkeys(_GRAPH, 0)
+
+    for node in dict.fromkeys([node["name"] for node in nodes] + list(totals.nodes)):
+        for key, value in totals.nodes.get(node, empty).items():
+            _GRAPH[key].labels(cluster_name, node).set(value)
+
+    if rates is None:
+        return exposition.render(_GRAPH.values())
+
+    for node, node_totals in rates.totals('channels').items():
+        for key, value in zip(_MESSAGE_STATS, node_totals):
+            _GRAPH[key].labels(cluster_name, node).set(value)
+    for node, node_rates in rates.group_rates('channels').items():
+        for field, value in zip(_MESSAGE_STATS.values(), node_rates):
+            _RATE_GRAPH['rabbitmq_channel_message_stats_rate'].\
+                labels(cluster_name, node, field).set(value)
+
+    return exposition.render(list(_GRAPH.values()) + list(_RATE_GRAPH.values()))
+
+
 def parse_channels(channels, nodes, cluster_name):
-    published_total = {}
-    redelivered_total = {}
-    delivered_ack = {}
-    delivered_no_ack = {}
-    get_ack = {}
-    get_no_ack = {}
-    confirmed = {}
-    ack = {}
-    drop_unroutable = {}
-    return_unroutable = {}
-    unconfirmed = {}
-    empty = {}
-    consumers = {}
-    connections = {}
-
-    for node in nodes:
-        if not node["name"] in published_total:
-            published_total[node["name"]] = 0
-            redelivered_total[node["name"]] = 0
-            delivered_ack[node["name"]] = 0
-            delivered_no_ack[node["name"]] = 0
-            get_ack[node["name"]] = 0
-            get_no_ack[node["name"]] = 0
-            confirmed[node["name"]] = 0
-            ack[node["name"]] = 0
-            drop_unroutable[node["name"]] = 0
-            return_unroutable[node["name"]] = 0
-            unconfirmed[node["name"]] = 0
-            empty[node["name"]] = 0
-            consumers[node["name"]] = 0
-            connections[node["name"]] = 0
-
-    for channel in channels:
-        unconfirmed[channel["node"]] += int(
-            channel.get("messages_unconfirmed", 0))
-        consumers[channel["node"]] += int(
-            channel.get("consumer_count", 0))
-        if channel.get("message_stats"):
-            published_total[channel["node"]] += int(
-                channel["message_stats"].get("publish", 0))
-            redelivered_total[channel["node"]] += int(
-                channel["message_stats"].get("redeliver", 0))
-            delivered_ack[channel["node"]] += int(
-                channel["message_stats"].get("deliver", 0))
-            delivered_no_ack[channel["node"]] += int(
-                channel["message_stats"].get("deliver_no_ack", 0))
-            get_ack[channel["node"]] += int(
-                channel["message_stats"].get("get", 0))
-            get_no_ack[channel["node"]] += int(
-                channel["message_stats"].get("get_no_ack", 0))
-            confirmed[channel["node"]] += int(
-                channel["message_stats"].get("confirm", 0))
-            ack[channel["node"]] += int(
-                channel["message_stats"].get("ack", 0))
-            drop_unroutable[channel["node"]] += int(
-                channel["message_stats"].get("drop_unroutable", 0))
-            return_unroutable[channel["node"]] += int(
-                channel["message_stats"].get("return_unroutable", 0))
-            empty[channel["node"]] += int(
-                channel["message_stats"].get("get_empty", 0))
-
-    for node in published_total:
-        _GRAPH['rabbitmq_channel_messages_published_total'].labels(
-            cluster_name, node).set(published_total[node])
-        _GRAPH['rabbitmq_channel_messages_redelivered_total'].labels(
-            cluster_name, node).set(redelivered_total[node])
-        _GRAPH['rabbitmq_channel_messages_delivered_ack_total'].labels(
-            cluster_name, node).set(delivered_ack[node])
-        _GRAPH['rabbitmq_channel_messages_delivered_total'].labels(
-            cluster_name, node).set(delivered_no_ack[node])
-        _GRAPH['rabbitmq_channel_get_ack_total'].labels(
-            cluster_name, node).set(get_ack[node])
-        _GRAPH['rabbitmq_channel_get_total'].labels(
-            cluster_name, node).set(get_no_ack[node])
-        _GRAPH['rabbitmq_channel_messages_confirmed_total'].labels(
-            cluster_name, node).set(confirmed[node])
-        _GRAPH['rabbitmq_channel_messages_acked_total'].labels(
-            cluster_name, node).set(ack[node])
-        _GRAPH['rabbitmq_channel_messages_unroutable_dropped_total'].labels(
-            cluster_name, node).set(drop_unroutable[node])
-        _GRAPH['rabbitmq_channel_messages_unroutable_returned_total'].labels(
-            cluster_name, node).set(return_unroutable[node])
-        _GRAPH['rabbitmq_channel_messages_unconfirmed'].labels(
-            cluster_name, node).set(unconfirmed[node])
-        _GRAPH['rabbitmq_channel_get_empty_total'].labels(
-            cluster_name, node).set(empty[node])
-        _GRAPH['rabbitmq_channel_consumers'].labels(
-            cluster_name, node).set(consumers[node])
-
-    res = []
-
-    for key in _GRAPH:
-        res.append(prometheus_client.generate_latest(_GRAPH[key]))
-    return res
+    totals = ChannelTotals()
+    totals.add(channels)
+    return render_channels(totals, nodes, cluster_name)
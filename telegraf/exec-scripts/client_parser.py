@@ -0,0 +1,285 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextvars
+import heapq
+import os
+import time
+
+import exposition
+from exposition import Gauge
+from retry_policy import parse_duration
+
+# Opt-in breakdown of connections and channels per client: user, vhost and
+# the connection_name (or else product) the client library reports. Only
+# the CLIENT_TOP_K clients with the most channels, unconfirmed messages and
+# publish rate are exported, up to CLIENT_MAX_SERIES series in total.
+CLIENT_TOP_K = int(os.getenv('RABBITMQ_MONITORING_CLIENT_TOP_K', 0))
+CLIENT_MAX_SERIES = int(os.getenv('RABBITMQ_MONITORING_CLIENT_MAX_SERIES', 500))
+# aggregation time per collection; pages arriving after it is spent are
+# skipped and the breakdown is reported as incomplete
+CLIENT_BUDGET = parse_duration(os.getenv('RABBITMQ_MONITORING_CLIENT_BUDGET'), 2.0)
+
+_GRAPH = {}
+
+_GRAPH['rabbitmq_client_connections'] = Gauge(
+    'rabbitmq_client_connections',
+    'Connections of the top clients',
+    ['rabbitmq_cluster', 'user', 'vhost', 'client']
+)
+
+_GRAPH['rabbitmq_client_channels'] = Gauge(
+    'rabbitmq_client_channels',
+    'Channels of the top clients',
+    ['rabbitmq_cluster', 'user', 'vhost', 'client']
+)
+
+_GRAPH['rabbitmq_client_messages_unconfirmed'] = Gauge(
+    'rabbitmq_client_messages_unconfirmed',
+    'Messages unconfirmed to the top clients',
+    ['rabbitmq_cluster', 'user', 'vhost', 'client']
+)
+
+_GRAPH['rabbitmq_client_messages_published_rate'] = Gauge(
+    'rabbitmq_client_messages_published_rate',
+    'Messages published by the top clients / s',
+    ['rabbitmq_cluster', 'user', 'vhost', 'client']
+)
+
+_GRAPH['rabbitmq_client_clients'] = Gauge(
+    'rabbitmq_client_clients',
+    'Distinct clients seen, exported or not',
+    ['rabbitmq_cluster']
+)
+
+_GRAPH['rabbitmq_client_breakdown_complete'] = Gauge(
+    'rabbitmq_client_breakdown_complete',
+    'Whether every client was aggregated within the time budget and series cap',
+    ['rabbitmq_cluster']
+)
+
+_CLIENT_METRICS = ('rabbitmq_client_connections', 'rabbitmq_client_channels',
+                   'rabbitmq_client_messages_unconfirmed', 'rabbitmq_client_messages_published_rate')
+# indexes into the per-client totals the clients are ranked by
+_RANKED_BY = (1, 2, 3)
+
+# Only these fields are requested (columns= projection).
+CLIENT_CONNECTION_COLUMNS = ['name', 'user', 'vhost', 'channels',
+                             'client_properties.connection_name', 'client_properties.product']
+CLIENT_CHANNEL_COLUMNS = ['connection_details.name', 'user', 'vhost', 'messages_unconfirmed',
+                          'message_stats.publish_details.rate']
+
+_budget = contextvars.ContextVar('client_budget', default=None)
+
+
+class Budget(object):
+    """Aggregation time left to the pages of one collection."""
+
+    def __init__(self, seconds: float = CLIENT_BUDGET):
+        self.left = seconds
+
+    @property
+    def exhausted(self) -> bool:
+        return self.left <= 0
+
+
+def start_budget(seconds: float = CLIENT_BUDGET):
+    """Starts the budget of a collection.
+
+    Totals created in tasks started from the current context afterwards,
+    which includes every page of the listings, share it.
+    """
+    _budget.set(Budget(seconds) if seconds else None)
+
+
+def client_name(connection) -> str:
+    properties = connection.get("client_properties") or {}
+    return str(properties.get("connection_name") or properties.get("product") or '')
+
+
+class _BudgetedTotals(object):
+
+    def __init__(self):
+        self._budget = _budget.get()
+        self.skipped = False
+
+    def add(self, items):
+        budget = self._budget
+        if budget is None:
+            self._add(items)
+            return
+        if budget.exhausted:
+            self.skipped = True
+            return
+        start = time.perf_counter()
+        self._add(items)
+        budget.left -= time.perf_counter() - start
+
+
+class ClientTotals(object):
+    """Per-client aggregates of one collection.
+
+    Connections and channels are joined on the connection name as their
+    pages are merged, and are only kept until they are: a connection until
+    the channels it reported are folded into its client, channels until
+    their connection is listed.
+    """
+
+    def __init__(self):
+        # (user, vhost, client) -> [connections, channels, unconfirmed, publish rate]
+        self.clients = {}
+        # connection name -> [client, channels not folded yet]
+        self._connections = {}
+        # connection name -> [user, vhost, channels, unconfirmed, publish rate]
+        # of the channels listed before their connection
+        self._channels = {}
+
+    def _client(self, client) -> list:
+        totals = self.clients.get(client)
+        if totals is None:
+            totals = self.clients[client] = [0, 0, 0, 0.0]
+        return totals
+
+    @staticmethod
+    def _fold(totals, stats) -> int:
+        """Adds the channel ``stats`` of a connection to its client's
+        ``totals`` and returns the number of channels."""
+        for i in range(1, 4):
+            totals[i] += stats[i + 1]
+        return stats[2]
+
+    def add_connections(self, connections: dict):
+        for name, (client, channels) in connections.items():
+            totals = self._client(client)
+            totals[0] += 1
+            pending = self._channels.pop(name, None)
+            if pending is not None:
+                channels -= self._fold(totals, pending)
+            if channels > 0:
+                self._connections[name] = [client, channels]
+
+    def add_channels(self, connections: dict):
+        for name, stats in connections.items():
+            connection = self._connections.get(name)
+            if connection is not None:
+                connection[1] -= self._fold(self._client(connection[0]), stats)
+                if connection[1] <= 0:
+                    del self._connections[name]
+                continue
+            pending = self._channels.get(name)
+            if pending is None:
+                self._channels[name] = stats
+                continue
+            for i in range(2, len(pending)):
+                pending[i] += stats[i]
+
+    def finish(self) -> dict:
+        """Returns the per-client aggregates, the channels whose connection
+        was not listed (opened in between) under their user and vhost."""
+        for stats in self._channels.values():
+            self._fold(self._client((stats[0], stats[1], '')), stats)
+        self._channels = {}
+        self._connections = {}
+        return self.clients
+
+
+class ClientConnectionTotals(_BudgetedTotals):
+    """Client and channel count of the connections of a page, folded into
+    the shared ClientTotals when merged."""
+
+    def __init__(self, totals: ClientTotals = None):
+        super().__init__()
+        self.totals = totals
+        # connection name -> ((user, vhost, client), channels)
+        self.connections = {}
+
+    def _add(self, connections):
+        page = self.connections
+        for connection in connections:
+            # the join waits for every channel unless the count is known
+            channels = connection.get("channels")
+            page[connection["name"]] = (
+                (connection.get("user", ''), connection.get("vhost", ''), client_name(connection)),
+                float('inf') if channels is None else int(channels))
+        if self.totals is not None:
+            self.totals.add_connections(page)
+            self.connections = {}
+
+    def merge(self, other: 'ClientConnectionTotals'):
+        self.totals.add_connections(other.connections)
+        self.skipped |= other.skipped
+
+
+class ClientChannelTotals(_BudgetedTotals):
+    """Channels, unconfirmed messages and publish rate per connection of a
+    page, folded into the shared ClientTotals when merged."""
+
+    def __init__(self, totals: ClientTotals = None):
+        super().__init__()
+        self.totals = totals
+        # connection name -> [user, vhost, channels, unconfirmed, publish rate]
+        self.connections = {}
+
+    def _add(self, channels):
+        connections = self.connections
+        for channel in channels:
+            name = (channel.get("connection_details") or {}).get("name", '')
+            totals = connections.get(name)
+            if totals is None:
+                totals = connections[name] = [channel.get("user", ''), channel.get("vhost", ''), 0, 0, 0.0]
+            totals[2] += 1
+            totals[3] += int(channel.get("messages_unconfirmed", 0))
+            message_stats = channel.get("message_stats")
+            if message_stats:
+                totals[4] += float(message_stats.get("publish_details", {}).get("rate", 0))
+        if self.totals is not None:
+            self.totals.add_channels(connections)
+            self.connections = {}
+
+    def merge(self, other: 'ClientChannelTotals'):
+        self.totals.add_channels(other.connections)
+        self.skipped |= other.skipped
+
+
+def render_clients(connections, channels, cluster_name, top_k=CLIENT_TOP_K,
+                   max_series=CLIENT_MAX_SERIES):
+    # both share the ClientTotals they were created with
+    clients = connections.totals.finish()
+
+    # the top clients change every scrape, so drop the previous ones
+    for metric in _CLIENT_METRICS:
+        _GRAPH[metric].clear()
+    top = {}
+    for index in _RANKED_BY:
+        for client, totals in heapq.nlargest(top_k, clients.items(), key=lambda item: item[1][index]):
+            top[client] = totals
+    capped = len(top) * len(_CLIENT_METRICS) > max_series
+    for client, totals in list(top.items())[:max_series // len(_CLIENT_METRICS)]:
+        for metric, value in zip(_CLIENT_METRICS, totals):
+            _GRAPH[metric].labels(cluster_name, *client).set(value)
+
+    _GRAPH['rabbitmq_client_clients'].labels(cluster_name).set(len(clients))
+    complete = not (capped or connections.skipped or channels.skipped)
+    _GRAPH['rabbitmq_client_breakdown_complete'].labels(cluster_name).set(1 if complete else 0)
+
+    return exposition.render(_GRAPH.values())
+
+
+def parse_clients(connections, channels, cluster_name):
+    totals = ClientTotals()
+    connection_totals = ClientConnectionTotals(totals)
+    connection_totals.add(connections)
+    channel_totals = ClientChannelTotals(totals)
+    channel_totals.add(channels)
+    return render_clients(connection_totals, channel_totals, cluster_name)
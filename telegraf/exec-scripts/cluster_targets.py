@@ -0,0 +1,102 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Many RabbitMQ clusters scraped by one exporter process.
+
+Every target is a subdirectory of the secrets directory holding the files
+of the single-cluster layout::
+
+    <RABBITMQ_MONITORING_SECRETS_DIR>/<target>/RABBITMQ_HOST
+    <RABBITMQ_MONITORING_SECRETS_DIR>/<target>/RABBITMQ_USER
+    <RABBITMQ_MONITORING_SECRETS_DIR>/<target>/RABBITMQ_PASSWORD
+
+The user and password default to the ones of the secrets directory itself.
+Targets are scraped concurrently, each in a task of its own with its own
+client, deadline, request limit and exposition scope, so a slow or failing
+cluster delays or fails only its own series, which are labelled with the
+target name.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import namedtuple
+
+import exposition
+import http_pool
+import retry_policy
+from management_api import get_secret_value, get_secrets_dir, management_url, read_secret
+from retry_policy import parse_duration
+
+logger = logging.getLogger(__name__)
+
+# 'cluster-a,cluster-b', or '*' for every subdirectory of the secrets directory
+TARGETS = os.getenv('RABBITMQ_MONITORING_TARGETS', '')
+ENABLED = bool(TARGETS)
+# requests in flight to one target at a time
+TARGET_REQUESTS = int(os.getenv('RABBITMQ_MONITORING_TARGET_REQUESTS', http_pool.POOL_LIMIT_PER_HOST))
+# the scrape of a target is abandoned after this; its retries stop
+# earlier, leaving time to render what was collected
+TARGET_DEADLINE = parse_duration(os.getenv('RABBITMQ_MONITORING_TARGET_DEADLINE'), retry_policy.DEADLINE)
+RETRY_DEADLINE = 0.8 * TARGET_DEADLINE
+
+Target = namedtuple('Target', ['name', 'host', 'user', 'password'])
+
+
+def load_targets(targets: str = TARGETS, secrets_dir: str = None) -> list:
+    """Reads the targets from the secrets directory; a target without a
+    RABBITMQ_HOST is skipped."""
+    secrets_dir = secrets_dir or get_secrets_dir()
+    names = [name.strip() for name in targets.split(',') if name.strip()]
+    if '*' in names:
+        try:
+            names = sorted(entry.name for entry in os.scandir(secrets_dir)
+                           if entry.is_dir() and not entry.name.startswith('.'))
+        except OSError as e:
+            logger.error(f'Cannot list the targets in {secrets_dir}: {type(e).__name__}')
+            names = []
+    result = []
+    for name in names:
+        directory = os.path.join(secrets_dir, name)
+        host = read_secret(directory, 'RABBITMQ_HOST')
+        if not host:
+            logger.error(f'Target {name} has no RABBITMQ_HOST in {directory}, skipped')
+            continue
+        result.append(Target(name, management_url(host),
+                             read_secret(directory, 'RABBITMQ_USER') or get_secret_value('RABBITMQ_USER'),
+                             read_secret(directory, 'RABBITMQ_PASSWORD') or
+                             get_secret_value('RABBITMQ_PASSWORD')))
+    return result
+
+
+async def run_targets(clients: dict, run, deadline: float = TARGET_DEADLINE) -> dict:
+    """Runs ``run(client)`` for the client of every target concurrently.
+
+    Returns target -> (result, seconds); the result of a target that failed
+    or did not finish within ``deadline`` is None.
+    """
+    async def run_target(target, client):
+        # the scope is set in the task of the target only
+        exposition.set_scope(target)
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(run(client), deadline or None)
+        except Exception as e:
+            logger.error(f'Cannot scrape target {target}: {type(e).__name__}')
+            result = None
+        return result, time.monotonic() - start
+
+    results = await asyncio.gather(*[run_target(target, client) for target, client in clients.items()])
+    return dict(zip(clients, results))
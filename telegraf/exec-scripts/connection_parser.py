@@ -12,8 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import prometheus_client
-from prometheus_client import Gauge
+import exposition
+from exposition import Gauge
 
 _GRAPH = {}
 
@@ -24,23 +24,36 @@ _GRAPH['rabbitmq_connections'] = Gauge(
 )
 
 
-def parse_connections(connections, nodes, cluster_name):
-    connections_count = {}
+# Only these fields are requested from /api/connections (columns= projection).
+CONNECTION_COLUMNS = ['node']
+
+
+class ConnectionTotals(object):
+    """Per-node connection counts, fed incrementally as connections are streamed."""
 
-    for node in nodes:
-        if not node["name"] in connections_count:
-            connections_count[node["name"]] = 0
+    def __init__(self):
+        self.connections_count = {}
 
-    for connection in connections:
-        connections_count[connection["node"]] += 1
+    def add(self, connections):
+        connections_count = self.connections_count
+        for connection in connections:
+            node = connection["node"]
+            connections_count[node] = connections_count.get(node, 0) + 1
 
-    for node in connections_count:
+    def merge(self, other: 'ConnectionTotals'):
+        for node, value in other.connections_count.items():
+            self.connections_count[node] = self.connections_count.get(node, 0) + value
+
+
+def render_connections(totals, nodes, cluster_name):
+    for node in dict.fromkeys([node["name"] for node in nodes] + list(totals.connections_count)):
         _GRAPH['rabbitmq_connections'].labels(cluster_name, node).\
-            set(connections_count[node])
+            set(totals.connections_count.get(node, 0))
 
-    res = []
+    return exposition.render(_GRAPH.values())
 
-    for key in _GRAPH:
-        res.append(prometheus_client.generate_latest(_GRAPH[key]))
 
-    return res
+def parse_connections(connections, nodes, cluster_name):
+    totals = ConnectionTotals()
+    totals.add(connections)
+    return render_connections(totals, nodes, cluster_name)
@@ -0,0 +1,96 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import exposition
+from exposition import Gauge
+
+# Erlang distribution links between the nodes, from the cluster_links of
+# /api/nodes. The erlang_vm_dist_* families of the rabbitmq_prometheus
+# plugin are left to the plugin, these are labelled by node and peer and
+# back the traffic and buffer panels of the chart's erlang-distribution
+# dashboard.
+_GRAPH = {}
+
+_GRAPH['rabbitmq_dist_link_send_bytes_total'] = Gauge(
+    'rabbitmq_dist_link_send_bytes_total',
+    'Bytes sent to the peer node over the distribution link',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'peer']
+)
+
+_GRAPH['rabbitmq_dist_link_recv_bytes_total'] = Gauge(
+    'rabbitmq_dist_link_recv_bytes_total',
+    'Bytes received from the peer node over the distribution link',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'peer']
+)
+
+_GRAPH['rabbitmq_dist_link_send_bytes_rate'] = Gauge(
+    'rabbitmq_dist_link_send_bytes_rate',
+    'Bytes sent to the peer node / s',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'peer']
+)
+
+_GRAPH['rabbitmq_dist_link_recv_bytes_rate'] = Gauge(
+    'rabbitmq_dist_link_recv_bytes_rate',
+    'Bytes received from the peer node / s',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'peer']
+)
+
+_GRAPH['rabbitmq_dist_link_send_pending_bytes'] = Gauge(
+    'rabbitmq_dist_link_send_pending_bytes',
+    'Bytes queued on the distribution link, when the broker reports them',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'peer']
+)
+
+# counter -> management API field of a link
+_COUNTERS = {
+    'send': 'send_bytes',
+    'recv': 'recv_bytes',
+}
+
+
+def link_stats(link) -> dict:
+    # the stats sit under 'stats' in the management API, some versions
+    # report them on the link itself
+    return link.get('stats') or link
+
+
+def parse_dist_links(nodes, cluster_name, rates=None):
+    """Rates are computed by the ``rates`` engine from the counters of the
+    previous collection; the rate reported by the management API (0 with
+    rates_mode=none) is used without an engine and for the first collection."""
+    for node in nodes:
+        node_name = node["name"]
+        for link in node.get("cluster_links") or []:
+            peer = link.get("name", '')
+            stats = link_stats(link)
+            counters = [(counter, field) for counter, field in _COUNTERS.items() if field in stats]
+            local = None
+            if rates is not None and counters:
+                local = rates.rates('dist_links', rates.observe(
+                    'dist_links', f'{node_name}|{peer}|{",".join(c for c, _ in counters)}',
+                    [stats[field] for _, field in counters]))
+            for i, (counter, field) in enumerate(counters):
+                _GRAPH[f'rabbitmq_dist_link_{counter}_bytes_total'].\
+                    labels(cluster_name, node_name, peer).set(stats[field])
+                rate = local[i] if local is not None else \
+                    (stats.get(f'{field}_details') or {}).get('rate', 0)
+                _GRAPH[f'rabbitmq_dist_link_{counter}_bytes_rate'].\
+                    labels(cluster_name, node_name, peer).set(rate)
+            if 'send_pend' in stats:
+                _GRAPH['rabbitmq_dist_link_send_pending_bytes'].\
+                    labels(cluster_name, node_name, peer).set(stats['send_pend'])
+    if rates is not None:
+        rates.commit('dist_links')
+
+    return exposition.render(_GRAPH.values())
@@ -0,0 +1,188 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import exposition
+from exposition import Counter, Gauge, Histogram
+
+# Durations are split per management endpoint so a slow scrape can be
+# attributed to the broker/network (request), JSON decoding, aggregation
+# (parse) or rendering. An exec run collects once and exits, so it exports
+# what its own collection took as gauges, summed over the requests of an
+# endpoint; the resident exporter accumulates histograms and counters over
+# its lifetime instead, see use_cumulative().
+_SIZE_BUCKETS = (2 ** 10, 2 ** 14, 2 ** 17, 2 ** 20, 2 ** 23, 2 ** 26, exposition.INF)
+
+_GRAPH = {}
+
+_GRAPH['rabbitmq_exporter_connections_opened_total'] = Gauge(
+    'rabbitmq_exporter_connections_opened_total',
+    'Management API connections opened by the exporter',
+    ['rabbitmq_cluster']
+)
+
+_GRAPH['rabbitmq_exporter_connections_reused_total'] = Gauge(
+    'rabbitmq_exporter_connections_reused_total',
+    'Management API requests served by a pooled keep-alive connection',
+    ['rabbitmq_cluster']
+)
+
+_GRAPH['rabbitmq_exporter_up'] = Gauge(
+    'rabbitmq_exporter_up',
+    'Whether every collector has served data within the max staleness',
+    ['rabbitmq_cluster']
+)
+
+_GRAPH['rabbitmq_exporter_collector_age_seconds'] = Gauge(
+    'rabbitmq_exporter_collector_age_seconds',
+    'Age of the data served for a collector',
+    ['rabbitmq_cluster', 'collector']
+)
+
+# name -> (labels, buckets or None for a counter, help of the accumulated
+# family, help of the gauge of one run)
+_ACCUMULATED = {
+    'rabbitmq_exporter_scrape_duration_seconds': (
+        ['rabbitmq_cluster'], exposition.DEFAULT_BUCKETS,
+        'Time to run all collectors once',
+        'Time to run all collectors once'),
+    'rabbitmq_exporter_request_duration_seconds': (
+        ['rabbitmq_cluster', 'endpoint'], exposition.DEFAULT_BUCKETS,
+        'Management API request latency, excluding decoding and parsing',
+        'Time spent in management API requests of this run, excluding decoding and parsing'),
+    'rabbitmq_exporter_response_size_bytes': (
+        ['rabbitmq_cluster', 'endpoint'], _SIZE_BUCKETS,
+        'Management API response body size',
+        'Management API response bodies read by this run'),
+    'rabbitmq_exporter_decode_duration_seconds': (
+        ['rabbitmq_cluster', 'endpoint'], exposition.DEFAULT_BUCKETS,
+        'Time spent decoding management API responses',
+        'Time spent decoding management API responses in this run'),
+    'rabbitmq_exporter_parse_duration_seconds': (
+        ['rabbitmq_cluster', 'endpoint'], exposition.DEFAULT_BUCKETS,
+        'Time spent aggregating decoded objects',
+        'Time spent aggregating decoded objects in this run'),
+    'rabbitmq_exporter_render_duration_seconds': (
+        ['rabbitmq_cluster', 'collector'], exposition.DEFAULT_BUCKETS,
+        'Time spent rendering the exposition of a collector',
+        'Time spent rendering the exposition of a collector in this run'),
+    'rabbitmq_exporter_objects_total': (
+        ['rabbitmq_cluster', 'endpoint'], None,
+        'Objects returned by the management API',
+        'Objects returned by the management API to this run'),
+    'rabbitmq_exporter_request_retries_total': (
+        ['rabbitmq_cluster', 'endpoint'], None,
+        'Management API requests retried after a failure',
+        'Management API requests retried after a failure in this run'),
+}
+
+for _name, (_labels, _, _, _documentation) in _ACCUMULATED.items():
+    _GRAPH[_name] = Gauge(_name, _documentation, _labels)
+
+_cumulative = False
+
+
+def use_cumulative():
+    """Accumulates the per-run gauges as histograms and counters from now
+    on, for an exporter that outlives its scrapes."""
+    global _cumulative
+    _cumulative = True
+    for name, (labels, buckets, documentation, _) in _ACCUMULATED.items():
+        if buckets is None:
+            _GRAPH[name] = Counter(name, documentation, labels)
+        else:
+            _GRAPH[name] = Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _observe(name, labels, value):
+    sample = _GRAPH[name].labels(*labels)
+    if _cumulative:
+        sample.observe(value)
+    else:
+        sample.inc(value)
+
+
+_GRAPH['rabbitmq_exporter_circuit_breaker_state'] = Gauge(
+    'rabbitmq_exporter_circuit_breaker_state',
+    'Circuit breaker of a management endpoint: 0 closed, 1 open, 2 half-open',
+    ['rabbitmq_cluster', 'endpoint']
+)
+
+# Targets of a multi-cluster exporter, rendered once for all of them
+_TARGET_GRAPH = {}
+
+_TARGET_GRAPH['rabbitmq_exporter_target_up'] = Gauge(
+    'rabbitmq_exporter_target_up',
+    'Whether the last scrape of the target completed within its deadline',
+    ['target']
+)
+
+_TARGET_GRAPH['rabbitmq_exporter_target_scrape_duration_seconds'] = Gauge(
+    'rabbitmq_exporter_target_scrape_duration_seconds',
+    'Duration of the last scrape of the target',
+    ['target']
+)
+
+
+def observe_target(target, up, seconds):
+    _TARGET_GRAPH['rabbitmq_exporter_target_up'].labels(target).set(1 if up else 0)
+    _TARGET_GRAPH['rabbitmq_exporter_target_scrape_duration_seconds'].labels(target).set(seconds)
+
+
+def parse_target_stats():
+    return exposition.render(_TARGET_GRAPH.values(), expire=False)
+
+
+def observe_request(cluster_name, endpoint, seconds, size, objects, decode_seconds):
+    labels = (cluster_name, endpoint)
+    _observe('rabbitmq_exporter_request_duration_seconds', labels, seconds)
+    _observe('rabbitmq_exporter_response_size_bytes', labels, size)
+    _observe('rabbitmq_exporter_decode_duration_seconds', labels, decode_seconds)
+    _GRAPH['rabbitmq_exporter_objects_total'].labels(*labels).inc(objects)
+
+
+def observe_parse(cluster_name, endpoint, seconds):
+    _observe('rabbitmq_exporter_parse_duration_seconds', (cluster_name, endpoint), seconds)
+
+
+def observe_render(cluster_name, collector, seconds):
+    _observe('rabbitmq_exporter_render_duration_seconds', (cluster_name, collector), seconds)
+
+
+def observe_retry(cluster_name, endpoint):
+    _GRAPH['rabbitmq_exporter_request_retries_total'].\
+        labels(cluster_name, endpoint).inc()
+
+
+def observe_scrape(cluster_name, seconds):
+    _observe('rabbitmq_exporter_scrape_duration_seconds', (cluster_name,), seconds)
+
+
+def observe_freshness(cluster_name, ages, up):
+    _GRAPH['rabbitmq_exporter_up'].labels(cluster_name).set(1 if up else 0)
+    for collector, age in ages.items():
+        _GRAPH['rabbitmq_exporter_collector_age_seconds'].\
+            labels(cluster_name, collector).set(age)
+
+
+def parse_exporter_stats(connection_stats, cluster_name, breaker_states=None):
+    _GRAPH['rabbitmq_exporter_connections_opened_total'].\
+        labels(cluster_name).set(connection_stats['opened'])
+    _GRAPH['rabbitmq_exporter_connections_reused_total'].\
+        labels(cluster_name).set(connection_stats['reused'])
+    for endpoint, state in (breaker_states or {}).items():
+        _GRAPH['rabbitmq_exporter_circuit_breaker_state'].\
+            labels(cluster_name, endpoint).set(state)
+
+    # rendered on every scrape, while requests are observed per collection
+    return exposition.render(_GRAPH.values(), expire=False)
@@ -0,0 +1,274 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal Prometheus text exposition writer.
+
+Produces the same samples as ``prometheus_client.generate_latest`` for
+gauges and counters, but HELP/TYPE headers and escaped label sets are rendered once per family
+and label set, and all families are written into a single list of strings
+that is joined once per scrape. Labels are written in declaration order,
+``le`` last, where prometheus_client sorts them by name.
+
+Every render of a family is one cycle of it. Label sets not updated during
+the last SERIES_EXPIRY cycles are dropped, so series of removed nodes or
+queues do not pile up in a resident exporter.
+
+A multi-cluster exporter updates and renders the families of every target
+in a scope of its own (see set_scope()); scopes keep their own series and
+cycles, and their series are labelled with the target.
+"""
+
+import contextvars
+import math
+import os
+
+INF = float('inf')
+MINUS_INF = float('-inf')
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 7.5, 10.0, INF)
+# 0 keeps every series for the life of the process
+SERIES_EXPIRY = int(os.getenv('RABBITMQ_MONITORING_SERIES_EXPIRY', 5))
+TARGET_LABEL = 'target'
+
+_scope = contextvars.ContextVar('exposition_scope', default=None)
+
+
+def set_scope(target: str = None):
+    """Sets the scope of the families updated and rendered in the current
+    context and the tasks started from it afterwards; None is the scope of
+    a single-cluster exporter, without the target label."""
+    _scope.set(target)
+
+
+def format_value(value) -> str:
+    value = float(value)
+    if value == INF:
+        return '+Inf'
+    elif value == MINUS_INF:
+        return '-Inf'
+    elif math.isnan(value):
+        return 'NaN'
+    s = repr(value)
+    dot = s.find('.')
+    # Go (and prometheus_client) switches to exponents sooner than Python
+    if value > 0 and dot > 6:
+        mantissa = f'{s[0]}.{s[1:dot]}{s[dot + 1:]}'.rstrip('0.')
+        return f'{mantissa}e+{dot - 1:02d}'
+    return s
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def escape_help(documentation: str) -> str:
+    return documentation.replace('\\', r'\\').replace('\n', r'\n')
+
+
+class _Sample(object):
+    __slots__ = ('prefix', 'value', 'generation')
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.value = 0.0
+        self.generation = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+def _label_pairs(labelnames, labelvalues, scope_pairs=()) -> list:
+    """Label pairs in declaration order followed by the scope's, as
+    prometheus_client renders them."""
+    return [f'{name}="{escape_label_value(value)}"'
+            for name, value in zip(labelnames, labelvalues)] + list(scope_pairs)
+
+
+class _Series(object):
+    """Label sets of a family in one scope."""
+    __slots__ = ('samples', 'generation', 'pairs')
+
+    def __init__(self, target: str = None):
+        self.samples = {}
+        # the cycle being collected, samples record the last one they were updated in
+        self.generation = 0
+        self.pairs = () if target is None else (f'{TARGET_LABEL}="{escape_label_value(target)}"',)
+
+
+class Gauge(object):
+    """Gauge family rendered straight into text.
+
+    Mirrors the ``labels(...).set(value)`` API of ``prometheus_client.Gauge``
+    so the parsers keep their shape; each label set is escaped only when it
+    is first seen.
+    """
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.header = f'# HELP {name} {escape_help(documentation)}\n# TYPE {name} {self.metric_type}\n'
+        self._labelnames = tuple(labelnames)
+        # scope -> _Series
+        self._scopes = {}
+
+    def _series(self) -> _Series:
+        scope = _scope.get()
+        series = self._scopes.get(scope)
+        if series is None:
+            series = self._scopes[scope] = _Series(scope)
+        return series
+
+    def _new_sample(self, labelvalues, scope_pairs):
+        pairs = _label_pairs(self._labelnames, labelvalues, scope_pairs)
+        if pairs:
+            prefix = f'{self.name}{{{",".join(pairs)}}} '
+        else:
+            prefix = f'{self.name} '
+        return _Sample(prefix)
+
+    def labels(self, *labelvalues):
+        series = self._series()
+        sample = series.samples.get(labelvalues)
+        if sample is None:
+            if len(labelvalues) != len(self._labelnames):
+                raise ValueError(f'Incorrect label count for {self.name}')
+            sample = series.samples[labelvalues] = self._new_sample(labelvalues, series.pairs)
+        sample.generation = series.generation
+        return sample
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def remove(self, *labelvalues):
+        self._series().samples.pop(labelvalues, None)
+
+    def clear(self):
+        self._series().samples.clear()
+
+    def expire(self, cycles: int = SERIES_EXPIRY):
+        """Ends the current cycle, dropping the label sets not updated
+        during the last ``cycles`` cycles (none with 0)."""
+        series = self._series()
+        if cycles > 0:
+            oldest = series.generation - cycles + 1
+            for labelvalues in [labelvalues for labelvalues, sample in series.samples.items()
+                                if sample.generation < oldest]:
+                del series.samples[labelvalues]
+        series.generation += 1
+
+    def render(self, out: list):
+        out.append(self.header)
+        for sample in self._series().samples.values():
+            out.append(f'{sample.prefix}{format_value(sample.value)}\n')
+
+
+class Counter(Gauge):
+    """Monotonic counter; the name is used as is, ``_total`` included."""
+
+    metric_type = 'counter'
+
+
+class _HistogramSample(object):
+    __slots__ = ('bucket_prefixes', 'count_prefix', 'sum_prefix', 'buckets', 'counts', 'sum',
+                 'generation')
+
+    def __init__(self, bucket_prefixes, count_prefix, sum_prefix, buckets):
+        self.bucket_prefixes = bucket_prefixes
+        self.count_prefix = count_prefix
+        self.sum_prefix = sum_prefix
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.generation = 0
+
+    def observe(self, value):
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def load(self, counts, total):
+        """Replaces the per-bucket counts and the sum with ones accumulated elsewhere."""
+        self.counts = list(counts)
+        self.sum = total
+
+
+class Histogram(Gauge):
+    """Histogram with cumulative ``_bucket`` samples plus ``_count`` and ``_sum``."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(buckets)
+
+    def _new_sample(self, labelvalues, scope_pairs):
+        pairs = _label_pairs(self._labelnames, labelvalues, scope_pairs)
+        bucket_prefixes = []
+        for bound in self._buckets:
+            bucket_pairs = pairs + [f'le="{format_value(bound)}"']
+            bucket_prefixes.append(f'{self.name}_bucket{{{",".join(bucket_pairs)}}} ')
+        labels = f'{{{",".join(pairs)}}}' if pairs else ''
+        return _HistogramSample(bucket_prefixes, f'{self.name}_count{labels} ',
+                                f'{self.name}_sum{labels} ', self._buckets)
+
+    def set(self, value):
+        raise TypeError('Histograms are updated with observe()')
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self, out: list):
+        out.append(self.header)
+        for sample in self._series().samples.values():
+            cumulative = 0
+            for prefix, count in zip(sample.bucket_prefixes, sample.counts):
+                cumulative += count
+                out.append(f'{prefix}{format_value(cumulative)}\n')
+            out.append(f'{sample.count_prefix}{format_value(cumulative)}\n')
+            out.append(f'{sample.sum_prefix}{format_value(sample.sum)}\n')
+
+
+def render(families, expire: bool = True) -> list:
+    """Renders the families into one list of text fragments.
+
+    Families updated by every collection end their cycle here; ``expire``
+    is off for families rendered more often than they are updated.
+    """
+    out = []
+    for family in families:
+        if expire:
+            family.expire()
+        family.render(out)
+    return out
+
+
+def merge(outputs) -> list:
+    """Merges the renders of several scopes, writing every family once
+    with the series of all of them."""
+    families = {}
+    for out in outputs:
+        samples = families.setdefault('', [])
+        for fragment in out:
+            if fragment.startswith('# HELP '):
+                samples = families.setdefault(fragment, [])
+            else:
+                samples.append(fragment)
+    return [fragment for header, samples in families.items() if header or samples
+            for fragment in (header, *samples) if fragment]
@@ -0,0 +1,96 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import ssl
+
+import aiohttp
+
+CA_CERT_PATH = '/tls/ca.crt'
+
+POOL_LIMIT = int(os.getenv('RABBITMQ_MONITORING_POOL_LIMIT', 16))
+POOL_LIMIT_PER_HOST = int(os.getenv('RABBITMQ_MONITORING_POOL_LIMIT_PER_HOST', 8))
+KEEPALIVE_TIMEOUT = float(os.getenv('RABBITMQ_MONITORING_KEEPALIVE_TIMEOUT', 30))
+
+_session = None
+# clusters sharing the pool, see set_clusters()
+_clusters = 1
+_ssl_contexts = {}
+# connections opened and reused per target, keyed by the trace_request_ctx
+# a request is sent with, see connection_stats()
+_stats = {}
+
+
+def get_ssl_context(cafile: str = CA_CERT_PATH):
+    """Returns the SSL context for ``cafile``, loading it only once per process.
+
+    ``None`` is returned when the CA certificate is not mounted.
+    """
+    if cafile not in _ssl_contexts:
+        _ssl_contexts[cafile] = ssl.create_default_context(cafile=cafile) \
+            if os.path.exists(cafile) else None
+    return _ssl_contexts[cafile]
+
+
+def _target_stats(trace_config_ctx) -> dict:
+    return _stats.setdefault(trace_config_ctx.trace_request_ctx, {'opened': 0, 'reused': 0})
+
+
+async def _on_connection_opened(session, trace_config_ctx, params):
+    _target_stats(trace_config_ctx)['opened'] += 1
+
+
+async def _on_connection_reused(session, trace_config_ctx, params):
+    _target_stats(trace_config_ctx)['reused'] += 1
+
+
+def set_clusters(count: int):
+    """Scales the pool limit to ``count`` clusters sharing the session of a
+    multi-cluster exporter, so one slow cluster cannot hold the connections
+    of all others; applies to sessions opened afterwards."""
+    global _clusters
+    _clusters = max(1, count)
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Returns the process-wide keep-alive session.
+
+    Credentials and SSL settings are passed per request, so one bounded
+    connection pool is shared by every helper talking to any host.
+    """
+    global _session
+    if _session is None or _session.closed:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(_on_connection_opened)
+        trace_config.on_connection_reuseconn.append(_on_connection_reused)
+        connector = aiohttp.TCPConnector(limit=POOL_LIMIT * _clusters,
+                                         limit_per_host=POOL_LIMIT_PER_HOST,
+                                         keepalive_timeout=KEEPALIVE_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector,
+                                         trace_configs=[trace_config])
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def connection_stats(target: str) -> dict:
+    """Returns the connections opened and reused by the requests sent with
+    ``trace_request_ctx=target``, so every cluster of a multi-cluster exporter
+    reports only its own."""
+    return dict(_stats.get(target, {'opened': 0, 'reused': 0}))
@@ -0,0 +1,520 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""InfluxDB line protocol collectors over the shared management API client.
+
+Used by influx.py for one exec run, and by the resident prometheus.py
+exporter to serve both formats from the same management API requests.
+Collectors return lines; queues and exchanges are written to the writer
+page by page instead when one is given.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+from typing import List
+
+import aiohttp
+
+import aliveness_probe
+import http_pool
+import json_codec
+import queue_shard
+import rate_engine
+import topology_cache
+from line_protocol import LineWriter, format_line
+from management_api import ManagementClient, ScrapeSnapshot, suppress_errors
+from retry_policy import parse_duration
+
+logger = logging.getLogger(__name__)
+
+SA_DIR_PATH = '/var/run/secrets/kubernetes.io/serviceaccount'
+# the desired replica count changes only on scaling, it is listed again
+# once the copy cached on the /tmp emptyDir is older than this
+REPLICAS_TTL = parse_duration(os.getenv('RABBITMQ_MONITORING_REPLICAS_TTL'), 60.0)
+# app label of the RabbitMQ statefulsets
+RABBITMQ_APP = 'rmqlocal'
+# a resident exporter watches the statefulsets instead; the API server ends
+# a watch after this, it is resumed from the last resourceVersion
+WATCH_TIMEOUT = 300
+WATCH_RETRY = 5.0
+
+OBJECT_KEYS_OVERVIEW = ["connections", "consumers"]
+
+KEYS_NODE = ['disk_free', 'disk_free_limit', 'fd_total',
+             'fd_used', 'mem_limit', 'mem_used', 'proc_total',
+             'proc_used', 'sockets_total', 'sockets_used',
+             'uptime', 'mnesia_disk_tx_count',
+             'mnesia_ram_tx_count', 'gc_num',
+             'gc_bytes_reclaimed', 'io_read_avg_time',
+             'io_read_bytes', 'io_write_avg_time',
+             'io_write_bytes']
+RATE_KEYS_NODE = ['mnesia_disk_tx_count', 'mnesia_ram_tx_count',
+                  'gc_num', 'gc_bytes_reclaimed',
+                  'io_read_avg_time', 'io_read_bytes',
+                  'io_write_bytes']
+# the RATE_KEYS_NODE that are counters, their rates can be computed locally
+COUNTER_KEYS_NODE = [x for x in RATE_KEYS_NODE if x != 'io_read_avg_time']
+BOOL_KEYS_NODE = ['disk_free_alarm', 'mem_alarm', 'running']
+
+KEYS_QUEUE = ['memory', 'message_bytes', 'message_bytes_ready',
+              'message_bytes_ram']
+
+# Opt-in bound on the exchange series: only the EXCHANGE_TOP_K exchanges
+# with the highest publish_in rate get a line, all others are summed into
+# one rabbitmq_exchange_other line per vhost and exchange type.
+EXCHANGE_TOP_K = int(os.getenv('RABBITMQ_MONITORING_EXCHANGE_TOP_K', 0))
+
+# Only these fields are requested from /api/queues and /api/exchanges.
+QUEUE_COLUMNS = ['name', 'vhost', 'node'] + KEYS_QUEUE + \
+    ['message_bytes_unacknowledged', 'message_bytes_persistent', 'message_stats']
+EXCHANGE_COLUMNS = ['name', 'vhost', 'type',
+                    'message_stats.publish_in', 'message_stats.publish_in_details.rate',
+                    'message_stats.publish_out', 'message_stats.publish_out_details.rate']
+EXCHANGE_FIELDS = ('messages_publish_in', 'messages_publish_in_rate',
+                   'messages_publish_out', 'messages_publish_out_rate')
+QUEUE_RATE_STATS = ('ack', 'deliver', 'publish', 'redeliver')
+EXCHANGE_RATE_STATS = ('publish_in', 'publish_out')
+
+
+def message_rates(namespace: str, identity: str, message_stats: dict, stats) -> tuple:
+    """Rates of the ``stats`` of an object: computed from the counters of
+    the previous collection with LOCAL_RATES, the ones the management API
+    reports otherwise and on the first collection."""
+    rates = rate_engine.current() if rate_engine.LOCAL_RATES else None
+    if rates is not None:
+        local = rates.rates(namespace, rates.observe(
+            namespace, identity, [message_stats.get(x, 0) for x in stats]))
+        if local is not None:
+            return local
+    return tuple(message_stats.get(f'{x}_details', {}).get('rate', 0) for x in stats)
+
+
+class QueueLines(object):
+    """Formats a line per queue, written to ``writer`` when merged into it."""
+
+    def __init__(self, writer: LineWriter = None):
+        self._writer = writer
+        self.lines = []
+
+    def add(self, queues):
+        for queue in queues:
+            fields = {
+                **{x: queue[x] for x in KEYS_QUEUE},
+                'message_bytes_unacked': queue[
+                    'message_bytes_unacknowledged'],
+                'message_bytes_persist': queue['message_bytes_persistent']
+            }
+
+            if 'message_stats' in queue:
+                message_stats = queue.get('message_stats', {})
+                rates = message_rates('queues', f"{queue['vhost']}/{queue['name']}",
+                                      message_stats, QUEUE_RATE_STATS)
+                fields.update({f'messages_{x}_rate': rate for x, rate in zip(QUEUE_RATE_STATS, rates)})
+
+            tags = {
+                "queue": queue['name'],
+                "vhost": queue['vhost'],
+                "node": queue['node']
+            }
+
+            self._append(format_line('rabbitmq_queue', fields, tags))
+
+    def _append(self, line):
+        if line is not None:
+            self.lines.append(line)
+
+    def _emit(self, lines):
+        if self._writer is None:
+            self.lines.extend(lines)
+        else:
+            self._writer.write_lines(lines)
+
+    def merge(self, other: 'QueueLines'):
+        self._emit(other.lines)
+
+
+def exchange_stats(message_stats: dict, rates: tuple) -> tuple:
+    """The EXCHANGE_FIELDS of an exchange, which may lack publish_out."""
+    return (message_stats.get('publish_in', 0), rates[0],
+            message_stats.get('publish_out', 0), rates[1])
+
+
+def exchange_line(vhost: str, name: str, exchange_type: str, stats: tuple):
+    tags = {
+        "type": exchange_type,
+        "vhost": vhost,
+    }
+    if name:
+        tags['exchange'] = name
+    return format_line('rabbitmq_exchange', dict(zip(EXCHANGE_FIELDS, stats)), tags)
+
+
+class ExchangeRanking(object):
+    """Keeps the ``k`` exchanges with the highest publish_in rate in a min-heap.
+
+    Exchanges pushed out of the heap are summed per vhost and type, so memory
+    stays O(k + vhosts * types) however many exchanges are streamed through.
+    """
+
+    def __init__(self, k: int = EXCHANGE_TOP_K):
+        self._k = k
+        # (publish_in rate, vhost, name, type, stats)
+        self.heap = []
+        # (vhost, type) -> [exchanges, *stats]
+        self.other = {}
+
+    def _roll_up(self, entry):
+        _, vhost, _, exchange_type, stats = entry
+        other = self.other.setdefault((vhost, exchange_type), [0] * (len(stats) + 1))
+        other[0] += 1
+        for i, value in enumerate(stats, 1):
+            other[i] += value
+
+    def push(self, entry):
+        if len(self.heap) < self._k:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            self._roll_up(heapq.heapreplace(self.heap, entry))
+        else:
+            self._roll_up(entry)
+
+    def merge(self, other: 'ExchangeRanking'):
+        for entry in other.heap:
+            self.push(entry)
+        for key, other_totals in other.other.items():
+            totals = self.other.setdefault(key, [0] * len(other_totals))
+            for i, value in enumerate(other_totals):
+                totals[i] += value
+
+    def lines(self) -> list:
+        lines = [exchange_line(vhost, name, exchange_type, stats)
+                 for _, vhost, name, exchange_type, stats in sorted(self.heap, reverse=True)]
+        lines.extend(format_line('rabbitmq_exchange_other',
+                                 {'exchanges': totals[0], **dict(zip(EXCHANGE_FIELDS, totals[1:]))},
+                                 {'type': exchange_type, 'vhost': vhost})
+                     for (vhost, exchange_type), totals in self.other.items())
+        return lines
+
+
+class ExchangeLines(QueueLines):
+    """Formats a line per exchange with message stats.
+
+    With a top-K the exchanges are ranked instead, and their lines are only
+    produced by ``finish()`` once the whole listing has been merged.
+    """
+
+    def __init__(self, writer: LineWriter = None, top_k: int = EXCHANGE_TOP_K):
+        super().__init__(writer)
+        self.ranking = ExchangeRanking(top_k) if top_k else None
+
+    def add(self, exchanges):
+        for exchange in exchanges:
+            message_stats = exchange.get('message_stats')
+            if not message_stats:
+                continue
+            stats = exchange_stats(message_stats, message_rates(
+                'exchanges', f"{exchange['vhost']}/{exchange['name']}", message_stats, EXCHANGE_RATE_STATS))
+            if self.ranking is not None:
+                self.ranking.push((stats[1], exchange['vhost'], exchange['name'],
+                                   exchange['type'], stats))
+                continue
+            self._append(exchange_line(exchange['vhost'], exchange['name'], exchange['type'], stats))
+
+    def merge(self, other: 'ExchangeLines'):
+        if self.ranking is None:
+            super().merge(other)
+        else:
+            self.ranking.merge(other.ranking)
+
+    def finish(self):
+        if self.ranking is not None:
+            self._emit(self.ranking.lines())
+
+
+class OpenshiftHelper(object):
+
+    def __init__(self):
+        # token location inside kubernetes pod by default
+        sa_dir_path = f'{SA_DIR_PATH}/token'
+        self._exists = os.path.exists(sa_dir_path)
+
+        # skip openshift metric collection outside Openshift
+        if self._exists:
+            self._namespace = os.environ['NAMESPACE']
+            self._url = f'https://{os.environ["KUBERNETES_SERVICE_HOST"]}:{os.environ["KUBERNETES_PORT_443_TCP_PORT"]}/'
+            with open(sa_dir_path) as f:
+                self._headers = {"authorization": "Bearer " + f.read()}
+            self._ssl = http_pool.get_ssl_context(f'{SA_DIR_PATH}/ca.crt') or False
+            self._cache = topology_cache.TopologyCache(f'{self._url}{self._namespace}')
+            self._cache.load()
+        # statefulset name -> replicas, kept current by watch_replicas()
+        self._watched = None
+
+    async def get_number_of_dc_replicas(self, dc_name: str):
+        """Sums the replicas of the statefulsets labelled ``app=<dc_name>``.
+
+        That is the one statefulset of the cluster, or one per node for
+        hostpath deployments. While watch_replicas() runs the watched count
+        is reported without a request. Otherwise the count is listed at most
+        once per REPLICAS_TTL; until then the cached count is reported
+        without a request, and after a failed listing as well. None outside
+        Kubernetes.
+        """
+        if not self._exists:
+            return None
+        if self._watched is not None:
+            return sum(self._watched.values())
+
+        cached, age = self._cache.get('replicas')
+        if cached is None or age >= REPLICAS_TTL:
+            try:
+                cached = await self._list_replicas(dc_name, cached)
+            except Exception as e:
+                if cached is None:
+                    raise
+                logger.warning(f'Cannot list statefulsets, using the cached replicas: {e!r}')
+            else:
+                self._cache.set('replicas', cached)
+
+        return cached['replicas']
+
+    def _statefulsets_url(self) -> str:
+        return f'{self._url}apis/apps/v1/namespaces/{self._namespace}/statefulsets'
+
+    async def _list_statefulsets(self, dc_name: str, params: dict = None) -> dict:
+        async with http_pool.get_session().get(
+                url=self._statefulsets_url(), params={'labelSelector': f'app={dc_name}', **(params or {})},
+                headers=self._headers, ssl=self._ssl) as resp:
+            resp.raise_for_status()
+            return await resp.json(loads=json_codec.loads)
+
+    async def _list_replicas(self, dc_name: str, cached: dict = None) -> dict:
+        params = {}
+        if cached is not None:
+            # any state at least as new as the cached one is good enough,
+            # which the API server answers from its watch cache
+            params.update(resourceVersion=cached['resource_version'],
+                          resourceVersionMatch='NotOlderThan')
+        statefulsets = await self._list_statefulsets(dc_name, params)
+
+        return {
+            'replicas': sum(item['spec'].get('replicas', 1) for item in statefulsets['items']),
+            'resource_version': statefulsets['metadata']['resourceVersion'],
+        }
+
+    async def watch_replicas(self, dc_name: str):
+        """Keeps the replicas of the statefulsets labelled ``app=<dc_name>``
+        current for a resident exporter, until cancelled.
+
+        The statefulsets are listed once and then watched from the
+        resourceVersion of the listing; an expired resourceVersion or a
+        failed watch lists them again. Returns at once outside Kubernetes.
+        """
+        if not self._exists:
+            return
+        while True:
+            try:
+                statefulsets = await self._list_statefulsets(dc_name)
+                self._watched = {item['metadata']['name']: item['spec'].get('replicas', 1)
+                                 for item in statefulsets['items']}
+                resource_version = statefulsets['metadata']['resourceVersion']
+                while resource_version is not None:
+                    resource_version = await self._watch(dc_name, resource_version)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Cannot watch statefulsets, listing them again: {e!r}')
+                # the TTL listing takes over until the watch is back
+                self._watched = None
+                await asyncio.sleep(WATCH_RETRY)
+
+    async def _watch(self, dc_name: str, resource_version: str):
+        """Applies the watch events to the watched replicas; returns the
+        resourceVersion to resume from, None when it has expired."""
+        params = {'labelSelector': f'app={dc_name}', 'watch': '1', 'resourceVersion': resource_version,
+                  'allowWatchBookmarks': 'true', 'timeoutSeconds': str(WATCH_TIMEOUT)}
+        async with http_pool.get_session().get(
+                url=self._statefulsets_url(), params=params, headers=self._headers, ssl=self._ssl,
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=WATCH_TIMEOUT + 30)) as resp:
+            resp.raise_for_status()
+            # one JSON event per line; a line may span several chunks
+            buffer = b''
+            async for chunk in resp.content.iter_any():
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    event = json_codec.loads(line)
+                    kind, item = event['type'], event['object']
+                    if kind == 'ERROR':
+                        # 410 Gone: the resourceVersion is too old to resume from
+                        logger.info(f'Statefulset watch ended: {item.get("message")}')
+                        return None
+                    resource_version = item['metadata']['resourceVersion']
+                    if kind in ('ADDED', 'MODIFIED'):
+                        self._watched[item['metadata']['name']] = item['spec'].get('replicas', 1)
+                    elif kind == 'DELETED':
+                        self._watched.pop(item['metadata']['name'], None)
+        return resource_version
+
+
+class InfluxSink(object):
+    """The influx.py metrics as collectors of a ManagementClient."""
+
+    # a sharded replica other than the first collects its queues only
+    COLLECTORS = queue_shard.collectors(('nodes', 'overview', 'smoketest', 'queues', 'exchanges',
+                                         'replicas', 'self_health'))
+
+    def __init__(self, client: ManagementClient, writer: LineWriter = None,
+                 os_helper: OpenshiftHelper = None):
+        self._client = client
+        self._writer = writer
+        self._os_helper = os_helper or OpenshiftHelper()
+        self._current_replicas = 0
+        self._all_replicas = None
+
+    def listings(self, name: str) -> list:
+        if name == 'queues':
+            return [('queues', QUEUE_COLUMNS, QueueLines(self._writer))]
+        if name == 'exchanges':
+            return [('exchanges', EXCHANGE_COLUMNS, ExchangeLines(self._writer))]
+        return []
+
+    @suppress_errors()
+    async def smoketest(self, snapshot: ScrapeSnapshot) -> List[str]:
+        # the slowest probe of the scrape, which is '/' unless more vhosts
+        # are probed (RABBITMQ_MONITORING_PROBE_VHOSTS)
+        results = await snapshot.get('aliveness')
+
+        fields = {}
+        if results and all(result.ok for result in results):
+            fields['duration'] = max(result.seconds for result in results)
+        else:
+            fields['duration'] = -1
+
+        lines = [format_line('rabbitmq_smoketest', fields)]
+        if aliveness_probe.ENABLED:
+            lines.extend(format_line('rabbitmq_aliveness',
+                                     {'duration': result.seconds if result.ok else -1,
+                                      'status': int(result.ok)},
+                                     {'vhost': result.vhost, 'node': result.node})
+                         for result in results)
+        return lines
+
+    @suppress_errors()
+    async def nodes(self, snapshot: ScrapeSnapshot) -> List[str]:
+        nodes = await snapshot.get('nodes')
+        metrics = {}
+
+        for node in nodes:
+            node_name = node['name']
+            healthcheck = node['running']
+            fields = {
+                **{x: node.get(x, -1) for x in KEYS_NODE},
+                **{f'{x}_rate': node.get(f'{x}_details', {}).get('rate', -1) for x in
+                   RATE_KEYS_NODE},
+                **{x: int(-1 if node.get(x) is None else node.get(x)) for x in BOOL_KEYS_NODE},
+            }
+            if healthcheck and rate_engine.LOCAL_RATES:
+                rates = self._client._rates
+                local = rates.rates('nodes', rates.observe(
+                    'nodes', node_name, [node.get(x, 0) for x in COUNTER_KEYS_NODE]))
+                if local is not None:
+                    fields.update({f'{x}_rate': rate for x, rate in zip(COUNTER_KEYS_NODE, local)})
+            if healthcheck:
+                fields['health_check_status'] = 1
+            else:
+                fields['health_check_status'] = 0
+                fields['uptime'] = 0
+            metrics[node_name] = format_line('rabbitmq_node', fields, {'node': node_name})
+        self._commit_rates('nodes')
+        self._current_replicas = len(list(filter(lambda x: x['running'], nodes)))
+        metrics['rabbitmq_current_replicas'] = format_line(
+            'rabbitmq_current_replicas', {'number': self._current_replicas})
+        return list(metrics.values())
+
+    @suppress_errors()
+    async def queues(self, snapshot: ScrapeSnapshot) -> List[str]:
+        queues = await snapshot.listing('queues', QueueLines)
+        self._commit_rates('queues')
+        return queues.lines
+
+    @suppress_errors()
+    async def exchanges(self, snapshot: ScrapeSnapshot) -> List[str]:
+        exchanges = await snapshot.listing('exchanges', ExchangeLines)
+        self._commit_rates('exchanges')
+        exchanges.finish()
+        return exchanges.lines
+
+    def _commit_rates(self, namespace: str):
+        if rate_engine.LOCAL_RATES:
+            self._client._rates.commit(namespace)
+
+    @suppress_errors()
+    async def overview(self, snapshot: ScrapeSnapshot) -> List[str]:
+        overview = await snapshot.get('overview')
+        fields = {}
+
+        queue_totals = overview['queue_totals']
+        if queue_totals:
+            fields['messages'] = queue_totals['messages']
+
+        message_stats = overview['message_stats']
+        if message_stats:
+            fields['return_unroutable_rate'] = \
+                message_stats['return_unroutable_details']['rate']
+
+        fields.update({x: overview['object_totals'][x] for x in
+                       OBJECT_KEYS_OVERVIEW})
+
+        return [format_line('rabbitmq_overview', fields)]
+
+    @suppress_errors()
+    async def replicas(self, snapshot: ScrapeSnapshot) -> List[str]:
+        self._all_replicas = await self._os_helper.get_number_of_dc_replicas(RABBITMQ_APP)
+        if self._all_replicas is None:
+            return []
+        return [format_line('rabbitmq_all_replicas', {'number': self._all_replicas})]
+
+    async def watch_replicas(self):
+        """Keeps the replica count current in a resident exporter, which
+        then reports it without a request; see OpenshiftHelper.watch_replicas()."""
+        if 'replicas' in self.COLLECTORS:
+            await self._os_helper.watch_replicas(RABBITMQ_APP)
+
+    @suppress_errors()
+    async def self_health(self, snapshot: ScrapeSnapshot) -> List[str]:
+        return [format_line('telegraf', {"status": 1})]
+
+    def cluster_state(self) -> List[str]:
+        if 'nodes' not in self.COLLECTORS:
+            # the running nodes are counted by the first shard
+            return []
+        if self._all_replicas:
+            status = self._current_replicas / self._all_replicas
+        else:
+            status = 0.0
+        return [format_line('rabbitmq_cluster_state', {'status': status})]
+
+    def exporter_stats(self) -> List[str]:
+        connection_stats = http_pool.connection_stats(self._client._host)
+        return [format_line('rabbitmq_exporter', {
+            'connections_opened': connection_stats['opened'],
+            'connections_reused': connection_stats['reused'],
+        })] + [format_line('rabbitmq_exporter_circuit_breaker', {'state': state},
+                           {'endpoint': endpoint})
+               for endpoint, state in self._client._breakers.states().items()]
@@ -0,0 +1,92 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""JSON codec with a native backend when one is installed.
+
+orjson is preferred, then ujson, then the stdlib ``json`` module;
+RABBITMQ_JSON_CODEC forces one of them. Native decoders reject some
+documents stdlib accepts (e.g. integers beyond 64 bits), those are
+decoded and encoded again with ``json``.
+
+Shipped as the same file in telegraf/exec-scripts and
+rabbitmq-backup-daemon/scripts, the two images are built separately;
+the dev build fails when the copies differ.
+"""
+
+import json
+import os
+
+
+def _orjson():
+    import orjson
+    return orjson.loads, orjson.dumps
+
+
+def _ujson():
+    import ujson
+
+    def dumps(obj) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    return ujson.loads, dumps
+
+
+def _json():
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    return json.loads, dumps
+
+
+BACKENDS = {
+    'orjson': _orjson,
+    'ujson': _ujson,
+    'json': _json,
+}
+
+
+def load_backend(name: str = None):
+    """Returns (name, loads, dumps) of the requested or the fastest installed backend."""
+    for candidate in [name] if name in BACKENDS else BACKENDS:
+        try:
+            return (candidate,) + BACKENDS[candidate]()
+        except ImportError:
+            continue
+    return ('json',) + _json()
+
+
+NAME, _loads, _dumps = load_backend(os.getenv('RABBITMQ_JSON_CODEC'))
+NATIVE = NAME != 'json'
+
+
+def loads(data):
+    """Decodes ``bytes`` or ``str``."""
+    try:
+        return _loads(data)
+    except ValueError:
+        if not NATIVE:
+            raise
+        return json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """Encodes compact UTF-8 JSON."""
+    try:
+        return _dumps(obj)
+    except (TypeError, ValueError, OverflowError):
+        # orjson.JSONEncodeError is a TypeError, ujson overflows
+        if not NATIVE:
+            raise
+        _, json_dumps = _json()
+        return json_dumps(obj)
@@ -0,0 +1,216 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import json
+import re
+import time
+
+import json_codec
+
+CHUNK_SIZE = 64 * 1024
+# With a native decoder, bodies up to this size (e.g. one page of a
+# listing) are decoded whole, which is faster than splitting them here.
+NATIVE_BODY_LIMIT = 16 * 1024 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+_START = 0
+_OBJECT_KEY = 1
+_OBJECT_COLON = 2
+_OBJECT_VALUE = 3
+_OBJECT_NEXT = 4
+_ARRAY_VALUE = 5
+_ARRAY_NEXT = 6
+_DONE = 7
+
+
+class JSONItemSplitter(object):
+    """Incrementally splits a JSON array into its elements.
+
+    The array is either the whole document or, when ``key`` is given, the
+    value of that key in a top-level object (e.g. ``items`` of a paginated
+    management API response). Other top-level keys are collected in
+    ``meta``. Only the unparsed tail of the input is buffered.
+    """
+
+    def __init__(self, key: str = None):
+        self._key = key
+        self._buffer = ''
+        self._state = _START
+        self._current_key = None
+        self.meta = {}
+
+    def _decode(self, buf, pos, final):
+        try:
+            value, end = _DECODER.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None, None
+        # a number at the very end of the buffer may continue in the next chunk
+        if end >= len(buf) and not final:
+            return None, None
+        return value, end
+
+    def feed(self, text: str, final: bool = False) -> list:
+        buf = self._buffer + text if self._buffer else text
+        items = []
+        pos = 0
+        length = len(buf)
+        state = self._state
+
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos >= length:
+                break
+            char = buf[pos]
+
+            if state == _START:
+                if char == '[':
+                    state = _ARRAY_VALUE
+                elif char == '{' and self._key is not None:
+                    state = _OBJECT_KEY
+                else:
+                    raise ValueError(f'Unexpected JSON document start: {char!r}')
+                pos += 1
+            elif state == _ARRAY_VALUE:
+                if char == ']':
+                    state = _OBJECT_NEXT if self._current_key else _DONE
+                    pos += 1
+                    continue
+                value, end = self._decode(buf, pos, final)
+                if end is None:
+                    break
+                items.append(value)
+                pos = end
+                state = _ARRAY_NEXT
+            elif state == _ARRAY_NEXT:
+                if char == ',':
+                    state = _ARRAY_VALUE
+                elif char == ']':
+                    state = _OBJECT_NEXT if self._current_key else _DONE
+                else:
+                    raise ValueError(f'Unexpected character in JSON array: {char!r}')
+                pos += 1
+            elif state == _OBJECT_KEY:
+                if char == '}':
+                    state = _DONE
+                    pos += 1
+                    continue
+                value, end = self._decode(buf, pos, final)
+                if end is None:
+                    break
+                self._current_key = value
+                pos = end
+                state = _OBJECT_COLON
+            elif state == _OBJECT_COLON:
+                if char != ':':
+                    raise ValueError(f'Unexpected character in JSON object: {char!r}')
+                pos += 1
+                state = _OBJECT_VALUE
+            elif state == _OBJECT_VALUE:
+                if self._current_key == self._key and char == '[':
+                    pos += 1
+                    state = _ARRAY_VALUE
+                    continue
+                value, end = self._decode(buf, pos, final)
+                if end is None:
+                    break
+                self.meta[self._current_key] = value
+                self._current_key = None
+                pos = end
+                state = _OBJECT_NEXT
+            elif state == _OBJECT_NEXT:
+                if char == ',':
+                    state = _OBJECT_KEY
+                elif char == '}':
+                    state = _DONE
+                else:
+                    raise ValueError(f'Unexpected character in JSON object: {char!r}')
+                self._current_key = None
+                pos += 1
+            else:
+                raise ValueError(f'Unexpected data after JSON document: {char!r}')
+
+        self._state = state
+        self._buffer = buf[pos:]
+        if final and (state != _DONE or self._buffer.strip()):
+            raise ValueError('Truncated JSON document')
+        return items
+
+    def load(self, document) -> list:
+        """Returns the elements of an already decoded document."""
+        if isinstance(document, dict) and self._key is not None:
+            items = document.pop(self._key, [])
+            self.meta.update(document)
+        elif isinstance(document, list):
+            items = document
+        else:
+            raise ValueError(f'Unexpected JSON document: {type(document).__name__}')
+        self._state = _DONE
+        return items
+
+
+class JSONItemStream(object):
+    """Streams the elements of a JSON array from an aiohttp response body.
+
+    ``async for item in stream`` yields one element at a time, ``batches()``
+    yields the elements decoded from each body chunk. Peak memory depends on
+    the chunk size, not on the length of the array.
+    """
+
+    def __init__(self, response, key: str = None, chunk_size: int = CHUNK_SIZE):
+        self._response = response
+        self._chunk_size = chunk_size
+        self._splitter = JSONItemSplitter(key)
+        # body size and time spent decoding it, for the exporter self-metrics
+        self.bytes_read = 0
+        self.decode_seconds = 0.0
+
+    @property
+    def meta(self) -> dict:
+        return self._splitter.meta
+
+    async def batches(self):
+        length = self._response.content_length
+        if json_codec.NATIVE and length is not None and length <= NATIVE_BODY_LIMIT:
+            body = await self._response.read()
+            self.bytes_read = len(body)
+            start = time.perf_counter()
+            items = self._splitter.load(json_codec.loads(body))
+            self.decode_seconds += time.perf_counter() - start
+            if items:
+                yield items
+            return
+
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        async for chunk in self._response.content.iter_chunked(self._chunk_size):
+            self.bytes_read += len(chunk)
+            start = time.perf_counter()
+            items = self._splitter.feed(decoder.decode(chunk))
+            self.decode_seconds += time.perf_counter() - start
+            if items:
+                yield items
+        start = time.perf_counter()
+        items = self._splitter.feed(decoder.decode(b'', final=True), final=True)
+        self.decode_seconds += time.perf_counter() - start
+        if items:
+            yield items
+
+    async def __aiter__(self):
+        async for items in self.batches():
+            for item in items:
+                yield item
@@ -0,0 +1,108 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal InfluxDB line protocol writer.
+
+Points are formatted into lines as collectors produce them and written to
+the output in batches of BATCH_LINES, so a collector emitting a line per
+queue never holds more than one batch of output in memory.
+"""
+
+import logging
+import math
+import sys
+
+logger = logging.getLogger(__name__)
+
+BATCH_LINES = 1000
+
+_MEASUREMENT_ESCAPES = str.maketrans({',': r'\,', ' ': r'\ ', '\n': r'\n'})
+# tag keys, tag values and field keys
+_KEY_ESCAPES = str.maketrans({',': r'\,', '=': r'\=', ' ': r'\ ', '\n': r'\n'})
+
+
+def escape_measurement(name: str) -> str:
+    return name.translate(_MEASUREMENT_ESCAPES)
+
+
+def escape_key(key) -> str:
+    return str(key).translate(_KEY_ESCAPES)
+
+
+def format_field_value(value):
+    """Formats a field value, None for values line protocol cannot carry."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, str):
+        return '"' + value.replace('\\', r'\\').replace('"', r'\"') + '"'
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    # integers are written without the 'i' suffix, as floats, which keeps
+    # the field types of the already stored series
+    return str(value)
+
+
+def format_line(name: str, fields: dict, tags: dict = None):
+    """Returns the line of one point, or None when no field has a value.
+
+    Tags with an empty value are left out, line protocol does not allow them.
+    """
+    field_set = ','.join(f'{escape_key(key)}={value}' for key, value in
+                         ((key, format_field_value(value)) for key, value in fields.items())
+                         if value is not None)
+    if not field_set:
+        return None
+    tag_set = ''.join(f',{escape_key(key)}={escape_key(value)}'
+                      for key, value in (tags or {}).items() if value not in (None, ''))
+    return f'{escape_measurement(name)}{tag_set} {field_set}'
+
+
+class LineWriter(object):
+    """Writes points to ``stream`` (stdout by default) in batches of lines."""
+
+    def __init__(self, stream=None, batch_lines: int = BATCH_LINES):
+        self._stream = stream
+        self._batch_lines = batch_lines
+        self._batch = []
+        self.lines = 0
+
+    def write(self, name: str, fields: dict, tags: dict = None):
+        self.write_lines([format_line(name, fields, tags)])
+
+    def write_lines(self, lines):
+        """Writes already formatted lines, None entries are skipped."""
+        for line in lines:
+            if line is None:
+                continue
+            self._batch.append(line)
+            if len(self._batch) >= self._batch_lines:
+                self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        chunk = '\n'.join(self._batch)
+        logger.debug('Metrics: %s', chunk)
+        (self._stream or sys.stdout).write(chunk + '\n')
+        self.lines += len(self._batch)
+        self._batch.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+        (self._stream or sys.stdout).flush()
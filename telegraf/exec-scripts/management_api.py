@@ -0,0 +1,534 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Management API client and collector engine shared by the exec-scripts.
+
+Collectors of every output format (sinks) run over one ScrapeSnapshot per
+cycle: each endpoint is requested once, and a listing needed by several
+sinks is paged through once with the columns of all of them, its objects
+fed into the totals of every subscribed collector.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from functools import wraps
+from urllib.parse import quote, urlsplit
+
+import aiohttp
+
+import aliveness_probe
+import exporter_parser
+import http_pool
+import json_codec
+import json_stream
+import node_fanout
+import queue_shard
+import rate_engine
+import retry_policy
+import topology_cache
+from retry_policy import parse_duration, retry
+
+logger = logging.getLogger(__name__)
+
+# Listings such as /api/queues are fetched page by page (500 is the
+# management API maximum), with up to PAGE_PARALLELISM pages in flight.
+PAGE_SIZE = int(os.getenv('RABBITMQ_MONITORING_PAGE_SIZE', 500))
+PAGE_PARALLELISM = int(os.getenv('RABBITMQ_MONITORING_PAGE_PARALLELISM', 4))
+# cluster name and version change only on rename or upgrade, the overview
+# they come from is re-requested once it is older than this (including the
+# copy cached on disk across exec runs)
+OVERVIEW_TTL = parse_duration(os.getenv('RABBITMQ_MONITORING_OVERVIEW_TTL'), 300.0)
+OVERVIEW_KEYS = ('cluster_name', 'rabbitmq_version')
+
+
+def get_secrets_dir() -> str:
+    return os.getenv("RABBITMQ_MONITORING_SECRETS_DIR", "/etc/secrets/rabbitmq-monitoring-pod-secrets")
+
+
+def read_secret(secrets_dir, key) -> str:
+    if secrets_dir:
+        path = os.path.join(secrets_dir, key)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read().strip()
+    return ""
+
+
+def get_secret_value(key):
+    return read_secret(get_secrets_dir(), key) or os.getenv(key, "")
+
+
+def management_url(host: str) -> str:
+    """RABBITMQ_HOST is either a URL or the bare host of the management plugin."""
+    host = host.rstrip('/')
+    return host if '://' in host else f'http://{host}:15672'
+
+
+def suppress_errors(return_func=lambda: []):
+    def wrapper(f):
+
+        @wraps(f)
+        def internal_wrapper(*args, **kwargs):
+            async def async_await():
+                try:
+                    return await f(*args, **kwargs)
+                except BaseException as e:
+                    logging.error(e)
+                    return return_func()
+
+            return async_await()
+
+        return internal_wrapper
+
+    return wrapper
+
+
+def _endpoint(url: str) -> str:
+    path = url.split('?', 1)[0]
+    # the per-vhost queue listings of a shard are one endpoint
+    if path.startswith('queues/'):
+        return 'queues/{vhost}'
+    return path
+
+
+def _count_retry(client: 'ManagementClient', url: str, *args, **kwargs):
+    # retries of the first overview request happen before the cluster is known
+    if client._cluster_name is not None:
+        exporter_parser.observe_retry(client._cluster_name, _endpoint(url))
+
+
+def _breaker(client: 'ManagementClient', url: str, *args, base: str = None, **kwargs):
+    if base is None:
+        return client._breakers.get(_endpoint(url))
+    return client._breakers.get(f'{_endpoint(url)}@{urlsplit(base).hostname}')
+
+
+def merge_columns(*column_lists) -> list:
+    """Unites ``columns=`` projections, dropping columns already covered
+    by a requested parent object ('message_stats' covers
+    'message_stats.publish')."""
+    columns = []
+    for column in (column for column_list in column_lists for column in column_list):
+        if column not in columns:
+            columns.append(column)
+    return [column for column in columns
+            if not any(column.startswith(f'{parent}.') for parent in columns)]
+
+
+class TeeTotals(object):
+    """Feeds the objects of one listing into the totals of every subscriber."""
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def add(self, items):
+        for totals in self.totals:
+            totals.add(items)
+
+    def merge(self, other: 'TeeTotals'):
+        for totals, other_totals in zip(self.totals, other.totals):
+            totals.merge(other_totals)
+
+
+class ScrapeSnapshot(object):
+    """Per-scrape view of the management API.
+
+    Every endpoint is requested at most once per scrape; collectors asking
+    for the same endpoint concurrently await the same in-flight future.
+    Listings are subscribed to before the collectors run and paged through
+    once, on the first ``listing()`` call, for all subscribers.
+    """
+
+    def __init__(self, request, request_pages):
+        self._request = request
+        self._request_pages = request_pages
+        self._futures = {}
+        # url -> (columns, {totals type: totals})
+        self._subscriptions = {}
+        self.succeeded = 0
+        self.failed = 0
+
+    def _track(self, future: asyncio.Future) -> asyncio.Future:
+        future.add_done_callback(self._count)
+        return future
+
+    def _count(self, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.succeeded += 1
+
+    def get(self, url: str) -> asyncio.Future:
+        future = self._futures.get(url)
+        if future is None:
+            future = self._track(asyncio.ensure_future(self._request(url)))
+            self._futures[url] = future
+        return future
+
+    def subscribe(self, url: str, columns, totals):
+        subscribed_columns, consumers = self._subscriptions.setdefault(url, ([], {}))
+        subscribed_columns.extend(columns)
+        consumers[type(totals)] = totals
+
+    async def listing(self, url: str, totals_type):
+        """Returns the subscribed ``totals_type`` totals of the listing at ``url``."""
+        columns, consumers = self._subscriptions[url]
+        key = ('listing', url)
+        future = self._futures.get(key)
+        if future is None:
+            future = self._track(asyncio.ensure_future(
+                self._fetch_listing(url, merge_columns(columns), list(consumers.values()))))
+            self._futures[key] = future
+        await future
+        return consumers[totals_type]
+
+    def close(self):
+        """Cancels the requests still in flight, e.g. when the scrape itself
+        was cancelled on its deadline while collectors awaited them."""
+        for future in self._futures.values():
+            future.cancel()
+
+    async def _fetch_listing(self, url: str, columns, consumers):
+        if len(consumers) == 1:
+            return await self._request_pages(url, columns, consumers[0])
+        await self._request_pages(url, columns, TeeTotals(consumers),
+                                  lambda: TeeTotals([type(totals)() for totals in consumers]))
+
+
+class ManagementClient(object):
+    """Requests the management API at ``host`` for the collectors of all sinks.
+
+    Sinks are objects with collector coroutines taking the ScrapeSnapshot,
+    and a ``listings(name)`` method declaring the (url, columns, totals)
+    listings a collector reads with ``snapshot.listing()``.
+    """
+
+    def __init__(self, host: str, user: str, password: str, probe_spread: float = 0.0,
+                 rate_state: str = None, max_requests: int = 0):
+        self._host = host
+        self._auth = aiohttp.BasicAuth(user, password)
+        # requests in flight to this cluster, unbounded with 0; the pool
+        # limits apply on top of it
+        self._requests = asyncio.Semaphore(max_requests) if max_requests > 0 else None
+        self._breakers = retry_policy.CircuitBreakers()
+        self._fanout = node_fanout.NodeFanout(host) if node_fanout.FANOUT else None
+        self._overview = None
+        self._overview_updated = None
+        self._cluster_name = None
+        # a fresh cached cluster name lets the collectors start right away,
+        # otherwise the first scrape requests the overview first
+        self._topology = topology_cache.TopologyCache(host)
+        self._topology.load()
+        overview, age = self._topology.get('overview')
+        if overview is not None and age < OVERVIEW_TTL:
+            self._set_overview(overview, age)
+        nodes, age = self._topology.get('nodes')
+        if self._fanout is not None and nodes is not None and age < node_fanout.DISCOVERY_INTERVAL:
+            self._fanout.update(nodes, age)
+        self._prober = aliveness_probe.AlivenessProber(default_spread=probe_spread)
+        # exec runs continue the rotation through the vhosts where the last
+        # one stopped, and the histograms and counters of the probes, in the
+        # 'aliveness-<rate_state>' file
+        self._probe_state = topology_cache.TopologyCache(
+            host, topology_cache.CACHE_DIR if rate_state else None, name=f'aliveness-{rate_state}')
+        self._probe_state.load()
+        aliveness, _ = self._probe_state.get('prober')
+        if aliveness is not None:
+            self._prober.load(aliveness)
+        # counters of the previous collection, kept in the '<rate_state>'
+        # state file across exec runs, in memory only without a name
+        self._rates = rate_engine.RateEngine(host, rate_state or 'memory',
+                                             cache_dir=topology_cache.CACHE_DIR if rate_state else None)
+        self._rates.load()
+        # an exec run keeps the endpoints the previous runs found failing
+        # closed until their cool-off ends, see _store_breakers()
+        self._breaker_state = topology_cache.TopologyCache(
+            host, topology_cache.CACHE_DIR if rate_state else None, name=f'breakers-{rate_state}')
+        self._breaker_state.load()
+        breakers, _ = self._breaker_state.get('breakers')
+        if breakers is not None:
+            try:
+                self._breakers.load(breakers)
+            except (TypeError, ValueError):
+                logger.warning('Cannot restore the circuit breakers, starting closed')
+                self._breakers = retry_policy.CircuitBreakers()
+        self._stored_breakers = self._breakers.dump()
+
+    @property
+    def cluster_name(self) -> str:
+        """Name of the cluster, None until the overview has been read."""
+        return self._cluster_name
+
+    def _set_overview(self, overview: dict, age: float = 0.0):
+        self._overview = {key: overview[key] for key in OVERVIEW_KEYS if key in overview}
+        self._overview_updated = time.monotonic() - age
+        self._cluster_name = overview['cluster_name']
+
+    async def _cached_overview(self, snapshot: ScrapeSnapshot) -> dict:
+        if self._overview is None or time.monotonic() - self._overview_updated >= OVERVIEW_TTL:
+            try:
+                self._set_overview(await snapshot.get('overview'))
+            except Exception as e:
+                if self._overview is None:
+                    raise
+                # the version is served from the previous overview meanwhile
+                logger.warning(f'Cannot refresh overview: {type(e).__name__}')
+            else:
+                self._topology.set('overview', self._overview)
+        return self._overview
+
+    def _invalidate_topology(self):
+        """Forgets the cached overview and nodes after a failed scrape.
+
+        The cluster behind RABBITMQ_HOST may have been recreated, so the next
+        scrape requests them again instead of trusting the cache.
+        """
+        self._topology.invalidate()
+        if self._overview is not None:
+            self._overview_updated = time.monotonic() - OVERVIEW_TTL
+        if self._fanout is not None:
+            self._fanout.expire()
+
+    @contextlib.asynccontextmanager
+    async def _get(self, url: str, base: str = None):
+        """GET of ``/api/<url>``, holding a request slot until the response is read."""
+        if self._requests is not None:
+            await self._requests.acquire()
+        try:
+            async with http_pool.get_session().get(
+                    url=f'{base or self._host}/api/{url}', auth=self._auth,
+                    ssl=http_pool.get_ssl_context(),
+                    # node fan-out requests are counted under the cluster too
+                    trace_request_ctx=self._host) as resp:
+                yield resp
+        finally:
+            if self._requests is not None:
+                self._requests.release()
+
+    @retry(breaker=_breaker, on_retry=_count_retry)
+    async def _request(self, url: str, base: str = None):
+        start = time.perf_counter()
+        async with self._get(url, base) as resp:
+            resp.raise_for_status()
+            body = await resp.read()
+        received = time.perf_counter()
+        result = json_codec.loads(body)
+        decoded = time.perf_counter()
+        if url == 'overview' and self._cluster_name is None:
+            # the cluster name this request is reported under comes with it
+            self._set_overview(result)
+        exporter_parser.observe_request(
+            self._cluster_name, _endpoint(url), seconds=received - start, size=len(body),
+            objects=len(result) if isinstance(result, list) else 1,
+            decode_seconds=decoded - received)
+        return result
+
+    @retry(breaker=_breaker, on_retry=_count_retry)
+    async def _request_page(self, url: str, totals_type, base: str = None):
+        """Streams one page of a listing into fresh ``totals_type`` aggregates.
+
+        Objects are decoded one body chunk at a time, so a page never has to
+        be materialized; a retried attempt starts again from empty totals.
+        """
+        totals = totals_type()
+        objects = 0
+        parse_seconds = 0.0
+        start = time.perf_counter()
+        async with self._get(url, base) as resp:
+            resp.raise_for_status()
+            stream = json_stream.JSONItemStream(resp, key='items')
+            async for items in stream.batches():
+                parse_start = time.perf_counter()
+                totals.add(items)
+                parse_seconds += time.perf_counter() - parse_start
+                objects += len(items)
+        # decoding and aggregation are interleaved with reading the body,
+        # only the remainder is attributed to the request itself
+        elapsed = time.perf_counter() - start
+        endpoint = _endpoint(url)
+        exporter_parser.observe_request(
+            self._cluster_name, endpoint, seconds=elapsed - stream.decode_seconds - parse_seconds,
+            size=stream.bytes_read, objects=objects, decode_seconds=stream.decode_seconds)
+        exporter_parser.observe_parse(self._cluster_name, endpoint, parse_seconds)
+        # brokers without pagination support return a plain array
+        return totals, stream.meta.get('page_count', 1)
+
+    async def _fetch_page(self, url: str, totals_type, page: int):
+        """Fetches a page from ``RABBITMQ_HOST``, or in fan-out mode from the
+        node the page number maps to, failing over to the other nodes."""
+        if self._fanout is None or not self._fanout.urls:
+            return await self._request_page(f'{url}&page={page}', totals_type)
+        error = None
+        for base in self._fanout.rotation(page):
+            try:
+                return await self._request_page(f'{url}&page={page}', totals_type, base=base)
+            except Exception as e:
+                logger.warning(f'Cannot fetch page {page} of {_endpoint(url)} from {base}: '
+                               f'{type(e).__name__}')
+                error = e
+        raise error
+
+    async def _request_pages(self, url: str, columns, totals, totals_type=None):
+        """Streams a paginated, column-projected listing into ``totals``.
+
+        Up to PAGE_PARALLELISM pages are fetched at once and each page is
+        merged into ``totals`` as soon as it has been read. Pages are read
+        into ``totals_type()``, by default the type of ``totals``.
+        """
+        totals_type = totals_type or type(totals)
+        url = f'{url}?page_size={PAGE_SIZE}&columns={",".join(columns)}'
+        first_page, page_count = await self._fetch_page(url, totals_type, 1)
+        totals.merge(first_page)
+
+        semaphore = asyncio.Semaphore(PAGE_PARALLELISM)
+
+        async def fetch(page):
+            async with semaphore:
+                try:
+                    page_totals, _ = await self._fetch_page(url, totals_type, page)
+                except aiohttp.ClientResponseError as e:
+                    # objects deleted since the first page was read shrink the
+                    # listing, RabbitMQ answers 400 page_out_of_range for the
+                    # pages gone; the first page was accepted with the same
+                    # parameters, so a 400 means nothing else
+                    if e.status != 400:
+                        raise
+                    logger.info(f'Page {page} of {_endpoint(url)} is out of range, the listing shrank')
+                    return
+                totals.merge(page_totals)
+
+        await asyncio.gather(*[fetch(page) for page in range(2, page_count + 1)])
+
+    async def _request_listing(self, url: str, columns, totals, totals_type=None):
+        """Streams a listing into ``totals`` like _request_pages(), the
+        queues of this replica's shard only when sharded."""
+        if url != 'queues' or not queue_shard.ENABLED:
+            return await self._request_pages(url, columns, totals, totals_type)
+        totals_type = totals_type or type(totals)
+        columns = merge_columns(columns, queue_shard.SHARD_COLUMNS)
+        if queue_shard.SHARD_BY == 'queue':
+            return await self._request_pages(url, columns, queue_shard.ShardTotals(totals),
+                                             lambda: queue_shard.ShardTotals(totals_type()))
+        vhosts = [vhost['name'] for vhost in await self._request('vhosts?columns=name')
+                  if queue_shard.owns(vhost['name'])]
+        semaphore = asyncio.Semaphore(PAGE_PARALLELISM)
+
+        async def fetch(vhost):
+            async with semaphore:
+                await self._request_pages(f'queues/{quote(vhost, safe="")}', columns, totals, totals_type)
+
+        await asyncio.gather(*[fetch(vhost) for vhost in vhosts])
+
+    async def _fanout_nodes(self):
+        """Requests the stats of every node from the node itself.
+
+        Nodes that cannot be reached are reported as last seen by discovery,
+        without stats, instead of failing the whole collector.
+        """
+        fanout = self._fanout
+        if fanout.needs_discovery():
+            try:
+                nodes = await self._request(f'nodes?columns={",".join(node_fanout.DISCOVERY_COLUMNS)}')
+            except Exception as e:
+                self._topology.invalidate('nodes')
+                if not fanout.nodes:
+                    raise
+                logger.warning(f'Node discovery failed, using the last known nodes: {e!r}')
+            else:
+                fanout.update(nodes)
+                self._topology.set('nodes', nodes)
+
+        names = list(fanout.urls)
+        results = await asyncio.gather(
+            *[self._request(f'nodes/{quote(name, safe="")}', base=fanout.urls[name]) for name in names],
+            return_exceptions=True)
+        results = dict(zip(names, results))
+        nodes = []
+        for name, node in fanout.nodes.items():
+            result = results.get(name)
+            if isinstance(result, dict):
+                nodes.append(result)
+                continue
+            if result is not None:
+                logger.warning(f'Cannot collect node {name} from {fanout.urls[name]}: '
+                               f'{type(result).__name__}')
+            nodes.append(node)
+        return nodes
+
+    async def _aliveness(self, vhost: str, base: str = None) -> bool:
+        """One aliveness test, not retried: a retry would hide the latency."""
+        async with self._get(f'aliveness-test/{quote(vhost, safe="")}', base) as resp:
+            # a failed test is answered with 503 and a JSON reason
+            body = await resp.read()
+        return resp.status == 200 and json_codec.loads(body).get('status') == 'ok'
+
+    async def _probe_aliveness(self):
+        """Probes the configured vhosts, on every node in fan-out mode."""
+        prober = self._prober
+        vhosts = prober.vhosts
+        if vhosts is None:
+            vhosts = [vhost['name'] for vhost in await self._request('vhosts?columns=name')]
+        if self._fanout is not None and self._fanout.urls:
+            nodes = list(self._fanout.urls.items())
+        else:
+            nodes = [('', None)]
+        prober.prune(vhosts, [node for node, _ in nodes])
+        results = await prober.run(prober.select(vhosts), nodes, self._aliveness)
+        self._probe_state.set('prober', prober.dump())
+        return results
+
+    async def _snapshot_request(self, url: str):
+        if url == 'nodes' and self._fanout is not None:
+            return await self._fanout_nodes()
+        if url == 'aliveness':
+            # not an endpoint, the probes of this scrape shared by all sinks
+            return await self._probe_aliveness()
+        return await self._request(url)
+
+    async def collect(self, collectors, require_cluster_name: bool = True):
+        """Runs the ``(sink, name)`` collectors concurrently over one ScrapeSnapshot.
+
+        Unless the cluster name is known, the overview is requested first; if
+        that fails the collectors do not run, except when the sinks do not
+        label their output with the cluster name (``require_cluster_name``).
+        """
+        # listing pages read in the tasks started from here observe their
+        # counters into the rate engine of this client
+        self._rates.begin()
+        snapshot = ScrapeSnapshot(self._snapshot_request, self._request_listing)
+        for sink, name in collectors:
+            for url, columns, totals in sink.listings(name):
+                snapshot.subscribe(url, columns, totals)
+        try:
+            if self._cluster_name is None and require_cluster_name:
+                await self._cached_overview(snapshot)
+            results = await asyncio.gather(*[getattr(sink, name)(snapshot) for sink, name in collectors])
+        finally:
+            snapshot.close()
+            self._store_breakers()
+        if snapshot.failed and not snapshot.succeeded:
+            self._invalidate_topology()
+        return results
+
+    def _store_breakers(self):
+        """Writes the circuit breakers for the next exec run if they changed."""
+        breakers = self._breakers.dump()
+        # opening times are converted to the wall clock anew on every dump
+        states = {endpoint: state[:2] for endpoint, state in breakers.items()}
+        if states != {endpoint: state[:2] for endpoint, state in self._stored_breakers.items()}:
+            self._breaker_state.set('breakers', breakers)
+            self._stored_breakers = breakers
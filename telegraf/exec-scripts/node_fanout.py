@@ -0,0 +1,81 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-node fan-out of management API requests.
+
+RabbitMQ node names carry the host of the node: ``rabbit@rmqlocal-N-0`` is
+the per-node service the operator creates for hostpath deployments, and
+``rabbit@rmqlocal-N.rmqlocal.<ns>.svc.cluster.local`` resolves to the pod
+through the headless service otherwise. Node stats are requested from
+every node directly, and listing pages are spread over the nodes with
+fail-over, so no single management node serves (or fails) a whole scrape.
+"""
+
+import os
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from retry_policy import parse_duration
+
+FANOUT = os.getenv('RABBITMQ_MONITORING_FANOUT', 'false').lower() in ('yes', 'true', 't', '1')
+# e.g. 'https://{host}:15671', defaults to RABBITMQ_HOST with the node host
+NODE_URL = os.getenv('RABBITMQ_MONITORING_NODE_URL', '')
+DISCOVERY_INTERVAL = parse_duration(os.getenv('RABBITMQ_MONITORING_DISCOVERY_INTERVAL'), 60.0)
+DISCOVERY_COLUMNS = ['name', 'running']
+
+
+def node_url_template(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    netloc = '{host}' if parts.port is None else f'{{host}}:{parts.port}'
+    return urlunsplit((parts.scheme, netloc, parts.path, '', ''))
+
+
+def node_host(node_name: str) -> str:
+    return node_name.split('@', 1)[-1]
+
+
+class NodeFanout(object):
+    """Known cluster nodes and the management URL of each of them."""
+
+    def __init__(self, base_url: str, url_template: str = NODE_URL,
+                 discovery_interval: float = DISCOVERY_INTERVAL):
+        self._template = url_template or node_url_template(base_url)
+        self._discovery_interval = discovery_interval
+        self._discovered_at = None
+        # name -> {'name': ..., 'running': ...} as last seen by discovery
+        self.nodes = {}
+        self.urls = {}
+
+    def needs_discovery(self) -> bool:
+        return (self._discovered_at is None
+                or time.monotonic() - self._discovered_at >= self._discovery_interval)
+
+    def update(self, nodes, age: float = 0.0):
+        """Replaces the known nodes with ``nodes`` discovered ``age`` seconds ago."""
+        self.nodes = {node['name']: node for node in nodes}
+        self.urls = {name: self._template.format(host=node_host(name))
+                     for name, node in self.nodes.items() if node.get('running', True)}
+        self._discovered_at = time.monotonic() - age
+
+    def expire(self):
+        """Makes the next scrape discover the nodes again."""
+        self._discovered_at = None
+
+    def rotation(self, index: int) -> list:
+        """Node URLs starting at ``index`` (modulo), the rest as fail-over order."""
+        urls = list(self.urls.values())
+        if not urls:
+            return []
+        start = index % len(urls)
+        return urls[start:] + urls[:start]
@@ -14,8 +14,8 @@
 
 import os
 
-import prometheus_client
-from prometheus_client import Gauge
+import exposition
+from exposition import Gauge
 
 _GRAPH = {}
 
@@ -55,12 +55,6 @@ _GRAPH['rabbitmq_process_resident_memory_bytes'] = Gauge(
     ['rabbitmq_cluster', 'rabbitmq_node']
 )
 
-_GRAPH['rabbitmq_build_info'] = Gauge(
-    'rabbitmq_build_info',
-    'Nodes',
-    ['rabbitmq_cluster', 'rabbitmq_node']
-)
-
 _GRAPH['rabbitmq_channels'] = Gauge(
     'rabbitmq_channels',
     'Channels',
@@ -138,6 +132,9 @@ def parse_nodes(nodes, cluster_name):
             status = 1
 
     for node in nodes:
+        # stopped (or, in fan-out mode, unreachable) nodes carry no stats
+        if 'disk_free' not in node:
+            continue
         node_name = node["name"]
         _GRAPH['rabbitmq_disk_space_available_bytes'].labels(cluster_name,
                                                              node_name).set(
@@ -188,9 +185,4 @@ def parse_nodes(nodes, cluster_name):
     _GRAPH['rabbitmq_node_count'].labels(cluster_name). \
         set(node_count)
 
-    res = []
-
-    for key in _GRAPH:
-        res.append(prometheus_client.generate_latest(_GRAPH[key]))
-
-    return res
+    return exposition.render(_GRAPH.values())
@@ -0,0 +1,33 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import exposition
+from exposition import Gauge
+
+_GRAPH = {}
+
+_GRAPH['rabbitmq_build_info'] = Gauge(
+    'rabbitmq_build_info',
+    'RabbitMQ\'s app version',
+    ['rabbitmq_version']
+)
+
+
+def parse_build_info(overview):
+    # only the current version is reported after an upgrade
+    _GRAPH['rabbitmq_build_info'].clear()
+    _GRAPH['rabbitmq_build_info'].\
+        labels(overview.get('rabbitmq_version', 'unknown')).set(1)
+
+    return exposition.render(_GRAPH.values())
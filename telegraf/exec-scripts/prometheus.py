@@ -15,147 +15,368 @@
 import asyncio
 import os
 import time
-import ssl
 
-import requests
-from functools import wraps
-import aiohttp
+from aiohttp import web
 import logging
 from logging.handlers import RotatingFileHandler
 
+import aliveness_parser
+import aliveness_probe
 import channel_parser
+import client_parser
+import cluster_targets
 import connection_parser
+import dist_parser
+import exporter_parser
+import exposition
+import http_pool
+import influx_sink
 import node_parser
+import overview_parser
 import queue_parser
-
-
-def get_secret_value(key):
-    secrets_dir = os.getenv("RABBITMQ_MONITORING_SECRETS_DIR", "/etc/secrets/rabbitmq-monitoring-pod-secrets")
-    if secrets_dir:
-        path = os.path.join(secrets_dir, key)
-        if os.path.isfile(path):
-            with open(path, encoding="utf-8") as f:
-                value = f.read().strip()
-                if value:
-                    return value
-    return os.getenv(key, "")
+import queue_shard
+import rate_engine
+import retry_policy
+from management_api import ManagementClient, ScrapeSnapshot, get_secret_value, management_url, \
+    suppress_errors
+from retry_policy import parse_duration
 
 logger = logging.getLogger(__name__)
 
-CA_CERT_PATH = '/tls/ca.crt'
+CA_CERT_PATH = http_pool.CA_CERT_PATH
 MONITORING_LOGS = os.getenv('MONITORING_LOGS')
 
+# 'exec' prints the exposition once and exits (telegraf inputs.exec),
+# 'resident' keeps collecting on a schedule and serves the latest
+# exposition over HTTP.
+MONITORING_MODE = os.getenv('RABBITMQ_MONITORING_MODE', 'exec').lower()
+RESIDENT_PORT = int(os.getenv('RABBITMQ_MONITORING_PORT', 9419))
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# The resident exporter also serves the influx.py metrics on /influx,
+# collected from the same management API requests, with 'prometheus,influx'.
+FORMATS = [f.strip() for f in os.getenv('RABBITMQ_MONITORING_FORMATS', 'prometheus').lower().split(',')]
+INFLUX_CONTENT_TYPE = 'text/plain; charset=utf-8'
+INFLUX_PREFIX = 'influx.'
+
+
+def parse_ttls(value: str, names, default: float) -> dict:
+    """Parses '30s' (every collector) or 'nodes=10s,queues=1m' (per collector)."""
+    ttls = dict.fromkeys(names, default)
+    for item in (value or '').split(','):
+        name, _, duration = item.strip().rpartition('=')
+        if not duration:
+            continue
+        if name:
+            ttls[name] = parse_duration(duration, default)
+        else:
+            ttls = dict.fromkeys(names, parse_duration(duration, default))
+    return ttls
+
+
+class RabbitMQHelper(ManagementClient):
+
+    # a sharded replica other than the first collects its queues only
+    COLLECTORS = queue_shard.collectors(
+        ('nodes', 'queues', 'channels', 'connections', 'build_info', 'dist_links') +
+        (('aliveness',) if aliveness_probe.ENABLED else ()) +
+        (('clients',) if client_parser.CLIENT_TOP_K else ()))
+    LISTINGS = {
+        'queues': ('queues', queue_parser.QUEUE_COLUMNS, queue_parser.QueueTotals),
+        'channels': ('channels', channel_parser.CHANNEL_COLUMNS, channel_parser.ChannelTotals),
+        'connections': ('connections', connection_parser.CONNECTION_COLUMNS,
+                        connection_parser.ConnectionTotals),
+    }
+
+    def listings(self, name: str) -> list:
+        if name == 'clients':
+            # the pages of both listings are aggregated in tasks started
+            # from this context, so they share one time budget, and are
+            # joined into the same per-client totals
+            client_parser.start_budget()
+            totals = client_parser.ClientTotals()
+            return [('connections', client_parser.CLIENT_CONNECTION_COLUMNS,
+                     client_parser.ClientConnectionTotals(totals)),
+                    ('channels', client_parser.CLIENT_CHANNEL_COLUMNS,
+                     client_parser.ClientChannelTotals(totals))]
+        if name not in self.LISTINGS:
+            return []
+        url, columns, totals_type = self.LISTINGS[name]
+        return [(url, columns, totals_type())]
+
+    def _render(self, collector: str, render, **kwargs):
+        start = time.perf_counter()
+        result = render(**kwargs)
+        exporter_parser.observe_render(self._cluster_name, collector, time.perf_counter() - start)
+        return result
 
-def suppress_errors(return_func=lambda: []):
-    def wrapper(f):
-
-        @wraps(f)
-        def internal_wrapper(*args, **kwargs):
-            async def async_await():
-                try:
-                    return await f(*args, **kwargs)
-                except BaseException as e:
-                    logging.error(e)
-                    return return_func()
-
-            return async_await()
-
-        return internal_wrapper
-
-    return wrapper
-
-
-class RetryExhaustedError(IOError):
-    pass
-
-
-def retry(retries=5, cooldown=0):
-    def wrap(func):
-
-        @wraps(func)
-        async def inner(*args, **kwargs):
-            retries_count = 0
-
-            while True:
-                try:
-                    result = await func(*args, **kwargs)
-                except Exception:
-                    retries_count += 1
-
-                    if retries_count > retries:
-                        raise RetryExhaustedError(
-                            func.__qualname__, args, kwargs)
-
-                    await asyncio.sleep(cooldown)
-                else:
-                    return result
-
-        return inner
-
-    return wrap
-
+    @suppress_errors()
+    async def nodes(self, snapshot: ScrapeSnapshot):
+        nodes = await snapshot.get('nodes')
+        return self._render('nodes', node_parser.parse_nodes,
+                            nodes=nodes, cluster_name=self._cluster_name)
 
-class RabbitMQHelper(object):
+    @suppress_errors()
+    async def dist_links(self, snapshot: ScrapeSnapshot):
+        nodes = await snapshot.get('nodes')
+        return self._render('dist_links', dist_parser.parse_dist_links,
+                            nodes=nodes, cluster_name=self._cluster_name, rates=self._rates)
 
-    def __init__(self, host: str, user: str, password: str):
-        self._host = host
-        self._auth = aiohttp.BasicAuth(user, password)
-        self.ssl = CA_CERT_PATH if os.path.exists(CA_CERT_PATH) else None
-        response = requests.get(f'{self._host}/api/overview',
-                                auth=(user, password), verify=self.ssl)
-        overview = response.json()
-        self._cluster_name = overview['cluster_name']
+    @suppress_errors()
+    async def connections(self, snapshot: ScrapeSnapshot):
+        totals, nodes = await asyncio.gather(
+            snapshot.listing('connections', connection_parser.ConnectionTotals),
+            snapshot.get('nodes'))
+        return self._render('connections', connection_parser.render_connections,
+                            totals=totals, nodes=nodes, cluster_name=self._cluster_name)
 
-    @retry()
-    async def _request(self, url: str):
-        if self.ssl:
-            sslcontext = ssl.create_default_context(
-                cafile=CA_CERT_PATH)
-        else:
-            sslcontext = None
-        async with aiohttp.ClientSession(auth=self._auth) as session:
-            async with session.get(
-                    url=f'{self._host}/api/{url}', ssl=sslcontext) as resp:
-                return await resp.json()
+    @suppress_errors()
+    async def queues(self, snapshot: ScrapeSnapshot):
+        if queue_shard.INDEX > 0:
+            # /api/nodes is left to the first replica, the queue series
+            # cover the nodes the shard has queues on
+            totals = await snapshot.listing('queues', queue_parser.QueueTotals)
+            return self._render('queues', queue_parser.render_queues,
+                                totals=totals, nodes=None, cluster_name=self._cluster_name)
+        totals, nodes = await asyncio.gather(
+            snapshot.listing('queues', queue_parser.QueueTotals),
+            snapshot.get('nodes'))
+        return self._render('queues', queue_parser.render_queues,
+                            totals=totals, nodes=nodes, cluster_name=self._cluster_name)
 
     @suppress_errors()
-    async def nodes(self):
-        nodes = await self._request('nodes')
-        return node_parser.parse_nodes(nodes=nodes,
-                                       cluster_name=self._cluster_name)
+    async def channels(self, snapshot: ScrapeSnapshot):
+        totals, nodes = await asyncio.gather(
+            snapshot.listing('channels', channel_parser.ChannelTotals),
+            snapshot.get('nodes'))
+        rates = None
+        if rate_engine.LOCAL_RATES:
+            # every channel has been observed once the listing is complete
+            self._rates.commit('channels')
+            rates = self._rates
+        return self._render('channels', channel_parser.render_channels, totals=totals,
+                            nodes=nodes, cluster_name=self._cluster_name, rates=rates)
 
     @suppress_errors()
-    async def connections(self):
-        connections = await self._request('connections')
-        nodes = await self._request('nodes')
-        return connection_parser.parse_connections(
-            connections=connections,
-            nodes=nodes,
-            cluster_name=self._cluster_name
-        )
+    async def clients(self, snapshot: ScrapeSnapshot):
+        connections, channels = await asyncio.gather(
+            snapshot.listing('connections', client_parser.ClientConnectionTotals),
+            snapshot.listing('channels', client_parser.ClientChannelTotals))
+        return self._render('clients', client_parser.render_clients, connections=connections,
+                            channels=channels, cluster_name=self._cluster_name)
 
     @suppress_errors()
-    async def queues(self):
-        queues = await self._request('queues')
-        nodes = await self._request('nodes')
-        return queue_parser.parse_queues(queues=queues,
-                                         nodes=nodes,
-                                         cluster_name=self._cluster_name)
+    async def build_info(self, snapshot: ScrapeSnapshot):
+        overview = await self._cached_overview(snapshot)
+        return self._render('build_info', overview_parser.parse_build_info, overview=overview)
 
     @suppress_errors()
-    async def channels(self):
-        channels = await self._request('channels')
-        nodes = await self._request('nodes')
-        return channel_parser.parse_channels(channels=channels,
-                                             nodes=nodes,
-                                             cluster_name=self._cluster_name)
+    async def aliveness(self, snapshot: ScrapeSnapshot):
+        results = await snapshot.get('aliveness')
+        return self._render('aliveness', aliveness_parser.parse_aliveness, results=results,
+                            stats=self._prober.stats, cluster_name=self._cluster_name,
+                            expire=aliveness_probe.BATCH <= 0)
+
+    async def scrape(self, deadline: float = retry_policy.DEADLINE):
+        """Runs all collectors once, followed by the exporter self-metrics."""
+        retry_policy.set_deadline(deadline)
+        start = time.perf_counter()
+        metrics = await self.collect([(self, name) for name in self.COLLECTORS])
+        exporter_parser.observe_scrape(self._cluster_name, time.perf_counter() - start)
+        # suppress_errors() turns a failed collector into an empty result
+        exporter_parser.observe_freshness(
+            self._cluster_name, {name: 0 for name, result in zip(self.COLLECTORS, metrics) if result},
+            up=all(metrics))
+        metrics.append(self.exporter_stats())
+        return metrics
+
+    def exporter_stats(self):
+        return exporter_parser.parse_exporter_stats(
+            connection_stats=http_pool.connection_stats(self._host),
+            breaker_states=self._breakers.states(),
+            cluster_name=self._cluster_name)
+
+
+class ScrapeCache(object):
+    """Stale-while-revalidate cache of the rendered collector output.
+
+    Readers always get the last good result of every collector at once.
+    Collectors older than their TTL are refreshed in the background, by one
+    refresh at a time that shares a single ScrapeSnapshot; a failed refresh
+    keeps the previous result. Results older than ``max_staleness`` are not
+    served any more and ``rabbitmq_exporter_up`` drops to 0.
+
+    ``collectors`` maps the cached names to the (sink, name) collectors of
+    the ManagementClient, so the collectors of all sinks share the refresh.
+    A refresh taking longer than ``timeout`` (unbounded with 0) is abandoned.
+    """
+
+    def __init__(self, rabbitmq_helper: RabbitMQHelper, collectors: dict, ttls: dict,
+                 max_staleness: float, deadline: float = retry_policy.DEADLINE, timeout: float = 0):
+        self._helper = rabbitmq_helper
+        self._collectors = collectors
+        self._ttls = ttls
+        self._max_staleness = max_staleness
+        self._deadline = deadline
+        self._timeout = timeout
+        self._results = {}
+        self._updated = {}
+        self._refresh = None
+        # outcome of the last completed refresh
+        self.up = False
+        self.duration = 0.0
+
+    @property
+    def helper(self) -> RabbitMQHelper:
+        return self._helper
+
+    def revalidate(self):
+        """Starts refreshing the expired collectors unless a refresh is running.
+
+        Returns the running refresh, or None when everything is fresh.
+        """
+        if self._refresh is None or self._refresh.done():
+            now = time.monotonic()
+            expired = [name for name, ttl in self._ttls.items()
+                       if name not in self._updated or now - self._updated[name] >= ttl]
+            self._refresh = asyncio.ensure_future(self._collect(expired)) if expired else None
+        return self._refresh
+
+    async def _collect(self, names):
+        retry_policy.set_deadline(self._deadline)
+        start = time.monotonic()
+        try:
+            results = await asyncio.wait_for(
+                self._helper.collect([self._collectors[name] for name in names]), self._timeout or None)
+        except Exception:
+            self.up = False
+            raise
+        finally:
+            self.duration = time.monotonic() - start
+        now = time.monotonic()
+        for name, result in zip(names, results):
+            # suppress_errors() turns a failed collector into an empty result
+            if result:
+                self._results[name] = result
+                self._updated[name] = now
+        # up only when every collector returned data
+        self.up = all(results)
+        exporter_parser.observe_scrape(self._helper.cluster_name, now - start)
+        logger.info(f'Time of collection of {", ".join(names)} is {now - start}')
+
+    async def get(self, names, wait: bool = True) -> tuple:
+        """Returns the servable results of ``names`` and the age of every result.
+
+        Before the first collection completes, waits for it unless ``wait`` is off.
+        """
+        refresh = self.revalidate()
+        if refresh is not None and not self._results and wait:
+            # nothing to serve before the first collection completes
+            await asyncio.wait([refresh])
+
+        now = time.monotonic()
+        ages = {name: now - updated for name, updated in self._updated.items()}
+        return [self._results[name] for name in names
+                if ages.get(name, self._max_staleness + 1) <= self._max_staleness], ages
 
 
 def get_prometheus_metrics(metrics):
-    res = ''
-    for batch in metrics:
-        res = res + ''.join([line.decode('utf-8') for line in batch])
-    return res
+    return ''.join([line for batch in metrics for line in batch])
+
+
+def merge_targets(results) -> list:
+    """One exposition of the collector results of every target, a family
+    written once with the series of all targets."""
+    return exposition.merge([fragment for batch in metrics for fragment in batch] for metrics in results)
+
+
+class ResidentExporter(object):
+    """Serves the collectors from a ScrapeCache inside one long-lived process.
+
+    The cache is revalidated every ``interval`` even when nobody scrapes, and
+    scrapes served on ``/metrics`` (and ``/influx`` with an InfluxSink) never
+    wait for a collection cycle.
+
+    ``caches`` maps every target of a multi-cluster exporter to its cache,
+    revalidated on a schedule of its own; the single cluster of
+    RABBITMQ_HOST is the target None.
+    """
+
+    def __init__(self, caches: dict, interval: float, prometheus: bool = True,
+                 influx: influx_sink.InfluxSink = None):
+        self._caches = caches
+        self._interval = interval
+        self._prometheus = prometheus
+        self._influx = influx
+
+    async def schedule(self):
+        await asyncio.gather(*[self._schedule(target, cache) for target, cache in self._caches.items()])
+
+    async def _schedule(self, target, cache: ScrapeCache):
+        exposition.set_scope(target)
+        while True:
+            start = time.monotonic()
+            try:
+                refresh = cache.revalidate()
+                if refresh is not None:
+                    await refresh
+            except Exception:
+                logger.exception(f'Exception occurred during metrics collection of {target or "RABBITMQ_HOST"}:')
+            await asyncio.sleep(max(0.0, self._interval - (time.monotonic() - start)))
+
+    async def _metrics(self, target, cache: ScrapeCache):
+        exposition.set_scope(target)
+        helper = cache.helper
+        names = helper.COLLECTORS
+        # a target that cannot be reached must not hold up the others
+        metrics, ages = await cache.get(names, wait=target is None)
+        if helper.cluster_name is None:
+            # the cluster could not be reached yet, see the scheduled refreshes
+            return []
+        exporter_parser.observe_freshness(
+            helper.cluster_name, {name: ages[name] for name in names if name in ages},
+            up=len(metrics) == len(names))
+        metrics.append(helper.exporter_stats())
+        return metrics
+
+    async def handle_metrics(self, request):
+        # every target is rendered in a task of its own, in its scope
+        results = await asyncio.gather(*[self._metrics(target, cache) for target, cache in self._caches.items()])
+        if None in self._caches:
+            metrics = results[0]
+        else:
+            for target, cache in self._caches.items():
+                exporter_parser.observe_target(target, cache.up, cache.duration)
+            metrics = [merge_targets(results), exporter_parser.parse_target_stats()]
+        return web.Response(body=get_prometheus_metrics(metrics).encode('utf-8'),
+                            headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+    async def handle_influx(self, request):
+        results, _ = await self._caches[None].get(
+            [f'{INFLUX_PREFIX}{name}' for name in self._influx.COLLECTORS])
+        results += [self._influx.exporter_stats(), self._influx.cluster_state()]
+        lines = [line for batch in results for line in batch if line is not None]
+        return web.Response(body=''.join(f'{line}\n' for line in lines).encode('utf-8'),
+                            headers={'Content-Type': INFLUX_CONTENT_TYPE})
+
+    async def serve(self, port: int):
+        app = web.Application()
+        if self._prometheus:
+            app.router.add_get('/metrics', self.handle_metrics)
+        if self._influx is not None:
+            app.router.add_get('/influx', self.handle_influx)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, port=port).start()
+        logger.info(f'Serving {", ".join(FORMATS)} metrics on :{port} every {self._interval}s')
+        tasks = [self.schedule()]
+        if self._influx is not None:
+            # the influx replica count follows a statefulset watch
+            tasks.append(self._influx.watch_replicas())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await runner.cleanup()
+            await http_pool.close_session()
 
 
 def __configure_logging(log):
@@ -178,22 +399,101 @@ def __configure_logging(log):
     log.addHandler(err_handler)
 
 
+def create_rabbitmq_helper(probe_spread: float = 0.0, rate_state: str = 'prometheus'):
+    return RabbitMQHelper(
+        host=management_url(os.getenv('RABBITMQ_HOST', '')),
+        user=get_secret_value('RABBITMQ_USER'),
+        password=get_secret_value('RABBITMQ_PASSWORD'),
+        probe_spread=probe_spread,
+        rate_state=rate_state
+    )
+
+
+def create_target_helpers(probe_spread: float = 0.0, rate_state: str = 'prometheus') -> dict:
+    """A helper per target of a multi-cluster exporter, see cluster_targets."""
+    targets = cluster_targets.load_targets()
+    if not targets:
+        logger.error(f'No targets found for RABBITMQ_MONITORING_TARGETS={cluster_targets.TARGETS}')
+    http_pool.set_clusters(len(targets))
+    return {target.name: RabbitMQHelper(
+        host=target.host,
+        user=target.user,
+        password=target.password,
+        probe_spread=probe_spread,
+        rate_state=rate_state,
+        max_requests=cluster_targets.TARGET_REQUESTS
+    ) for target in targets}
+
+
+async def scrape_targets(helpers: dict):
+    """Scrapes every target once into one exposition."""
+    results = await cluster_targets.run_targets(
+        helpers, lambda helper: helper.scrape(deadline=cluster_targets.RETRY_DEADLINE))
+    for target, (metrics, seconds) in results.items():
+        exporter_parser.observe_target(target, metrics is not None, seconds)
+    return [merge_targets(metrics for metrics, _ in results.values() if metrics is not None),
+            exporter_parser.parse_target_stats()]
+
+
+def run_resident():
+    logger.info('Start resident exporter...')
+    exporter_parser.use_cumulative()
+    interval = parse_duration(os.getenv('RABBITMQ_MONITORING_INTERVAL',
+                                        os.getenv('RABBIT_EXEC_PLUGIN_TIMEOUT', '10s')))
+    # aliveness probes are spread over half of the interval unless configured
+    probe_spread = interval / 2
+    # counters are kept in memory between collections, not in a state file
+    rate_state = None
+    formats = FORMATS
+    if cluster_targets.ENABLED:
+        if 'influx' in formats:
+            logger.warning('The influx format is served for a single cluster only')
+        formats = ['prometheus']
+        helpers = create_target_helpers(probe_spread=probe_spread, rate_state=rate_state)
+    else:
+        helpers = {None: create_rabbitmq_helper(probe_spread=probe_spread, rate_state=rate_state)}
+    caches = {}
+    # the schedule is checked as often as the shortest TTL of any target
+    schedule_interval = interval
+    influx = None
+    for target, rabbitmq_helper in helpers.items():
+        collectors = {}
+        if 'prometheus' in formats:
+            collectors.update({name: (rabbitmq_helper, name) for name in RabbitMQHelper.COLLECTORS})
+        if 'influx' in formats:
+            influx = influx_sink.InfluxSink(rabbitmq_helper)
+            collectors.update({f'{INFLUX_PREFIX}{name}': (influx, name) for name in influx.COLLECTORS})
+        # collectors are refreshed once they are older than their TTL and
+        # dropped from the exposition once older than the max staleness
+        ttls = parse_ttls(os.getenv('RABBITMQ_MONITORING_CACHE_TTL'), collectors, interval)
+        max_staleness = parse_duration(os.getenv('RABBITMQ_MONITORING_MAX_STALENESS'),
+                                       3 * max(ttls.values()))
+        schedule_interval = min([schedule_interval, *ttls.values()])
+        if target is None:
+            caches[target] = ScrapeCache(rabbitmq_helper, collectors, ttls, max_staleness)
+        else:
+            # a slow target is abandoned without holding up the others
+            caches[target] = ScrapeCache(rabbitmq_helper, collectors, ttls, max_staleness,
+                                         deadline=cluster_targets.RETRY_DEADLINE,
+                                         timeout=cluster_targets.TARGET_DEADLINE)
+    exporter = ResidentExporter(caches, schedule_interval,
+                                prometheus='prometheus' in formats, influx=influx)
+    # RabbitMQ is not requested before the first refresh, which keeps
+    # retrying on the schedule while the cluster cannot be reached
+    asyncio.get_event_loop().run_until_complete(exporter.serve(RESIDENT_PORT))
+
+
 def run():
     try:
         logger.info('Start script execution...')
         loop = asyncio.get_event_loop()
-        rabbitmq_helper = RabbitMQHelper(
-            host=os.getenv('RABBITMQ_HOST', '').rstrip('/'),
-            user=get_secret_value('RABBITMQ_USER'),
-            password=get_secret_value('RABBITMQ_PASSWORD')
-        )
-        tasks = [asyncio.ensure_future(x)
-                 for x in [rabbitmq_helper.nodes(),
-                           rabbitmq_helper.queues(),
-                           rabbitmq_helper.channels(),
-                           rabbitmq_helper.connections()
-                           ]]
-        metrics = loop.run_until_complete(asyncio.gather(*tasks))
+        try:
+            if cluster_targets.ENABLED:
+                metrics = loop.run_until_complete(scrape_targets(create_target_helpers()))
+            else:
+                metrics = loop.run_until_complete(create_rabbitmq_helper().scrape())
+        finally:
+            loop.run_until_complete(http_pool.close_session())
         prometheus_formatted_metrics = get_prometheus_metrics(metrics)
         logger.debug('Message to send:\n%s', prometheus_formatted_metrics)
         logger.info('End script execution!\n')
@@ -205,6 +505,9 @@ def run():
 
 if __name__ == "__main__":
     __configure_logging(logger)
-    start = time.time()
-    run()
-    logger.info(f'Time of execution is {time.time() - start}\n')
+    if MONITORING_MODE == 'resident':
+        run_resident()
+    else:
+        start = time.time()
+        run()
+        logger.info(f'Time of execution is {time.time() - start}\n')
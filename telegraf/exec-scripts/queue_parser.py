@@ -12,72 +12,225 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import prometheus_client
-from prometheus_client import Gauge
+import heapq
+import logging
+import os
+
+import exposition
+import queue_shard
+from exposition import Gauge
+
+logger = logging.getLogger(__name__)
+
+# Opt-in per-queue series: only the TOP_K queues ranked by TOP_K_BY are
+# exported, all other queues are rolled up into one 'other' series.
+TOP_K = int(os.getenv('RABBITMQ_MONITORING_QUEUE_TOP_K', 0))
+TOP_K_KEYS = ('messages_ready', 'messages_unacknowledged', 'publish_rate')
+TOP_K_BY = os.getenv('RABBITMQ_MONITORING_QUEUE_TOP_K_BY', 'messages_ready')
+if TOP_K and TOP_K_BY not in TOP_K_KEYS:
+    logger.error(f'RABBITMQ_MONITORING_QUEUE_TOP_K_BY must be one of {", ".join(TOP_K_KEYS)}, '
+                 f'not {TOP_K_BY!r}; ranking by messages_ready')
+    TOP_K_BY = 'messages_ready'
+OTHER_QUEUE = 'other'
+# the queue series of a sharded replica cover its shard only, they are
+# labelled with it to keep the replicas' series apart
+_SHARD_LABELS = [queue_shard.SHARD_LABEL] if queue_shard.ENABLED else []
+_SHARD = (str(queue_shard.INDEX),) if queue_shard.ENABLED else ()
 
 _GRAPH = {}
 
 _GRAPH['rabbitmq_queue_messages_ready'] = Gauge(
     'rabbitmq_queue_messages_ready',
     'Ready messages',
-    ['rabbitmq_cluster', 'rabbitmq_node']
+    ['rabbitmq_cluster', 'rabbitmq_node'] + _SHARD_LABELS
 )
 
 _GRAPH['rabbitmq_queue_messages_unacked'] = Gauge(
     'rabbitmq_queue_messages_unacked',
     'Unacknowledged messages',
-    ['rabbitmq_cluster', 'rabbitmq_node']
+    ['rabbitmq_cluster', 'rabbitmq_node'] + _SHARD_LABELS
 )
 
 _GRAPH['rabbitmq_queue_messages_published_total'] = Gauge(
     'rabbitmq_queue_messages_published_total',
     'Messages routed to queues / s',
-    ['rabbitmq_cluster', 'rabbitmq_node']
+    ['rabbitmq_cluster', 'rabbitmq_node'] + _SHARD_LABELS
 )
 
 _GRAPH['rabbitmq_queues'] = Gauge(
     'rabbitmq_queues',
     'Queues',
-    ['rabbitmq_cluster', 'rabbitmq_node']
+    ['rabbitmq_cluster', 'rabbitmq_node'] + _SHARD_LABELS
 )
 
 
-def parse_queues(queues, nodes, cluster_name):
-    message_ready_total = {}
-    message_unacked_total = {}
-    publish = {}
-    queue_count = {}
-
-    for node in nodes:
-        if not node["name"] in message_ready_total:
-            message_ready_total[node["name"]] = 0
-            message_unacked_total[node["name"]] = 0
-            publish[node["name"]] = 0
-            queue_count[node["name"]] = 0
-
-    for queue in queues:
-        queue_count[queue["node"]] += 1
-        message_ready_total[queue["node"]] += int(
-            queue.get("messages_ready", 0))
-        message_unacked_total[queue["node"]] += int(
-            queue.get("messages_unacknowledged", 0))
-        if queue.get("message_stats"):
-            publish[queue["node"]] += int(
-                queue["message_stats"].get("publish", 0))
-
-    for node in message_ready_total:
-        _GRAPH['rabbitmq_queue_messages_unacked'].labels(cluster_name, node).\
-            set(message_unacked_total[node])
-        _GRAPH['rabbitmq_queue_messages_ready'].labels(cluster_name, node).\
-            set(message_ready_total[node])
+_TOP_GRAPH = {}
+
+_TOP_GRAPH['rabbitmq_queue_top_messages_ready'] = Gauge(
+    'rabbitmq_queue_top_messages_ready',
+    'Ready messages of the top queues',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'vhost', 'queue'] + _SHARD_LABELS
+)
+
+_TOP_GRAPH['rabbitmq_queue_top_messages_unacked'] = Gauge(
+    'rabbitmq_queue_top_messages_unacked',
+    'Unacknowledged messages of the top queues',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'vhost', 'queue'] + _SHARD_LABELS
+)
+
+_TOP_GRAPH['rabbitmq_queue_top_messages_published_total'] = Gauge(
+    'rabbitmq_queue_top_messages_published_total',
+    'Messages routed to the top queues',
+    ['rabbitmq_cluster', 'rabbitmq_node', 'vhost', 'queue'] + _SHARD_LABELS
+)
+
+_TOP_GRAPH['rabbitmq_queue_top_other_queues'] = Gauge(
+    'rabbitmq_queue_top_other_queues',
+    'Queues rolled up into the other series',
+    ['rabbitmq_cluster'] + _SHARD_LABELS
+)
+
+# Only these fields are requested from /api/queues (columns= projection).
+QUEUE_COLUMNS = ['node', 'messages_ready', 'messages_unacknowledged',
+                 'message_stats.publish']
+if TOP_K:
+    QUEUE_COLUMNS += ['name', 'vhost']
+    if TOP_K_BY == 'publish_rate':
+        QUEUE_COLUMNS.append('message_stats.publish_details.rate')
+
+
+class QueueRanking(object):
+    """Keeps the ``k`` highest ranked queues in a min-heap.
+
+    Queues pushed out of the heap are summed into the 'other' bucket, so
+    memory stays O(k) however many queues are streamed through.
+    """
+
+    def __init__(self, k: int = TOP_K, rank_by: str = TOP_K_BY):
+        self._k = k
+        self._rank_by = rank_by
+        # (score, vhost, name, node, ready, unacked, publish)
+        self.heap = []
+        self.other = [0, 0, 0]
+        self.other_count = 0
+
+    def _score(self, queue, ready, unacked):
+        if self._rank_by == 'messages_unacknowledged':
+            return unacked
+        if self._rank_by == 'publish_rate':
+            message_stats = queue.get("message_stats") or {}
+            return float(message_stats.get("publish_details", {}).get("rate", 0))
+        return ready
+
+    def _roll_up(self, entry):
+        self.other[0] += entry[4]
+        self.other[1] += entry[5]
+        self.other[2] += entry[6]
+        self.other_count += 1
+
+    def push(self, entry):
+        if len(self.heap) < self._k:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            self._roll_up(heapq.heapreplace(self.heap, entry))
+        else:
+            self._roll_up(entry)
+
+    def add(self, queue, ready, unacked, publish):
+        self.push((self._score(queue, ready, unacked), queue["vhost"], queue["name"],
+                   queue["node"], ready, unacked, publish))
+
+    def merge(self, other: 'QueueRanking'):
+        for entry in other.heap:
+            self.push(entry)
+        for i, value in enumerate(other.other):
+            self.other[i] += value
+        self.other_count += other.other_count
+
+
+class QueueTotals(object):
+    """Per-node queue aggregates, fed incrementally as queues are streamed."""
+
+    def __init__(self):
+        self.message_ready_total = {}
+        self.message_unacked_total = {}
+        self.publish = {}
+        self.queue_count = {}
+        self.ranking = QueueRanking() if TOP_K else None
+
+    def add(self, queues):
+        message_ready_total = self.message_ready_total
+        message_unacked_total = self.message_unacked_total
+        publish = self.publish
+        queue_count = self.queue_count
+        ranking = self.ranking
+
+        for queue in queues:
+            node = queue["node"]
+            ready = int(queue.get("messages_ready", 0))
+            unacked = int(queue.get("messages_unacknowledged", 0))
+            publish_count = 0
+            if queue.get("message_stats"):
+                publish_count = int(queue["message_stats"].get("publish", 0))
+            queue_count[node] = queue_count.get(node, 0) + 1
+            message_ready_total[node] = message_ready_total.get(node, 0) + ready
+            message_unacked_total[node] = message_unacked_total.get(node, 0) + unacked
+            publish[node] = publish.get(node, 0) + publish_count
+            if ranking is not None:
+                ranking.add(queue, ready, unacked, publish_count)
+
+    def merge(self, other: 'QueueTotals'):
+        for totals, other_totals in ((self.message_ready_total, other.message_ready_total),
+                                     (self.message_unacked_total, other.message_unacked_total),
+                                     (self.publish, other.publish),
+                                     (self.queue_count, other.queue_count)):
+            for node, value in other_totals.items():
+                totals[node] = totals.get(node, 0) + value
+        if self.ranking is not None:
+            self.ranking.merge(other.ranking)
+
+
+def render_queues(totals, nodes, cluster_name):
+    """Series of the nodes without queues are exported as 0, unless
+    ``nodes`` is None."""
+    for node in dict.fromkeys([node["name"] for node in nodes or []] + list(totals.queue_count)):
+        _GRAPH['rabbitmq_queue_messages_unacked'].labels(cluster_name, node, *_SHARD).\
+            set(totals.message_unacked_total.get(node, 0))
+        _GRAPH['rabbitmq_queue_messages_ready'].labels(cluster_name, node, *_SHARD).\
+            set(totals.message_ready_total.get(node, 0))
         _GRAPH['rabbitmq_queue_messages_published_total'].\
-            labels(cluster_name, node).set(publish[node])
+            labels(cluster_name, node, *_SHARD).set(totals.publish.get(node, 0))
         _GRAPH['rabbitmq_queues'].\
-            labels(cluster_name, node).set(queue_count[node])
+            labels(cluster_name, node, *_SHARD).set(totals.queue_count.get(node, 0))
+
+    if totals.ranking is None:
+        return exposition.render(_GRAPH.values())
 
-    res = []
+    # the ranking changes every scrape, so drop the previous top queues
+    for gauge in _TOP_GRAPH.values():
+        gauge.clear()
+    ranking = totals.ranking
+    for _, vhost, name, node, ready, unacked, publish in sorted(ranking.heap, reverse=True):
+        _TOP_GRAPH['rabbitmq_queue_top_messages_ready'].\
+            labels(cluster_name, node, vhost, name, *_SHARD).set(ready)
+        _TOP_GRAPH['rabbitmq_queue_top_messages_unacked'].\
+            labels(cluster_name, node, vhost, name, *_SHARD).set(unacked)
+        _TOP_GRAPH['rabbitmq_queue_top_messages_published_total'].\
+            labels(cluster_name, node, vhost, name, *_SHARD).set(publish)
+    # vhost names are never empty, so this cannot clash with a real queue
+    _TOP_GRAPH['rabbitmq_queue_top_messages_ready'].\
+        labels(cluster_name, '', '', OTHER_QUEUE, *_SHARD).set(ranking.other[0])
+    _TOP_GRAPH['rabbitmq_queue_top_messages_unacked'].\
+        labels(cluster_name, '', '', OTHER_QUEUE, *_SHARD).set(ranking.other[1])
+    _TOP_GRAPH['rabbitmq_queue_top_messages_published_total'].\
+        labels(cluster_name, '', '', OTHER_QUEUE, *_SHARD).set(ranking.other[2])
+    _TOP_GRAPH['rabbitmq_queue_top_other_queues'].\
+        labels(cluster_name, *_SHARD).set(ranking.other_count)
 
-    for key in _GRAPH:
-        res.append(prometheus_client.generate_latest(_GRAPH[key]))
+    return exposition.render(list(_GRAPH.values()) + list(_TOP_GRAPH.values()))
 
-    return res
+
+def parse_queues(queues, nodes, cluster_name):
+    totals = QueueTotals()
+    totals.add(queues)
+    return render_queues(totals, nodes, cluster_name)
@@ -0,0 +1,96 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Queue collection sharded across exporter replicas.
+
+With RABBITMQ_MONITORING_SHARDS=N every replica collects one hash partition
+of the queues, the one of its RABBITMQ_MONITORING_SHARD_INDEX. Replicas of
+a StatefulSet may set RABBITMQ_MONITORING_SHARD_STATEFULSET to its name
+instead, the index is then the ordinal of the pod name in HOSTNAME; the
+pod names of a Deployment carry no ordinal, so without either the exporter
+refuses to start. The partitioning is:
+
+- by 'vhost', the replica lists the vhosts and requests /api/queues/<vhost>
+  of its own vhosts only;
+- by 'queue', the replica pages through all queues and keeps those whose
+  (vhost, name) falls into its partition, which spreads one large vhost
+  over the replicas but has every replica read every queue.
+
+Only the first replica runs the collectors of the cluster-wide series, the
+others run the queue collectors alone, so no series is exported twice.
+"""
+
+import os
+import re
+import zlib
+
+SHARDS = int(os.getenv('RABBITMQ_MONITORING_SHARDS', 1))
+ENABLED = SHARDS > 1
+SHARD_BY = os.getenv('RABBITMQ_MONITORING_SHARD_BY', 'vhost').lower()
+if SHARD_BY not in ('vhost', 'queue'):
+    raise ValueError(f"RABBITMQ_MONITORING_SHARD_BY must be 'vhost' or 'queue', not {SHARD_BY!r}")
+STATEFULSET = os.getenv('RABBITMQ_MONITORING_SHARD_STATEFULSET')
+SHARD_LABEL = 'shard'
+QUEUE_COLLECTORS = ('queues',)
+# partitioning needs the identity of every queue
+SHARD_COLUMNS = ['vhost', 'name']
+
+
+def replica_index(statefulset: str = STATEFULSET) -> int:
+    index = os.getenv('RABBITMQ_MONITORING_SHARD_INDEX')
+    if index is not None:
+        return int(index)
+    if not statefulset:
+        raise ValueError(f'RABBITMQ_MONITORING_SHARDS={SHARDS} needs RABBITMQ_MONITORING_SHARD_INDEX '
+                         f'or RABBITMQ_MONITORING_SHARD_STATEFULSET')
+    hostname = os.getenv('HOSTNAME', '')
+    # <statefulset>-<ordinal>
+    match = re.fullmatch(rf'{re.escape(statefulset)}-(\d+)', hostname)
+    if match is None:
+        raise ValueError(f'Pod {hostname!r} is not a replica of StatefulSet {statefulset}')
+    return int(match.group(1))
+
+
+INDEX = replica_index() if ENABLED else 0
+if not 0 <= INDEX < SHARDS:
+    raise ValueError(f'Shard index {INDEX} is out of the {SHARDS} shards')
+
+
+def shard_of(*key) -> int:
+    """Partition of a vhost or a (vhost, queue), the same on every replica."""
+    return zlib.crc32('\0'.join(key).encode('utf-8')) % SHARDS
+
+
+def owns(*key) -> bool:
+    return shard_of(*key) == INDEX
+
+
+def collectors(names) -> tuple:
+    """The collectors of this replica among ``names``."""
+    if INDEX == 0:
+        return tuple(names)
+    return tuple(name for name in names if name in QUEUE_COLLECTORS)
+
+
+class ShardTotals(object):
+    """Feeds only the queues of this shard into ``totals``."""
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def add(self, queues):
+        self.totals.add([queue for queue in queues if owns(queue['vhost'], queue['name'])])
+
+    def merge(self, other: 'ShardTotals'):
+        self.totals.merge(other.totals)
@@ -0,0 +1,227 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Rates and churn-proof totals from the counters of consecutive collections.
+
+The counters of every object (a channel, a queue, ...) are kept from one
+collection to the next, keyed by a 64-bit hash of the object identity, in
+memory for the resident exporter and in a compressed state file on the
+/tmp emptyDir for exec runs. The growth of a counter since the previous
+collection gives a local rate, so the broker can run with rates_mode=none,
+and summing the growth per group (a node) gives totals that do not drop
+when channels close.
+
+Every kind of object is a namespace of its own, committed by its collector
+once the listing it was observed from has been read completely; a failed
+collection leaves the previous counters in place.
+"""
+
+import contextvars
+import hashlib
+import logging
+import os
+import struct
+import time
+import zlib
+from array import array
+
+import json_codec
+import topology_cache
+
+logger = logging.getLogger(__name__)
+
+LOCAL_RATES = os.getenv('RABBITMQ_MONITORING_LOCAL_RATES', 'false').lower() in ('yes', 'true', 't', '1')
+
+_MAGIC = b'RMQR1'
+_HEADER = struct.Struct('<II')
+
+_engine = contextvars.ContextVar('rate_engine', default=None)
+
+
+def current() -> 'RateEngine':
+    """The engine of the collection running in the current context, if any."""
+    return _engine.get()
+
+
+def object_key(identity: str) -> int:
+    return int.from_bytes(hashlib.blake2b(identity.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def growth(previous, counters) -> tuple:
+    """Growth of every counter; a counter that went down was reset (or the
+    object recreated) and counts from 0."""
+    if previous is None:
+        return tuple(counters)
+    return tuple(value - old if value >= old else value for old, value in zip(previous, counters))
+
+
+class _Namespace(object):
+    __slots__ = ('time', 'width', 'counters', 'totals', 'rates')
+
+    def __init__(self, collected: float, width: int, counters: dict, totals: dict):
+        self.time = collected
+        self.width = width
+        # object key -> counters
+        self.counters = counters
+        # group -> totals since the state was first written
+        self.totals = totals
+        # group -> rates of the last committed interval
+        self.rates = {}
+
+
+class RateEngine(object):
+    """Counters of the previous collection of every namespace.
+
+    ``name`` tells the state files of the scripts sharing a cache directory
+    apart; without a ``cache_dir`` the state lives in memory only.
+    """
+
+    def __init__(self, host: str, name: str, cache_dir: str = topology_cache.CACHE_DIR):
+        digest = hashlib.sha1(host.encode('utf-8')).hexdigest()[:16]
+        self._path = os.path.join(cache_dir, f'rates-{name}-{digest}.bin') if cache_dir else None
+        self._namespaces = {}
+        # namespace -> {object key: (counters, group)} observed this collection
+        self._pending = {}
+        self._started = time.time()
+
+    def begin(self):
+        """Starts a collection; the engine is current for the tasks started
+        from this context afterwards."""
+        self._pending = {}
+        self._started = time.time()
+        _engine.set(self)
+
+    def interval(self, namespace: str):
+        """Seconds since the namespace was last committed, None before that."""
+        state = self._namespaces.get(namespace)
+        if state is None:
+            return None
+        return self._started - state.time if self._started > state.time else None
+
+    def observe(self, namespace: str, identity: str, counters, group=None):
+        """Records the counters of an object and returns their growth since
+        the previous collection, None while the namespace has no previous
+        collection. Observing an object again (a retried page) replaces it."""
+        key = object_key(identity)
+        counters = tuple(int(value) for value in counters)
+        self._pending.setdefault(namespace, {})[key] = (counters, group)
+        state = self._namespaces.get(namespace)
+        if state is None:
+            return None
+        return growth(state.counters.get(key), counters)
+
+    def rates(self, namespace: str, deltas):
+        """Per second rates of ``deltas`` returned by observe(), or None."""
+        interval = self.interval(namespace)
+        if deltas is None or not interval:
+            return None
+        return tuple(delta / interval for delta in deltas)
+
+    def commit(self, namespace: str):
+        """Replaces the counters of the namespace with the ones observed in
+        this collection and adds their growth to the totals of their groups."""
+        observed = self._pending.pop(namespace, {})
+        state = self._namespaces.get(namespace)
+        interval = self.interval(namespace)
+        width = len(next(iter(observed.values()))[0]) if observed else (state.width if state else 0)
+        totals = dict(state.totals) if state is not None else {}
+        grown = {}
+        for key, (counters, group) in observed.items():
+            if group is None:
+                continue
+            deltas = growth(state.counters.get(key) if state is not None else None, counters)
+            group_growth = grown.get(group)
+            if group_growth is None:
+                grown[group] = list(deltas)
+            else:
+                for i, delta in enumerate(deltas):
+                    group_growth[i] += delta
+        for group, deltas in grown.items():
+            group_totals = totals.get(group)
+            totals[group] = [old + delta for old, delta in zip(group_totals, deltas)] \
+                if group_totals is not None else deltas
+        committed = _Namespace(self._started, width,
+                               {key: counters for key, (counters, _) in observed.items()}, totals)
+        if interval:
+            committed.rates = {group: [delta / interval for delta in deltas] for group, deltas in grown.items()}
+        self._namespaces[namespace] = committed
+        self._store()
+
+    def totals(self, namespace: str) -> dict:
+        state = self._namespaces.get(namespace)
+        return state.totals if state is not None else {}
+
+    def group_rates(self, namespace: str) -> dict:
+        """Rates per group over the last committed interval, {} before that."""
+        state = self._namespaces.get(namespace)
+        return state.rates if state is not None else {}
+
+    def load(self):
+        """Reads the state file, an unreadable file counts as empty."""
+        if self._path is None:
+            return
+        try:
+            with open(self._path, 'rb') as f:
+                content = f.read()
+            if not content.startswith(_MAGIC):
+                return
+            offset = len(_MAGIC)
+            header_size, body_size = _HEADER.unpack_from(content, offset)
+            offset += _HEADER.size
+            header = json_codec.loads(content[offset:offset + header_size])
+            body = zlib.decompress(content[offset + header_size:offset + header_size + body_size])
+            self._namespaces = self._decode(header, body)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f'Cannot read rate state {self._path}: {type(e).__name__}')
+
+    @staticmethod
+    def _decode(header: dict, body: bytes) -> dict:
+        namespaces = {}
+        offset = 0
+        for namespace, meta in header.items():
+            width, count = meta['width'], meta['count']
+            keys = array('Q')
+            keys.frombytes(body[offset:offset + 8 * count])
+            offset += 8 * count
+            values = array('Q')
+            values.frombytes(body[offset:offset + 8 * count * width])
+            offset += 8 * count * width
+            counters = {key: tuple(values[i * width:(i + 1) * width]) for i, key in enumerate(keys)}
+            namespaces[namespace] = _Namespace(meta['time'], width, counters, meta['totals'])
+        return namespaces
+
+    def _store(self):
+        if self._path is None:
+            return
+        header = {}
+        body = []
+        for namespace, state in self._namespaces.items():
+            header[namespace] = {'time': state.time, 'width': state.width,
+                                 'count': len(state.counters), 'totals': state.totals}
+            body.append(array('Q', state.counters).tobytes())
+            body.append(array('Q', (value for counters in state.counters.values()
+                                    for value in counters)).tobytes())
+        header = json_codec.dumps(header)
+        body = zlib.compress(b''.join(body), 1)
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            # concurrent exporter runs never see a partially written file
+            tmp = f'{self._path}.{os.getpid()}'
+            with open(tmp, 'wb') as f:
+                f.write(_MAGIC + _HEADER.pack(len(header), len(body)) + header + body)
+            os.replace(tmp, self._path)
+        except OSError as e:
+            logger.warning(f'Cannot write rate state {self._path}: {type(e).__name__}')
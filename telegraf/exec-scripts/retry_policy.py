@@ -0,0 +1,214 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Retry policy shared by the exec-scripts for management API calls.
+
+Only errors that indicate an unavailable or overloaded broker are retried
+(connection errors, timeouts and 5xx responses), with exponential backoff
+and full jitter. All retried calls of one scrape share a deadline, and an
+optional per-endpoint circuit breaker stops calling an endpoint for a
+cool-off period after repeated failures; exec runs carry the breakers over
+to the next run, so the cool-off spans runs.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import time
+from functools import wraps
+
+import aiohttp
+
+
+def parse_duration(value: str, default: float = 10.0) -> float:
+    """Converts telegraf-like durations ('500ms', '10s', '1m') to seconds."""
+    value = (value or '').strip().lower()
+    if not value:
+        return default
+    for suffix, factor in (('ms', 0.001), ('s', 1), ('m', 60), ('h', 3600)):
+        if value.endswith(suffix):
+            return float(value[:-len(suffix)]) * factor
+    return float(value)
+
+
+RETRIES = int(os.getenv('RABBITMQ_MONITORING_RETRIES', 5))
+BACKOFF = parse_duration(os.getenv('RABBITMQ_MONITORING_BACKOFF'), 0.1)
+MAX_BACKOFF = parse_duration(os.getenv('RABBITMQ_MONITORING_MAX_BACKOFF'), 2.0)
+# leave time to render and print the output before telegraf kills the script
+DEADLINE = parse_duration(os.getenv('RABBITMQ_MONITORING_DEADLINE'),
+                          0.8 * parse_duration(os.getenv('RABBIT_EXEC_PLUGIN_TIMEOUT'), 10.0))
+BREAKER_FAILURES = int(os.getenv('RABBITMQ_MONITORING_BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN = parse_duration(os.getenv('RABBITMQ_MONITORING_BREAKER_COOLDOWN'), 30.0)
+
+_deadline = contextvars.ContextVar('retry_deadline', default=None)
+
+
+class RetryExhaustedError(IOError):
+    pass
+
+
+class DeadlineExceededError(RetryExhaustedError):
+    pass
+
+
+class CircuitOpenError(RetryExhaustedError):
+    pass
+
+
+def set_deadline(seconds: float = DEADLINE):
+    """Bounds the retried calls made from the current context.
+
+    Tasks started from the context afterwards share the deadline, so it is
+    set once at the start of a scrape; 0 disables it.
+    """
+    _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def remaining():
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                              asyncio.TimeoutError))
+
+
+class CircuitBreaker(object):
+    """Opens after ``failures`` consecutive retryable failures.
+
+    While open, calls are rejected until ``cooldown`` has passed; then a
+    single trial call is let through (half-open) which either closes the
+    breaker or opens it again.
+    """
+
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self._threshold = failures
+        self._cooldown = cooldown
+        self._failures = 0
+        self._opened_at = 0.0
+        self.state = self.CLOSED
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        # a trial call that never reported back does not block the endpoint
+        # for longer than another cool-off period
+        if time.monotonic() - self._opened_at >= self._cooldown:
+            self.state = self.HALF_OPEN
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self._threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def dump(self) -> list:
+        """State carried across exec runs, opened at a wall clock time."""
+        return [self.state, self._failures, time.time() - (time.monotonic() - self._opened_at)]
+
+    def load(self, state):
+        self.state, self._failures, opened_at = state
+        self._opened_at = time.monotonic() - max(0.0, time.time() - opened_at)
+
+
+class CircuitBreakers(object):
+    """Circuit breakers of one management API, created per endpoint on demand."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self._failures = failures
+        self._cooldown = cooldown
+        self._breakers = {}
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(self._failures, self._cooldown)
+        return breaker
+
+    def states(self) -> dict:
+        return {endpoint: breaker.state for endpoint, breaker in self._breakers.items()}
+
+    def dump(self) -> dict:
+        """The breakers that are not closed or have seen failures."""
+        states = {endpoint: breaker.dump() for endpoint, breaker in self._breakers.items()}
+        return {endpoint: state for endpoint, state in states.items()
+                if state[:2] != [CircuitBreaker.CLOSED, 0]}
+
+    def load(self, states: dict):
+        for endpoint, state in states.items():
+            self.get(endpoint).load(state)
+
+
+def retry(retries=RETRIES, backoff=BACKOFF, max_backoff=MAX_BACKOFF, breaker=None, on_retry=None):
+    """Retries a coroutine on retryable errors within the scrape deadline.
+
+    ``breaker`` and ``on_retry`` are called with the arguments of the
+    decorated call; the first returns the CircuitBreaker guarding it (or
+    None), the second is notified before every retry.
+    """
+    def wrap(func):
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            circuit = breaker(*args, **kwargs) if breaker else None
+            attempt = 0
+
+            while True:
+                if circuit is not None and not circuit.allow():
+                    raise CircuitOpenError(func.__qualname__, args, kwargs)
+                timeout = remaining()
+                if timeout is not None and timeout <= 0:
+                    raise DeadlineExceededError(func.__qualname__, args, kwargs)
+
+                try:
+                    result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    if circuit is not None:
+                        circuit.record_failure()
+                    attempt += 1
+                    delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+                    timeout = remaining()
+
+                    if attempt > retries or (timeout is not None and timeout <= delay):
+                        raise RetryExhaustedError(
+                            func.__qualname__, args, kwargs) from e
+
+                    if on_retry:
+                        on_retry(*args, **kwargs)
+                    await asyncio.sleep(delay)
+                else:
+                    if circuit is not None:
+                        circuit.record_success()
+                    return result
+
+        return inner
+
+    return wrap
@@ -0,0 +1,89 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""On-disk cache of what rarely changes about a cluster.
+
+The cluster overview (cluster name and version) and the node list are kept
+in a small JSON file on the /tmp emptyDir, so an exporter started by
+telegraf for every interval does not have to request them again before it
+can start collecting. Every entry records when it was stored; callers
+decide whether it is still fresh enough for them.
+"""
+
+import hashlib
+import logging
+import os
+import time
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('RABBITMQ_MONITORING_CACHE_DIR', '/tmp/monitoring/cache')
+
+
+class TopologyCache(object):
+    """Cached entries of the management API at ``host``, one file per host
+    and ``name``; state of a single output gets a name of its own, so the
+    outputs do not overwrite each other's entries."""
+
+    def __init__(self, host: str, cache_dir: str = CACHE_DIR, name: str = 'topology'):
+        digest = hashlib.sha1(host.encode('utf-8')).hexdigest()[:16]
+        self._path = os.path.join(cache_dir, f'{name}-{digest}.json') if cache_dir else None
+        self._host = host
+        self._entries = {}
+
+    def load(self):
+        """Reads the file, an unreadable or foreign file counts as empty."""
+        if self._path is None:
+            return
+        try:
+            with open(self._path, 'rb') as f:
+                content = json_codec.loads(f.read())
+            if content.get('host') == self._host:
+                self._entries = content.get('entries', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f'Cannot read topology cache {self._path}: {type(e).__name__}')
+
+    def get(self, key: str):
+        """Returns the value and its age in seconds, or (None, None)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        return entry['value'], max(0.0, time.time() - entry['updated'])
+
+    def set(self, key: str, value):
+        self._entries[key] = {'value': value, 'updated': time.time()}
+        self._store()
+
+    def invalidate(self, *keys: str):
+        """Drops ``keys`` (all entries without arguments) from the cache."""
+        for key in keys or list(self._entries):
+            self._entries.pop(key, None)
+        self._store()
+
+    def _store(self):
+        if self._path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            # concurrent exporter runs never see a partially written file
+            tmp = f'{self._path}.{os.getpid()}'
+            with open(tmp, 'wb') as f:
+                f.write(json_codec.dumps({'host': self._host, 'entries': self._entries}))
+            os.replace(tmp, self._path)
+        except OSError as e:
+            logger.warning(f'Cannot write topology cache {self._path}: {type(e).__name__}')
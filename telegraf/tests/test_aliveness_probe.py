@@ -0,0 +1,84 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+
+from aliveness_probe import AlivenessProber, ProbeResult, quantile
+
+
+def test_quantile_is_nearest_rank():
+    values = [0.5, 0.1, 0.4, 0.2, 0.3]
+    assert [quantile(values, q) for q in (0.5, 0.9, 0.99, 0.0)] == [0.3, 0.5, 0.5, 0.1]
+
+
+def test_batches_rotate_through_the_vhosts():
+    prober = AlivenessProber(vhosts='*', batch=2)
+    assert prober.vhosts is None
+    vhosts = ['c', 'a', 'b']
+    assert [prober.select(vhosts) for _ in range(3)] == [['a', 'b'], ['c', 'a'], ['b', 'c']]
+    assert AlivenessProber(vhosts='a, b', batch=0).select(['b', 'a']) == ['a', 'b']
+
+
+def test_run_probes_every_vhost_on_every_node():
+    async def request(vhost, base):
+        if vhost == 'hang':
+            await asyncio.sleep(10)
+        if vhost == 'error':
+            raise ConnectionError()
+        return vhost == 'ok'
+
+    prober = AlivenessProber(parallelism=2, timeout=0.1)
+    results = asyncio.run(prober.run(['ok', 'down', 'hang', 'error'],
+                                     [('rabbit@n0', 'http://n0'), ('rabbit@n1', 'http://n1')], request))
+    assert [(result.vhost, result.node, result.ok) for result in results] == [
+        ('ok', 'rabbit@n0', True), ('ok', 'rabbit@n1', True),
+        ('down', 'rabbit@n0', False), ('down', 'rabbit@n1', False),
+        ('hang', 'rabbit@n0', False), ('hang', 'rabbit@n1', False),
+        ('error', 'rabbit@n0', False), ('error', 'rabbit@n1', False),
+    ]
+    assert all(isinstance(result, ProbeResult) for result in results)
+    assert prober.stats('ok', 'rabbit@n0').failures == 0
+    assert prober.stats('hang', 'rabbit@n1').failures == 1
+
+
+def test_stats_are_carried_across_exec_runs():
+    prober = AlivenessProber(vhosts='*', batch=1, window=3)
+    prober.select(['a', 'b'])
+    for seconds in (0.01, 0.02, 0.3, 0.04):
+        prober.stats('a', 'rabbit@n0').observe(seconds)
+    prober.stats('b', 'rabbit@n0').failures = 2
+
+    loaded = AlivenessProber(vhosts='*', batch=1, window=3)
+    loaded.load(json.loads(json.dumps(prober.dump())))
+    assert loaded.cursor == 1
+    stats = loaded.stats('a', 'rabbit@n0')
+    assert list(stats.latencies) == [0.02, 0.3, 0.04]
+    assert stats.counts == prober.stats('a', 'rabbit@n0').counts
+    assert stats.quantiles()[0.5] == 0.04
+    assert loaded.stats('b', 'rabbit@n0').failures == 2
+
+
+def test_state_of_another_version_is_dropped():
+    prober = AlivenessProber()
+    prober.load({'stats': [['/', 'rabbit@n0', [], [1, 2], 0.0, 0]]})
+    assert prober.stats('/', 'rabbit@n0').counts == [0] * len(prober.stats('/', 'rabbit@n0').buckets)
+
+
+def test_prune_forgets_vhosts_and_nodes_that_are_gone():
+    prober = AlivenessProber()
+    for vhost, node in (('a', 'n0'), ('a', 'n1'), ('b', 'n0')):
+        prober.stats(vhost, node).failures = 1
+    prober.prune(['a'], ['n0'])
+    assert prober.dump()['stats'] == [['a', 'n0', [], prober.stats('a', 'n0').counts, 0.0, 1]]
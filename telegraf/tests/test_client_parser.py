@@ -0,0 +1,95 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import client_parser
+from client_parser import ClientChannelTotals, ClientConnectionTotals, ClientTotals
+
+
+def _connection(name, client, channels, user='app', vhost='/'):
+    return {'name': name, 'user': user, 'vhost': vhost, 'channels': channels,
+            'client_properties': {'connection_name': client}}
+
+
+def _channel(connection, unconfirmed=0, rate=0.0, user='app', vhost='/'):
+    return {'connection_details': {'name': connection}, 'user': user, 'vhost': vhost,
+            'messages_unconfirmed': unconfirmed, 'message_stats': {'publish_details': {'rate': rate}}}
+
+
+def _merge(root, items):
+    page = type(root)()
+    page.add(items)
+    root.merge(page)
+
+
+def test_channels_are_folded_into_the_client_of_their_connection():
+    totals = ClientTotals()
+    connections = ClientConnectionTotals(totals)
+    channels = ClientChannelTotals(totals)
+    _merge(connections, [_connection('c1', 'orders', 2), _connection('c2', 'orders', 1),
+                                 _connection('c3', 'billing', 0)])
+    # only the connections still waiting for channels are kept
+    assert set(totals._connections) == {'c1', 'c2'}
+    _merge(channels, [_channel('c1', 1, 0.5), _channel('c2', 2, 1.0)])
+    assert set(totals._connections) == {'c1'}
+    _merge(channels, [_channel('c1', 3, 0.25)])
+    assert totals._connections == {}
+    assert totals.finish() == {('app', '/', 'orders'): [2, 3, 6, 1.75],
+                               ('app', '/', 'billing'): [1, 0, 0, 0.0]}
+
+
+def test_channels_listed_before_their_connection_wait_for_it():
+    totals = ClientTotals()
+    connections = ClientConnectionTotals(totals)
+    channels = ClientChannelTotals(totals)
+    _merge(channels, [_channel('c1', 1), _channel('c1', 1), _channel('c2', 5)])
+    assert set(totals._channels) == {'c1', 'c2'}
+    _merge(connections, [_connection('c1', 'orders', 2)])
+    assert set(totals._channels) == {'c2'}
+    assert totals._connections == {}
+    # c2 was opened after the connections were listed
+    assert totals.finish() == {('app', '/', 'orders'): [1, 2, 2, 0.0],
+                               ('app', '/', ''): [0, 1, 5, 0.0]}
+
+
+def test_connections_without_a_channel_count_wait_for_the_end():
+    totals = ClientTotals()
+    connections = ClientConnectionTotals(totals)
+    channels = ClientChannelTotals(totals)
+    connection = _connection('c1', 'orders', 0)
+    del connection['channels']
+    _merge(connections, [connection])
+    _merge(channels, [_channel('c1', 1)])
+    _merge(channels, [_channel('c1', 1)])
+    assert totals.finish() == {('app', '/', 'orders'): [1, 2, 2, 0.0]}
+
+
+def test_client_name_falls_back_to_the_product():
+    assert client_parser.client_name({'client_properties': {'product': 'pika'}}) == 'pika'
+    assert client_parser.client_name({}) == ''
+
+
+def test_render_exports_the_top_clients():
+    connections = [_connection(f'c{i}', f'service-{i}', 1) for i in range(5)]
+    channels = [_channel(f'c{i}', unconfirmed=i) for i in range(5)]
+    totals = ClientTotals()
+    connection_totals = ClientConnectionTotals(totals)
+    connection_totals.add(connections)
+    channel_totals = ClientChannelTotals(totals)
+    channel_totals.add(channels)
+    text = ''.join(client_parser.render_clients(connection_totals, channel_totals, 'test', top_k=1))
+    assert 'rabbitmq_client_messages_unconfirmed{rabbitmq_cluster="test",user="app",vhost="/",' \
+           'client="service-4"} 4.0' in text
+    assert 'client="service-2"' not in text
+    assert 'rabbitmq_client_clients{rabbitmq_cluster="test"} 5.0' in text
+    assert 'rabbitmq_client_breakdown_complete{rabbitmq_cluster="test"} 1.0' in text
@@ -0,0 +1,64 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import exposition
+from cluster_targets import Target, load_targets, run_targets
+
+
+def _write(directory, **secrets):
+    directory.mkdir(parents=True, exist_ok=True)
+    for key, value in secrets.items():
+        (directory / key).write_text(value + '\n')
+
+
+def test_load_targets(tmp_path, monkeypatch):
+    monkeypatch.setenv('RABBITMQ_MONITORING_SECRETS_DIR', str(tmp_path))
+    _write(tmp_path, RABBITMQ_USER='admin', RABBITMQ_PASSWORD='secret')
+    _write(tmp_path / 'a', RABBITMQ_HOST='rabbitmq.a')
+    _write(tmp_path / 'b', RABBITMQ_HOST='https://rabbitmq.b:15671/', RABBITMQ_USER='b-user',
+           RABBITMQ_PASSWORD='b-password')
+    _write(tmp_path / 'c')
+    _write(tmp_path / '.hidden', RABBITMQ_HOST='rabbitmq.hidden')
+
+    expected = [Target('a', 'http://rabbitmq.a:15672', 'admin', 'secret'),
+                Target('b', 'https://rabbitmq.b:15671', 'b-user', 'b-password')]
+    # c has no host and is skipped
+    assert load_targets('*') == expected
+    assert load_targets(' b , c') == expected[1:]
+    assert load_targets('*', secrets_dir=str(tmp_path / 'missing')) == []
+
+
+def test_run_targets_bounds_every_target_by_the_deadline():
+    cancelled = []
+
+    async def run(client):
+        if client == 'slow':
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(client)
+                raise
+        if client == 'broken':
+            raise ValueError()
+        gauge = exposition.Gauge('rabbitmq_up', 'Up')
+        gauge.set(1)
+        return ''.join(exposition.render([gauge]))
+
+    results = asyncio.run(run_targets({'a': 'fast', 'b': 'slow', 'c': 'broken'}, run, deadline=0.2))
+    assert results['a'][0] == '# HELP rabbitmq_up Up\n# TYPE rabbitmq_up gauge\nrabbitmq_up{target="a"} 1.0\n'
+    assert results['b'][0] is None and 0.2 <= results['b'][1] < 1
+    assert results['c'][0] is None
+    assert cancelled == ['slow']
@@ -0,0 +1,120 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import exposition
+from exposition import Gauge, Histogram, format_value, merge, render, set_scope
+
+
+@pytest.fixture(autouse=True)
+def scope():
+    set_scope(None)
+    yield
+    set_scope(None)
+
+
+@pytest.mark.parametrize('value, text', [
+    (1, '1.0'), (0.5, '0.5'), (1234567.0, '1.234567e+06'), (123456.0, '123456.0'),
+    (float('inf'), '+Inf'), (float('-inf'), '-Inf'), (float('nan'), 'NaN'),
+])
+def test_format_value(value, text):
+    assert format_value(value) == text
+
+
+def test_labels_keep_declaration_order_and_are_escaped():
+    gauge = Gauge('rabbitmq_queue_messages', 'Messages\nin "queues"', ['vhost', 'queue'])
+    gauge.labels('/', 'a\\b"c\nd').set(3)
+    assert ''.join(render([gauge])) == (
+        '# HELP rabbitmq_queue_messages Messages\\nin "queues"\n'
+        '# TYPE rabbitmq_queue_messages gauge\n'
+        'rabbitmq_queue_messages{vhost="/",queue="a\\\\b\\"c\\nd"} 3.0\n')
+
+
+def test_histogram_buckets_are_cumulative_with_le_last():
+    histogram = Histogram('rabbitmq_seconds', 'Seconds', ['rabbitmq_cluster'],
+                          buckets=(0.1, 1.0, exposition.INF))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.labels('c').observe(value)
+    assert ''.join(render([histogram])).splitlines()[2:] == [
+        'rabbitmq_seconds_bucket{rabbitmq_cluster="c",le="0.1"} 1.0',
+        'rabbitmq_seconds_bucket{rabbitmq_cluster="c",le="1.0"} 3.0',
+        'rabbitmq_seconds_bucket{rabbitmq_cluster="c",le="+Inf"} 4.0',
+        'rabbitmq_seconds_count{rabbitmq_cluster="c"} 4.0',
+        'rabbitmq_seconds_sum{rabbitmq_cluster="c"} 6.25',
+    ]
+
+
+def _samples(text, parser):
+    return sorted((sample.name, tuple(sorted(sample.labels.items())), sample.value)
+                  for family in parser.text_string_to_metric_families(text)
+                  for sample in family.samples if not sample.name.endswith('_created'))
+
+
+def test_same_samples_as_prometheus_client():
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from prometheus_client import parser
+    registry = prometheus_client.CollectorRegistry()
+    reference = prometheus_client.Gauge('rabbitmq_node_mem_used', 'Memory used',
+                                        ['rabbitmq_node', 'rabbitmq_cluster'], registry=registry)
+    reference_histogram = prometheus_client.Histogram('rabbitmq_duration_seconds', 'Duration',
+                                                      ['rabbitmq_cluster', 'endpoint'],
+                                                      registry=registry, buckets=(0.1, 2.5))
+    gauge = Gauge('rabbitmq_node_mem_used', 'Memory used', ['rabbitmq_node', 'rabbitmq_cluster'])
+    histogram = Histogram('rabbitmq_duration_seconds', 'Duration', ['rabbitmq_cluster', 'endpoint'],
+                          buckets=(0.1, 2.5, exposition.INF))
+    for node, value in (('rabbit@n0', 12345678.0), ('rabbit@"n1"', 0.25)):
+        reference.labels(node, 'test').set(value)
+        gauge.labels(node, 'test').set(value)
+    for value in (0.05, 1.5):
+        reference_histogram.labels('test', 'queues').observe(value)
+        histogram.labels('test', 'queues').observe(value)
+    text = ''.join(render([gauge, histogram]))
+    assert _samples(text, parser) == _samples(prometheus_client.generate_latest(registry).decode(), parser)
+    # the headers are the same text
+    assert [line for line in text.splitlines() if line.startswith('#')] == \
+        [line for line in prometheus_client.generate_latest(registry).decode().splitlines()
+         if line.startswith('#') and '_created' not in line]
+
+
+def test_series_not_updated_expire():
+    gauge = Gauge('rabbitmq_queue_messages', 'Messages', ['queue'])
+    gauge.labels('q1').set(1)
+    gauge.labels('q2').set(2)
+    gauge.expire(cycles=2)
+    gauge.labels('q1').set(1)
+    gauge.expire(cycles=2)
+    assert 'q2' in ''.join(render([gauge], expire=False))
+    gauge.labels('q1').set(1)
+    gauge.expire(cycles=2)
+    text = ''.join(render([gauge], expire=False))
+    assert 'q1' in text and 'q2' not in text
+
+
+def test_scopes_are_labelled_with_the_target_and_merged():
+    gauge = Gauge('rabbitmq_up', 'Up', ['rabbitmq_cluster'])
+    outputs = []
+    for target in ('a', 'b'):
+        set_scope(target)
+        gauge.labels('c').set(1)
+        outputs.append(render([gauge]))
+    assert ''.join(merge(outputs)) == (
+        '# HELP rabbitmq_up Up\n# TYPE rabbitmq_up gauge\n'
+        'rabbitmq_up{rabbitmq_cluster="c",target="a"} 1.0\n'
+        'rabbitmq_up{rabbitmq_cluster="c",target="b"} 1.0\n')
+
+
+def test_wrong_label_count_is_an_error():
+    with pytest.raises(ValueError):
+        Gauge('rabbitmq_up', 'Up', ['rabbitmq_cluster']).labels()
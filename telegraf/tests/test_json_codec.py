@@ -0,0 +1,44 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+import json_codec
+
+
+def test_round_trip_of_compact_utf8():
+    document = {'name': 'ü queue', 'args': {'x-max-length': 10, 'ratio': 0.5}, 'tags': [], 'ok': True}
+    encoded = json_codec.dumps(document)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded.decode('utf-8')) == document
+    assert 'ü'.encode('utf-8') in encoded
+    assert b': ' not in encoded and b', ' not in encoded
+    assert json_codec.loads(encoded) == document
+
+
+def test_integers_beyond_64_bits():
+    document = {'message_bytes': 2 ** 70, 'messages': -2 ** 65}
+    assert json_codec.loads(json_codec.dumps(document)) == document
+    assert json_codec.loads(json.dumps(document).encode('utf-8')) == document
+
+
+@pytest.mark.parametrize('name', sorted(json_codec.BACKENDS))
+def test_backends_agree(name):
+    loaded, loads, dumps = json_codec.load_backend(name)
+    if loaded != name:
+        pytest.skip(f'{name} is not installed')
+    document = {'a': [1, 2.5, None, 'x"y'], 'b': {'c': False}}
+    assert loads(dumps(document)) == document
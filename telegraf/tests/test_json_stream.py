@@ -0,0 +1,80 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+from json_stream import JSONItemSplitter
+
+PAGE = {
+    'filtered_count': 3,
+    'items': [{'name': 'q1', 'vhost': '/', 'messages': 1},
+              {'name': 'q,2', 'vhost': 'a "b"', 'args': {'x-max': [1, 2.5e3]}},
+              {'name': 'ü [q3]', 'vhost': '/', 'messages': 12345678901234567890}],
+    'page': 1,
+    'page_count': 1,
+}
+
+
+def split(text, chunk_size, key=None):
+    splitter = JSONItemSplitter(key)
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items.extend(splitter.feed(text[start:start + chunk_size]))
+    items.extend(splitter.feed('', final=True))
+    return items, splitter.meta
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 10 ** 6])
+def test_splits_items_of_a_page_at_any_chunk_boundary(chunk_size):
+    items, meta = split(json.dumps(PAGE, indent=1), chunk_size, key='items')
+    assert items == PAGE['items']
+    assert meta == {'filtered_count': 3, 'page': 1, 'page_count': 1}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 10 ** 6])
+def test_splits_a_plain_array(chunk_size):
+    items, meta = split(json.dumps(PAGE['items']), chunk_size)
+    assert items == PAGE['items']
+    assert meta == {}
+
+
+def test_number_at_chunk_end_waits_for_the_next_chunk():
+    splitter = JSONItemSplitter()
+    assert splitter.feed('[12') == []
+    assert splitter.feed('34,5') == [1234]
+    assert splitter.feed(']', final=True) == [5]
+
+
+def test_empty_array():
+    assert split('{"items": [], "page_count": 0}', 4, key='items') == ([], {'page_count': 0})
+
+
+def test_truncated_document_is_an_error():
+    splitter = JSONItemSplitter(key='items')
+    splitter.feed('{"items": [{"name": "q1"},')
+    with pytest.raises(ValueError):
+        splitter.feed('', final=True)
+
+
+def test_unexpected_document_start_is_an_error():
+    with pytest.raises(ValueError):
+        JSONItemSplitter().feed('{"items": []}')
+
+
+def test_load_takes_the_items_of_a_decoded_page():
+    splitter = JSONItemSplitter(key='items')
+    assert splitter.load(json.loads(json.dumps(PAGE))) == PAGE['items']
+    assert splitter.meta['page_count'] == 1
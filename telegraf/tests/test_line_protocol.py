@@ -0,0 +1,55 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+
+from line_protocol import LineWriter, format_line
+
+
+def test_escapes_measurement_tags_and_field_keys():
+    line = format_line('rabbitmq queue,x', {'messages ready': 1, 'a=b': 2.5},
+                       {'queue': 'q 1,=2', 'vhost': '/'})
+    assert line == r'rabbitmq\ queue\,x,queue=q\ 1\,\=2,vhost=/ messages\ ready=1,a\=b=2.5'
+
+
+def test_escapes_string_field_values():
+    assert format_line('m', {'reason': 'say "hi" \\o/'}) == r'm reason="say \"hi\" \\o/"'
+
+
+def test_escapes_newlines():
+    assert format_line('m\n', {'f': 1}, {'t': 'a\nb'}) == r'm\n,t=a\nb f=1'
+
+
+def test_booleans_and_integers():
+    assert format_line('m', {'up': True, 'down': False, 'count': 3}) == 'm up=true,down=false,count=3'
+
+
+def test_empty_tags_and_unrepresentable_fields_are_left_out():
+    line = format_line('m', {'nan': float('nan'), 'inf': float('inf'), 'none': None, 'ok': 1},
+                       {'empty': '', 'none': None, 'node': 'rabbit@n0'})
+    assert line == 'm,node=rabbit@n0 ok=1'
+
+
+def test_no_line_without_fields():
+    assert format_line('m', {'nan': float('nan')}, {'node': 'n'}) is None
+
+
+def test_writer_batches_and_skips_missing_lines():
+    stream = io.StringIO()
+    with LineWriter(stream, batch_lines=2) as writer:
+        writer.write_lines(['a f=1', None, 'b f=2', 'c f=3'])
+        assert stream.getvalue() == 'a f=1\nb f=2\n'
+        writer.write('d', {'f': None})
+    assert stream.getvalue() == 'a f=1\nb f=2\nc f=3\n'
+    assert writer.lines == 3
@@ -0,0 +1,58 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from management_api import ScrapeSnapshot
+
+
+def test_snapshot_requests_each_endpoint_once():
+    requested = []
+
+    async def request(url):
+        requested.append(url)
+        await asyncio.sleep(0)
+        return {'url': url}
+
+    async def main():
+        snapshot = ScrapeSnapshot(request, None)
+        results = await asyncio.gather(snapshot.get('nodes'), snapshot.get('nodes'), snapshot.get('overview'))
+        return results, snapshot
+
+    results, snapshot = asyncio.run(main())
+    assert results == [{'url': 'nodes'}, {'url': 'nodes'}, {'url': 'overview'}]
+    assert sorted(requested) == ['nodes', 'overview']
+    assert (snapshot.succeeded, snapshot.failed) == (2, 0)
+
+
+def test_close_cancels_the_requests_in_flight():
+    async def request(url):
+        if url == 'broken':
+            raise ValueError(url)
+        await asyncio.sleep(10)
+
+    async def main():
+        snapshot = ScrapeSnapshot(request, None)
+        pending = snapshot.get('queues')
+        try:
+            await asyncio.gather(snapshot.get('broken'), pending)
+        except ValueError:
+            pass
+        snapshot.close()
+        await asyncio.sleep(0)
+        return pending, snapshot
+
+    pending, snapshot = asyncio.run(main())
+    assert pending.cancelled()
+    assert (snapshot.succeeded, snapshot.failed) == (0, 2)
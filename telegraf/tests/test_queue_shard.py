@@ -0,0 +1,106 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import queue_shard
+from queue_shard import ShardTotals, owns, replica_index, shard_of
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    def configure(count, index=0):
+        monkeypatch.setattr(queue_shard, 'SHARDS', count)
+        monkeypatch.setattr(queue_shard, 'INDEX', index)
+    return configure
+
+
+def test_shard_of_is_stable_and_in_range(shards):
+    shards(4)
+    assert shard_of('/', 'orders') == shard_of('/', 'orders')
+    assert {shard_of('vhost-%d' % i) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_vhost_and_queue_keys_do_not_collide(shards):
+    shards(1000)
+    # the parts of the key are joined with a separator
+    assert shard_of('a', 'bc') != shard_of('ab', 'c')
+
+
+def test_every_queue_is_owned_by_exactly_one_replica(shards):
+    queues = [('vhost-%d' % (i % 7), 'queue-%d' % i) for i in range(500)]
+    owners = {}
+    for index in range(3):
+        shards(3, index)
+        for queue in queues:
+            if owns(*queue):
+                owners.setdefault(queue, []).append(index)
+    assert all(len(indexes) == 1 for indexes in owners.values())
+    assert len(owners) == len(queues)
+    # roughly a third each
+    assert all(100 < sum(1 for indexes in owners.values() if indexes == [index]) < 230
+               for index in range(3))
+
+
+def test_collectors_of_other_replicas_are_the_queue_collectors(shards):
+    shards(2, 0)
+    assert queue_shard.collectors(('nodes', 'queues', 'overview')) == ('nodes', 'queues', 'overview')
+    shards(2, 1)
+    assert queue_shard.collectors(('nodes', 'queues', 'overview')) == ('queues',)
+
+
+class _Totals(object):
+
+    def __init__(self):
+        self.queues = []
+
+    def add(self, queues):
+        self.queues.extend(queues)
+
+    def merge(self, other):
+        self.queues.extend(other.queues)
+
+
+def test_shard_totals_keep_the_queues_of_the_shard(shards):
+    shards(2, 1)
+    queues = [{'vhost': '/', 'name': 'q%d' % i} for i in range(50)]
+    totals = ShardTotals(_Totals())
+    page = ShardTotals(_Totals())
+    page.add(queues)
+    totals.merge(page)
+    assert totals.totals.queues == [queue for queue in queues if owns('/', queue['name'])]
+    assert 0 < len(totals.totals.queues) < 50
+
+
+def test_replica_index_from_the_environment(monkeypatch):
+    monkeypatch.setenv('RABBITMQ_MONITORING_SHARD_INDEX', '2')
+    assert replica_index() == 2
+
+
+def test_replica_index_from_the_statefulset_ordinal(monkeypatch):
+    monkeypatch.delenv('RABBITMQ_MONITORING_SHARD_INDEX', raising=False)
+    monkeypatch.setenv('HOSTNAME', 'rabbitmq-monitoring-3')
+    assert replica_index('rabbitmq-monitoring') == 3
+
+
+@pytest.mark.parametrize('statefulset, hostname', [
+    (None, 'rabbitmq-monitoring-3'),
+    ('rabbitmq-monitoring', 'rabbitmq-monitoring-5d8f7c9b4-x2x7q'),
+    ('rabbitmq', 'rabbitmq-monitoring-3'),
+])
+def test_replica_index_needs_an_index_or_an_ordinal(monkeypatch, statefulset, hostname):
+    monkeypatch.delenv('RABBITMQ_MONITORING_SHARD_INDEX', raising=False)
+    monkeypatch.setenv('HOSTNAME', hostname)
+    with pytest.raises(ValueError):
+        replica_index(statefulset)
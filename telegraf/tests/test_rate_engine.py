@@ -0,0 +1,103 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from rate_engine import RateEngine, growth
+
+
+def test_growth_counts_a_reset_counter_from_zero():
+    assert growth((10, 20), (15, 5)) == (5, 5)
+    assert growth((10, 20), (10, 20)) == (0, 0)
+
+
+def test_growth_of_a_new_object_is_its_counters():
+    assert growth(None, (3, 4)) == (3, 4)
+
+
+def _collect(engine, started, objects, namespace='channels'):
+    engine.begin()
+    engine._started = started
+    deltas = {identity: engine.observe(namespace, identity, counters, group)
+              for identity, (counters, group) in objects.items()}
+    engine.commit(namespace)
+    return deltas
+
+
+def test_first_collection_has_no_growth():
+    engine = RateEngine('http://rabbitmq:15672', 'test', cache_dir=None)
+    assert _collect(engine, 100.0, {'ch1': ((5,), 'n0')}) == {'ch1': None}
+    assert engine.interval('channels') is None
+
+
+def test_rates_and_totals_across_a_counter_reset():
+    engine = RateEngine('http://rabbitmq:15672', 'test', cache_dir=None)
+    _collect(engine, 100.0, {'ch1': ((100, 10), 'n0'), 'ch2': ((50, 0), 'n0')})
+    # ch1 was recreated and counts from 0 again, ch2 grew by 20
+    deltas = _collect(engine, 110.0, {'ch1': ((30, 4), 'n0'), 'ch2': ((70, 0), 'n0')})
+    assert deltas == {'ch1': (30, 4), 'ch2': (20, 0)}
+    assert engine.group_rates('channels') == {'n0': [5.0, 0.4]}
+    assert engine.totals('channels') == {'n0': [200, 14]}
+
+
+def test_totals_do_not_drop_when_objects_go_away():
+    engine = RateEngine('http://rabbitmq:15672', 'test', cache_dir=None)
+    _collect(engine, 100.0, {'ch1': ((100,), 'n0'), 'ch2': ((50,), 'n0')})
+    _collect(engine, 110.0, {'ch1': ((120,), 'n0')})
+    assert engine.totals('channels') == {'n0': [170]}
+    _collect(engine, 120.0, {'ch1': ((125,), 'n0')})
+    assert engine.totals('channels') == {'n0': [175]}
+
+
+def test_uncommitted_collection_keeps_the_previous_counters():
+    engine = RateEngine('http://rabbitmq:15672', 'test', cache_dir=None)
+    _collect(engine, 100.0, {'q1': ((10,), None)}, namespace='queues')
+    engine.begin()
+    engine.observe('queues', 'q1', (1000,))
+    # the listing failed, nothing is committed
+    deltas = _collect(engine, 120.0, {'q1': ((30,), None)}, namespace='queues')
+    assert deltas == {'q1': (20,)}
+    assert engine.rates('queues', deltas['q1']) is None
+
+
+def test_state_is_carried_across_exec_runs(tmp_path):
+    first = RateEngine('http://rabbitmq:15672', 'test', cache_dir=str(tmp_path))
+    _collect(first, 100.0, {'ch1': ((7, 2**63 + 1), 'n0')})
+    _collect(first, 110.0, {'ch1': ((9, 2**63 + 2), 'n0')})
+
+    second = RateEngine('http://rabbitmq:15672', 'test', cache_dir=str(tmp_path))
+    second.load()
+    assert second.totals('channels') == {'n0': [9, 2**63 + 2]}
+    second.begin()
+    second._started = 115.0
+    assert second.interval('channels') == 5.0
+    assert second.observe('channels', 'ch1', (3, 2**63 + 4)) == (3, 2)
+    assert second.rates('channels', (3, 2)) == (0.6, 0.4)
+
+
+def test_state_files_are_per_host(tmp_path):
+    first = RateEngine('http://a:15672', 'test', cache_dir=str(tmp_path))
+    _collect(first, 100.0, {'ch1': ((7,), 'n0')})
+    other = RateEngine('http://b:15672', 'test', cache_dir=str(tmp_path))
+    other.load()
+    assert other.totals('channels') == {}
+
+
+def test_unreadable_state_counts_as_empty(tmp_path):
+    engine = RateEngine('http://rabbitmq:15672', 'test', cache_dir=str(tmp_path))
+    _collect(engine, 100.0, {'ch1': ((7,), 'n0')})
+    with open(engine._path, 'r+b') as f:
+        f.seek(12)
+        f.write(b'garbage')
+    engine = RateEngine('http://rabbitmq:15672', 'test', cache_dir=str(tmp_path))
+    engine.load()
+    assert engine.totals('channels') == {}
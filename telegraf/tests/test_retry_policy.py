@@ -0,0 +1,143 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import time
+
+import aiohttp
+import pytest
+
+import retry_policy
+from retry_policy import CircuitBreaker, CircuitBreakers, parse_duration, retry
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('500ms', 0.5), ('10s', 10.0), ('1.5s', 1.5), ('2m', 120.0), ('1h', 3600.0),
+    ('3', 3.0), (' 20S ', 20.0), ('0', 0.0),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+@pytest.mark.parametrize('value', [None, '', '  '])
+def test_parse_duration_default(value):
+    assert parse_duration(value, 7.0) == 7.0
+
+
+def test_parse_duration_rejects_unknown_units():
+    with pytest.raises(ValueError):
+        parse_duration('5d')
+
+
+def test_breaker_opens_after_consecutive_failures_and_closes_on_success():
+    breaker = CircuitBreaker(failures=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_lets_one_trial_call_through_after_the_cooldown():
+    breaker = CircuitBreaker(failures=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breakers_survive_a_dump_and_load_through_json():
+    breakers = CircuitBreakers(failures=2, cooldown=60)
+    breakers.get('queues').record_failure()
+    breakers.get('queues').record_failure()
+    breakers.get('nodes').record_failure()
+    breakers.get('overview').record_success()
+    dumped = json.loads(json.dumps(breakers.dump()))
+    # closed breakers without failures are not carried over
+    assert set(dumped) == {'queues', 'nodes'}
+
+    loaded = CircuitBreakers(failures=2, cooldown=60)
+    loaded.load(dumped)
+    assert loaded.states() == {'queues': CircuitBreaker.OPEN, 'nodes': CircuitBreaker.CLOSED}
+    assert not loaded.get('queues').allow()
+    # one more failure reaches the threshold the previous run started counting
+    loaded.get('nodes').record_failure()
+    assert loaded.get('nodes').state == CircuitBreaker.OPEN
+
+
+def test_loaded_breaker_keeps_its_opening_time():
+    breaker = CircuitBreaker(failures=1, cooldown=10)
+    state = [CircuitBreaker.OPEN, 1, time.time() - 20]
+    breaker.load(state)
+    # opened longer than the cooldown ago by the previous run
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def _run(coroutine, deadline=0):
+    async def main():
+        retry_policy.set_deadline(deadline)
+        return await coroutine
+    return asyncio.run(main())
+
+
+def test_retry_retries_retryable_errors_only():
+    calls = []
+
+    @retry(retries=3, backoff=0)
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise aiohttp.ClientConnectionError()
+        return 'ok'
+
+    assert _run(flaky()) == 'ok'
+    assert len(calls) == 3
+
+    @retry(retries=3, backoff=0)
+    async def broken():
+        calls.append(1)
+        raise ValueError()
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        _run(broken())
+    assert len(calls) == 1
+
+
+def test_retry_gives_up_and_opens_the_breaker():
+    breaker = CircuitBreaker(failures=2, cooldown=60)
+
+    @retry(retries=5, backoff=0, breaker=lambda: breaker)
+    async def down():
+        raise aiohttp.ClientConnectionError()
+
+    with pytest.raises(retry_policy.CircuitOpenError):
+        _run(down())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_retry_stops_at_the_deadline():
+    @retry(retries=100, backoff=0.05, max_backoff=0.05)
+    async def down():
+        raise aiohttp.ClientConnectionError()
+
+    start = time.monotonic()
+    with pytest.raises(retry_policy.RetryExhaustedError):
+        _run(down(), deadline=0.2)
+    assert time.monotonic() - start < 1